@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+スパースGSIのキー移行スクリプト
+
+GSIキー導入前に書き込まれたアイテムにキーを設定する（デプロイ後に1回実行）
+"""
+import sys
+import os
+import asyncio
+
+# プロジェクトルートをPATHに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from stock_monitoring_bot.repositories import AlertRepository, StockRepository, close_shared_clients
+
+
+async def main():
+    """各テーブルのGSIキーを設定"""
+    try:
+        updated = await StockRepository().backfill_active_index()
+        print(f"✅ 監視中の銘柄: {updated} 件にis_active_pkを設定しました")
+        updated = await AlertRepository().backfill_unsent_index()
+        print(f"✅ 未送信アラート: {updated} 件にunsent_gsi_pkを設定しました")
+    finally:
+        await close_shared_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -144,11 +144,17 @@ def process_application_command(webhook_data: Dict[str, Any]) -> Dict[str, Any]:
         if not interaction_token or not application_id:
             raise ValueError("Missing interaction token or application ID")
         
-        # コマンドを非同期で処理
+        # コマンドを非同期で処理（呼び出しごとのループなので共有クライアントも閉じる）
         import asyncio
-        response_content = asyncio.run(
-            handler._process_slash_command(command_name, options, user_id)
-        )
+        from stock_monitoring_bot.repositories import close_shared_clients
+        
+        async def _process() -> str:
+            try:
+                return await handler._process_slash_command(command_name, options, user_id)
+            finally:
+                await close_shared_clients()
+        
+        response_content = asyncio.run(_process())
         
         # Discord Webhook URLを構築してレスポンスを送信
         webhook_url = f"https://discord.com/api/v10/webhooks/{application_id}/{interaction_token}"
@@ -2,9 +2,13 @@
 
 import os
 import logging
+import time
 import boto3
-from typing import Optional, Dict
-from functools import lru_cache
+from typing import Optional, Dict, Tuple
+
+
+# Parameter Storeの取得結果をキャッシュする秒数（ウォームスタート間で共有）
+PARAMETER_CACHE_TTL_SECONDS = 300
 
 
 class Config:
@@ -14,6 +18,7 @@ class Config:
         self.environment = os.getenv('ENVIRONMENT', 'dev')
         self.project_name = 'stock-monitoring-bot'
         self._ssm_client = None
+        self._parameter_cache: Dict[Tuple[str, bool], Tuple[float, str]] = {}
         self.logger = logging.getLogger(__name__)
         self._validate_environment()
     
@@ -24,29 +29,47 @@ class Config:
             self._ssm_client = boto3.client('ssm')
         return self._ssm_client
     
-    @lru_cache(maxsize=128)
-    def get_parameter(self, parameter_name: str, decrypt: bool = True, default: Optional[str] = None) -> Optional[str]:
+    def get_parameter(
+        self,
+        parameter_name: str,
+        decrypt: bool = True,
+        default: Optional[str] = None,
+        ttl: int = PARAMETER_CACHE_TTL_SECONDS
+    ) -> Optional[str]:
         """
         Get parameter from AWS Systems Manager Parameter Store.
         
+        Values are cached in memory for ``ttl`` seconds so that warm Lambda
+        invocations do not hit SSM on every call. Failed lookups are not cached.
+        
         Args:
             parameter_name: The name of the parameter
             decrypt: Whether to decrypt SecureString parameters
+            default: Value returned when the parameter cannot be retrieved
+            ttl: Cache lifetime in seconds
             
         Returns:
-            The parameter value or None if not found
+            The parameter value or default if not found
         """
         # パラメータ名の検証
         if not parameter_name or not isinstance(parameter_name, str):
             self.logger.error("Invalid parameter name provided")
             return None
+        
+        cache_key = (parameter_name, decrypt)
+        cached = self._parameter_cache.get(cache_key)
+        now = time.monotonic()
+        if cached is not None and cached[0] > now:
+            return cached[1]
             
         try:
             response = self.ssm_client.get_parameter(
                 Name=parameter_name,
                 WithDecryption=decrypt
             )
-            return response['Parameter']['Value']
+            value = response['Parameter']['Value']
+            self._parameter_cache[cache_key] = (now + ttl, value)
+            return value
         except Exception:
             # セキュリティ上、詳細なエラー情報はログに記録しない
             self.logger.error(f"Parameter retrieval failed for {parameter_name[:10]}***")
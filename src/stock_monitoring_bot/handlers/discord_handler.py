@@ -5,8 +5,10 @@ import asyncio
 import json
 import logging
 import re
+import time
 from datetime import datetime, UTC, timedelta
-from typing import Dict, List, Optional
+from collections import deque
+from typing import Deque, Dict, Hashable, List, Optional
 from decimal import Decimal
 from urllib.parse import urlparse
 
@@ -31,23 +33,25 @@ class RateLimiter:
     def __init__(self, max_requests: int = 5, time_window: int = 60):
         self.max_requests = max_requests
         self.time_window = time_window
-        self.requests: List[datetime] = []
+        # 記録はtime.monotonic()の秒数で時刻順に追加されるため、古いものは先頭から取り除ける
+        self.requests: Deque[float] = deque()
         self._lock = asyncio.Lock()
     
     async def can_send(self) -> bool:
         """送信可能かチェック"""
         async with self._lock:
-            now = datetime.now(UTC)
             # 時間窓外の古いリクエストを削除
-            self.requests = [req_time for req_time in self.requests 
-                           if now - req_time < timedelta(seconds=self.time_window)]
+            window_start = time.monotonic() - self.time_window
+            requests = self.requests
+            while requests and requests[0] <= window_start:
+                requests.popleft()
             
-            return len(self.requests) < self.max_requests
+            return len(requests) < self.max_requests
     
     async def record_request(self) -> None:
         """リクエスト記録"""
         async with self._lock:
-            self.requests.append(datetime.now(UTC))
+            self.requests.append(time.monotonic())
 
 
 class DuplicateFilter:
@@ -55,12 +59,12 @@ class DuplicateFilter:
     
     def __init__(self, cooldown_minutes: int = 15):
         self.cooldown_minutes = cooldown_minutes
-        self.sent_alerts: Dict[str, datetime] = {}
+        self.sent_alerts: Dict[Hashable, datetime] = {}
         self._lock = asyncio.Lock()
     
-    def _generate_alert_key(self, alert: Alert) -> str:
+    def _generate_alert_key(self, alert: Alert) -> Hashable:
         """アラートの一意キーを生成"""
-        return f"{alert.symbol}:{alert.alert_type}:{alert.threshold_value}"
+        return alert.fingerprint
     
     async def should_send_alert(self, alert: Alert) -> bool:
         """アラート送信すべきかチェック"""
@@ -1,54 +1,114 @@
 """
 Lambda function main handler
 """
-import json
+import asyncio
 import logging
-from typing import Dict, Any
+import os
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable
+
+import aiohttp
 
 from ..config import config
+from ..utils.serialization import dumps, LazyJson
 from .scheduled_handler import ScheduledHandler, ScheduledPnLReportHandler
 from .interactions_handler import InteractionsHandler
 # 重いライブラリは必要時のみインポート（遅延読み込み）
 from .discord_handler import DiscordHandler
 
-# ログ設定
-logging.basicConfig(level=logging.DEBUG)
+# ログ設定（既定はINFO。DEBUGログはLOG_LEVEL=DEBUGの場合のみ出力）
+_LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+if _LOG_LEVEL not in logging.getLevelNamesMapping():
+    _LOG_LEVEL = 'INFO'
+logging.basicConfig(level=_LOG_LEVEL)
+# Lambdaではルートロガーにハンドラーが設定済みでbasicConfigが効かないため、レベルは直接設定する
+logging.getLogger().setLevel(_LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+# Webhook送信時のヘッダー（ペイロードは事前にJSONエンコードして送る）
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# ウォームスタート間で再利用するInteractionsハンドラー（公開鍵ごとに1つ）
+_interactions_handler: Optional[InteractionsHandler] = None
+
+# ウォームスタート間で再利用するイベントループ（asyncio.runによる毎回の生成・破棄を避ける）
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# ウォームスタート間で再利用するHTTPセッション（Discord Webhook用）
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def _get_session() -> aiohttp.ClientSession:
+    """Discord Webhook用のHTTPセッションを取得（初回のみ作成）"""
+    global _session, _session_loop
+    
+    loop = asyncio.get_running_loop()
+    # セッションはイベントループに紐付くため、ループが変わった場合は作り直す
+    if _session is None or _session.closed or _session_loop is not loop:
+        if _session is not None and not _session.closed:
+            # 古いループに紐付いたセッションは再利用できないため確実に閉じる
+            try:
+                await _session.close()
+            except Exception as e:
+                logger.warning("旧HTTPセッションのクローズに失敗: %s", e)
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=10,
+                ttl_dns_cache=300,
+                keepalive_timeout=30
+            )
+        )
+        _session_loop = loop
+    
+    return _session
+
+
+def _get_interactions_handler(public_key: str) -> InteractionsHandler:
+    """Interactionsハンドラーを取得（公開鍵が変わった場合のみ作り直す）"""
+    global _interactions_handler
+    
+    if _interactions_handler is None or _interactions_handler.public_key != public_key.strip():
+        _interactions_handler = InteractionsHandler(
+            public_key=public_key,
+            admin_users=[]  # TODO: 管理者ユーザーIDを設定
+        )
+    
+    return _interactions_handler
+
+
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """コンテナ内で共有するイベントループを取得（初回のみ作成）"""
+    global _loop
+    
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    
+    return _loop
+
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Lambda関数のメインハンドラー"""
     try:
-        logger.info(f"Lambda実行開始: {json.dumps(event, default=str)}")
-        
-        # EventBridge (CloudWatch Events) からの定期実行
-        if event.get('source') == 'aws.events':
-            import asyncio
-            return asyncio.run(handle_scheduled_event(event, context))
+        logger.debug("Lambda実行開始: %s", LazyJson(event))
         
-        # API Gateway からのHTTPリクエスト（Discord Interactions）
-        elif event.get('httpMethod') or event.get('requestContext'):
-            import asyncio
-            return asyncio.run(handle_http_request(event, context))
-        
-        # Discord非同期コマンド処理
-        elif event.get('source') == 'discord.async_command':
-            import asyncio
-            return asyncio.run(handle_async_discord_command(event, context))
+        # イベント種別に応じてハンドラーを選択
+        for matches, handler in _EVENT_ROUTES:
+            if matches(event):
+                return _get_event_loop().run_until_complete(handler(event, context))
         
         # その他のイベント
-        else:
-            logger.warning(f"未対応のイベントタイプ: {event}")
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'error': 'Unsupported event type'})
-            }
+        logger.warning("未対応のイベントタイプ: %s", LazyJson(event))
+        return {
+            'statusCode': 400,
+            'body': dumps({'error': 'Unsupported event type'})
+        }
             
     except Exception as e:
-        logger.error(f"Lambda実行エラー: {e}", exc_info=True)
+        logger.error("Lambda実行エラー: %s", e, exc_info=True)
         return {
             'statusCode': 500,
-            'body': json.dumps({'error': 'Internal server error'})
+            'body': dumps({'error': 'Internal server error'})
         }
 
 
@@ -57,7 +117,7 @@ async def handle_scheduled_event(event: Dict[str, Any], context: Any) -> Dict[st
     try:
         # イベント種別を取得
         event_type = event.get('detail', {}).get('event_type', 'stock_monitoring')
-        logger.info(f"定期実行開始: {event_type}")
+        logger.info("定期実行開始: %s", event_type)
         
         # Discord Webhook URLとAPI Keyを取得
         discord_webhook_url = config.discord_webhook_url
@@ -91,7 +151,7 @@ async def handle_scheduled_event(event: Dict[str, Any], context: Any) -> Dict[st
                 logger.warning("TARGET_USERS環境変数が設定されていません")
                 return {
                     'statusCode': 200,
-                    'body': json.dumps({"message": "対象ユーザーが設定されていません"})
+                    'body': dumps({"message": "対象ユーザーが設定されていません"})
                 }
             
             async with DiscordHandler(discord_webhook_url) as discord_handler:
@@ -103,17 +163,17 @@ async def handle_scheduled_event(event: Dict[str, Any], context: Any) -> Dict[st
             # 通常の株価監視
             result = await handler.execute()
         
-        logger.info(f"定期実行完了: {event_type} - {result}")
+        logger.info("定期実行完了: %s - %s", event_type, result)
         return {
             'statusCode': 200,
-            'body': json.dumps(result)
+            'body': dumps(result)
         }
         
     except Exception as e:
-        logger.error(f"定期実行エラー: {e}", exc_info=True)
+        logger.error("定期実行エラー: %s", e, exc_info=True)
         return {
             'statusCode': 500,
-            'body': json.dumps({'error': str(e)})
+            'body': dumps({'error': str(e)})
         }
 
 
@@ -131,14 +191,11 @@ async def handle_http_request(event: Dict[str, Any], context: Any) -> Dict[str,
             logger.error("Discord Public Keyが設定されていません")
             return {
                 'statusCode': 500,
-                'body': json.dumps({'error': 'Discord Public Key not configured'})
+                'body': dumps({'error': 'Discord Public Key not configured'})
             }
         
-        # Interactions ハンドラーを実行
-        handler = InteractionsHandler(
-            public_key=discord_public_key,
-            admin_users=[]  # TODO: 管理者ユーザーIDを設定
-        )
+        # Interactions ハンドラーを実行（PINGも署名検証後にここで応答する）
+        handler = _get_interactions_handler(discord_public_key)
         
         result = await handler.handle_interaction(event)
         
@@ -146,24 +203,35 @@ async def handle_http_request(event: Dict[str, Any], context: Any) -> Dict[str,
         return result
         
     except Exception as e:
-        logger.error(f"Discord Interactions処理エラー: {e}", exc_info=True)
+        logger.error("Discord Interactions処理エラー: %s", e, exc_info=True)
         return {
             'statusCode': 500,
-            'body': json.dumps({'error': str(e)})
+            'body': dumps({'error': str(e)})
         }
 
 
 async def handle_async_discord_command(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Discord非同期コマンドを処理してWebhookで結果を送信"""
+    detail = event.get('detail') or {}
+    interaction_token = detail.get('interaction_token', '')
+    application_id = detail.get('application_id', '')
+    
+    # 元のメッセージ更新用URL（follow-upメッセージ用、エラー通知でも再利用）
+    patch_url = (
+        f"https://discord.com/api/v10/webhooks/{application_id}/{interaction_token}/messages/@original"
+        if application_id and interaction_token else None
+    )
+    
     try:
         logger.info("Discord非同期コマンド処理開始")
         
-        detail = event.get('detail', {})
         command_name = detail.get('command_name', '')
         options = detail.get('options', [])
         user_id = detail.get('user_id', '')
-        interaction_token = detail.get('interaction_token', '')
-        application_id = detail.get('application_id', '')
+        
+        # 結果の送信先がない場合はコマンドを実行しない（副作用のあるコマンド対策）
+        if patch_url is None:
+            raise ValueError("Missing interaction token or application ID")
         
         # Discord Public Keyを取得
         discord_public_key = config.get_parameter(
@@ -175,61 +243,63 @@ async def handle_async_discord_command(event: Dict[str, Any], context: Any) -> D
             return {'statusCode': 500, 'body': 'Discord Public Key not configured'}
         
         # コマンドプロセッサで処理
-        from .interactions_handler import InteractionsHandler
-        handler = InteractionsHandler(
-            public_key=discord_public_key,
-            admin_users=[]
-        )
+        handler = _get_interactions_handler(discord_public_key)
         
         # コマンド実行（時間がかかるもの）
         response_content = await handler._process_slash_command(
             command_name, options, user_id
         )
         
-        # Discord Webhook URLを構築（follow-upメッセージ用）
-        webhook_url = f"https://discord.com/api/v10/webhooks/{application_id}/{interaction_token}"
-        
         # 結果をWebhookで送信（PATCHで元のメッセージを更新）
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            webhook_payload = {
-                "content": response_content,
-                "flags": 64 if response_content.startswith('❌') else 0  # EPHEMERAL if error
-            }
-            
-            # 元のメッセージを更新（PATCH）
-            patch_url = f"{webhook_url}/messages/@original"
-            async with session.patch(patch_url, json=webhook_payload) as response:
-                if response.status == 200:
-                    logger.info(f"Webhook送信成功: {command_name}")
-                else:
-                    error_text = await response.text()
-                    logger.error(f"Webhook送信失敗: {response.status} - {error_text}")
+        session = await _get_session()
+        webhook_payload = {
+            "content": response_content,
+            "flags": 64 if response_content.startswith('❌') else 0  # EPHEMERAL if error
+        }
+        
+        # 元のメッセージを更新（PATCH）
+        async with session.patch(patch_url, data=dumps(webhook_payload).encode(), headers=_JSON_HEADERS) as response:
+            if response.status == 200:
+                # 本文を読み切ってから解放しないと接続が閉じられ、キープアライブで再利用できない
+                await response.read()
+                logger.info("Webhook送信成功: %s", command_name)
+            else:
+                error_text = await response.text()
+                logger.error("Webhook送信失敗: %s - %s", response.status, error_text)
         
         return {
             'statusCode': 200,
-            'body': json.dumps({'message': 'Async command processed'})
+            'body': dumps({'message': 'Async command processed'})
         }
         
     except Exception as e:
-        logger.error(f"Discord非同期コマンド処理エラー: {e}", exc_info=True)
+        logger.error("Discord非同期コマンド処理エラー: %s", e, exc_info=True)
         
         # エラー時もWebhookで通知
         try:
-            if application_id and interaction_token:
-                import aiohttp
-                webhook_url = f"https://discord.com/api/v10/webhooks/{application_id}/{interaction_token}"
-                patch_url = f"{webhook_url}/messages/@original"
-                async with aiohttp.ClientSession() as session:
-                    error_payload = {
-                        "content": "❌ コマンドの処理中にエラーが発生しました",
-                        "flags": 64  # EPHEMERAL
-                    }
-                    await session.patch(patch_url, json=error_payload)
+            if patch_url is not None:
+                session = await _get_session()
+                error_payload = {
+                    "content": "❌ コマンドの処理中にエラーが発生しました",
+                    "flags": 64  # EPHEMERAL
+                }
+                async with session.patch(patch_url, data=dumps(error_payload).encode(), headers=_JSON_HEADERS) as response:
+                    await response.read()
         except Exception as webhook_error:
-            logger.error(f"エラー通知Webhook送信失敗: {webhook_error}")
+            logger.error("エラー通知Webhook送信失敗: %s", webhook_error)
         
         return {
             'statusCode': 500,
-            'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+            'body': dumps({'error': str(e)})
+        }
+
+
+# イベント判定条件とハンドラーの対応表（上から順に評価）
+_EVENT_ROUTES: List[Tuple[Callable[[Dict[str, Any]], bool], Callable[[Dict[str, Any], Any], Awaitable[Dict[str, Any]]]]] = [
+    # EventBridge (CloudWatch Events) からの定期実行
+    (lambda e: e.get('source') == 'aws.events', handle_scheduled_event),
+    # API Gateway からのHTTPリクエスト（Discord Interactions）
+    (lambda e: bool(e.get('httpMethod') or e.get('requestContext')), handle_http_request),
+    # Discord非同期コマンド処理
+    (lambda e: e.get('source') == 'discord.async_command', handle_async_discord_command),
+]
@@ -2,16 +2,30 @@
 定期実行ハンドラー（Lambda用）
 """
 import asyncio
-import json
+import heapq
+import itertools
 import logging
 import os
 from datetime import datetime, UTC
-from typing import Dict, Any, List
+from decimal import Decimal
+from typing import Dict, Any, List, Optional
 
 from ..services.portfolio_service import PortfolioService
 from ..services.data_provider import StockDataProvider
-from ..handlers.discord_handler import DiscordHandler
+from ..handlers.discord_handler import DiscordHandler, DiscordMessage
 from ..models.stock import PortfolioProfitLossReport
+from ..utils.serialization import dumps
+
+# 損益の正負（0=損失, 1=利益）でインデックスする表示用テーブル
+_PNL_SIGN = ("", "+")
+_PNL_EMOJI_TOTAL = ("📉", "📈")
+_PNL_EMOJI_DETAIL = ("🔴", "🟢")
+_PNL_COLOR = (0xFF0000, 0x00FF00)  # 赤=損失, 緑=利益
+
+
+def _format_yen(value: Decimal) -> str:
+    """円表記（3桁区切り、小数点以下なし）にフォーマット"""
+    return f"¥{value:,.0f}"
 
 
 class ScheduledHandler:
@@ -36,7 +50,7 @@ class ScheduledHandler:
                 "alerts_sent": 0
             }
             
-            self.logger.info(f"定期株価監視完了: {result}")
+            self.logger.info("定期株価監視完了: %s", result)
             return result
             
         except Exception as e:
@@ -57,11 +71,18 @@ class ScheduledPnLReportHandler:
         self,
         portfolio_service: PortfolioService,
         discord_handler: DiscordHandler,
-        target_users: List[str] = None
+        target_users: List[str] = None,
+        max_concurrency: int = 8
     ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrencyは1以上である必要があります")
+        
         self.portfolio_service = portfolio_service
         self.discord_handler = discord_handler
         self.target_users = target_users or []
+        self.max_concurrency = max_concurrency
+        # 全ユーザーが同じWebhookに投稿するため、送信は直列化する
+        self._webhook_lock = asyncio.Lock()
         self.logger = logging.getLogger(__name__)
     
     async def generate_and_send_pnl_reports(self) -> Dict[str, Any]:
@@ -74,15 +95,25 @@ class ScheduledPnLReportHandler:
         }
         
         try:
-            # 対象ユーザーの損益レポートを生成
-            for user_id in self.target_users:
-                try:
-                    await self._process_user_pnl_report(user_id)
+            # 対象ユーザーの損益レポートを並行して生成（同時実行数は制限）
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            
+            async def _run_one(user_id: str) -> Optional[str]:
+                async with semaphore:
+                    try:
+                        await self._process_user_pnl_report(user_id)
+                        return None
+                    except Exception as e:
+                        error_msg = f"ユーザー {user_id} の処理エラー: {str(e)}"
+                        self.logger.error(error_msg)
+                        return error_msg
+            
+            outcomes = await asyncio.gather(*(_run_one(user_id) for user_id in self.target_users))
+            
+            for error_msg in outcomes:
+                if error_msg is None:
                     results["successful_reports"] += 1
-                    
-                except Exception as e:
-                    error_msg = f"ユーザー {user_id} の処理エラー: {str(e)}"
-                    self.logger.error(error_msg)
+                else:
                     results["errors"].append(error_msg)
                     results["failed_reports"] += 1
                 
@@ -126,14 +157,15 @@ class ScheduledPnLReportHandler:
                 "content": f"<@{user_id}> 定期損益レポートです"
             }
             
-            success = await self.discord_handler._send_webhook(
-                self.discord_handler.DiscordMessage(**message_data)
-            )
+            async with self._webhook_lock:
+                success = await self.discord_handler._send_webhook(
+                    DiscordMessage(**message_data)
+                )
+            
+            if not success:
+                raise RuntimeError(f"ユーザー {user_id} への損益レポート送信失敗")
             
-            if success:
-                self.logger.info(f"ユーザー {user_id} への損益レポート送信成功")
-            else:
-                self.logger.error(f"ユーザー {user_id} への損益レポート送信失敗")
+            self.logger.info(f"ユーザー {user_id} への損益レポート送信成功")
                 
         except Exception as e:
             self.logger.error(f"Discord通知送信エラー: {e}")
@@ -141,82 +173,92 @@ class ScheduledPnLReportHandler:
     
     def _create_pnl_report_embed(self, user_id: str, reports: List[PortfolioProfitLossReport]) -> Dict[str, Any]:
         """損益レポート用Embed作成"""
-        # 全ポートフォリオの合計を計算
-        total_purchase_value = sum(r.total_purchase_value for r in reports)
-        total_current_value = sum(r.total_current_value for r in reports)
+        # 全ポートフォリオの合計とポートフォリオ別詳細を1パスで計算
+        show_portfolio_details = len(reports) > 1
+        total_purchase_value = Decimal('0')
+        total_current_value = Decimal('0')
+        portfolio_detail_parts: List[str] = []
+        for report in reports:
+            total_purchase_value += report.total_purchase_value
+            total_current_value += report.total_current_value
+            
+            if show_portfolio_details:
+                p_idx = int(report.total_unrealized_pnl >= 0)
+                p_pnl_sign = _PNL_SIGN[p_idx]
+                p_pnl_emoji = _PNL_EMOJI_DETAIL[p_idx]
+                portfolio_detail_parts.append(
+                    f"{p_pnl_emoji} **{report.portfolio_name}**\n"
+                    f"  {p_pnl_sign}{_format_yen(report.total_unrealized_pnl)} ({p_pnl_sign}{report.total_unrealized_pnl_percent:.2f}%)\n"
+                )
+        
         total_unrealized_pnl = total_current_value - total_purchase_value
         total_unrealized_pnl_percent = (total_unrealized_pnl / total_purchase_value * 100) if total_purchase_value > 0 else 0
         
-        # 色を決定（利益=緑、損失=赤）
-        color = 0x00FF00 if total_unrealized_pnl >= 0 else 0xFF0000
+        # 生成時刻（timestampとフッターで同じ時刻を使う）
+        now = datetime.now(UTC)
         
-        # 符号付きフォーマット
-        pnl_sign = "+" if total_unrealized_pnl >= 0 else ""
-        pnl_emoji = "📈" if total_unrealized_pnl >= 0 else "📉"
+        # 色・符号・絵文字を決定（利益=緑、損失=赤）
+        pnl_idx = int(total_unrealized_pnl >= 0)
+        color = _PNL_COLOR[pnl_idx]
+        pnl_sign = _PNL_SIGN[pnl_idx]
+        pnl_emoji = _PNL_EMOJI_TOTAL[pnl_idx]
         
         embed = {
             "title": f"{pnl_emoji} 定期損益レポート",
             "color": color,
-            "timestamp": datetime.now(UTC).isoformat(),
+            "timestamp": now.isoformat(),
             "fields": [
                 {
                     "name": "💰 総取得金額",
-                    "value": f"¥{total_purchase_value:,.0f}",
+                    "value": _format_yen(total_purchase_value),
                     "inline": True
                 },
                 {
                     "name": "💎 現在評価額",
-                    "value": f"¥{total_current_value:,.0f}",
+                    "value": _format_yen(total_current_value),
                     "inline": True
                 },
                 {
                     "name": "📊 含み損益",
-                    "value": f"{pnl_sign}¥{total_unrealized_pnl:,.0f}\n({pnl_sign}{total_unrealized_pnl_percent:.2f}%)",
+                    "value": f"{pnl_sign}{_format_yen(total_unrealized_pnl)}\n({pnl_sign}{total_unrealized_pnl_percent:.2f}%)",
                     "inline": True
                 }
             ],
             "footer": {
-                "text": f"ユーザー: {user_id} | 更新時刻: {datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S UTC')}"
+                "text": f"ユーザー: {user_id} | 更新時刻: {now.strftime('%Y-%m-%d %H:%M:%S UTC')}"
             }
         }
         
         # ポートフォリオ別詳細を追加
-        if len(reports) > 1:
-            portfolio_details = ""
-            for report in reports:
-                p_pnl_sign = "+" if report.total_unrealized_pnl >= 0 else ""
-                p_pnl_emoji = "🟢" if report.total_unrealized_pnl >= 0 else "🔴"
-                
-                portfolio_details += f"{p_pnl_emoji} **{report.portfolio_name}**\n"
-                portfolio_details += f"  {p_pnl_sign}¥{report.total_unrealized_pnl:,.0f} ({p_pnl_sign}{report.total_unrealized_pnl_percent:.2f}%)\n"
-            
+        if show_portfolio_details:
             embed["fields"].append({
                 "name": "📁 ポートフォリオ別",
-                "value": portfolio_details,
+                "value": "".join(portfolio_detail_parts),
                 "inline": False
             })
         
-        # 主要銘柄の損益を表示（上位5銘柄）
-        all_holdings = []
-        for report in reports:
-            all_holdings.extend(report.holdings)
-        
-        # 損益額でソート
-        all_holdings.sort(key=lambda x: abs(x.unrealized_pnl), reverse=True)
-        top_holdings = all_holdings[:5]
+        # 主要銘柄の損益を表示（損益額の絶対値で上位5銘柄）
+        top_holdings = heapq.nlargest(
+            5,
+            itertools.chain.from_iterable(r.holdings for r in reports),
+            key=lambda h: abs(h.unrealized_pnl)
+        )
         
         if top_holdings:
-            holdings_details = ""
+            holding_parts: List[str] = []
             for holding in top_holdings:
-                h_pnl_sign = "+" if holding.unrealized_pnl >= 0 else ""
-                h_pnl_emoji = "🟢" if holding.unrealized_pnl >= 0 else "🔴"
+                h_idx = int(holding.unrealized_pnl >= 0)
+                h_pnl_sign = _PNL_SIGN[h_idx]
+                h_pnl_emoji = _PNL_EMOJI_DETAIL[h_idx]
                 
-                holdings_details += f"{h_pnl_emoji} **{holding.symbol}**: {h_pnl_sign}¥{holding.unrealized_pnl:,.0f} "
-                holdings_details += f"({h_pnl_sign}{holding.unrealized_pnl_percent:.1f}%)\n"
+                holding_parts.append(
+                    f"{h_pnl_emoji} **{holding.symbol}**: {h_pnl_sign}{_format_yen(holding.unrealized_pnl)} "
+                    f"({h_pnl_sign}{holding.unrealized_pnl_percent:.1f}%)\n"
+                )
             
             embed["fields"].append({
                 "name": "🏆 主要銘柄（損益額順）",
-                "value": holdings_details,
+                "value": "".join(holding_parts),
                 "inline": False
             })
         
@@ -247,7 +289,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             logger.warning("TARGET_USERS環境変数が設定されていません")
             return {
                 "statusCode": 200,
-                "body": json.dumps({"message": "対象ユーザーが設定されていません"})
+                "body": dumps({"message": "対象ユーザーが設定されていません"})
             }
         
         # 非同期処理を実行
@@ -255,14 +297,14 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         return {
             "statusCode": 200,
-            "body": json.dumps(result)
+            "body": dumps(result)
         }
         
     except Exception as e:
         logger.error(f"Lambda実行エラー: {e}")
         return {
             "statusCode": 500,
-            "body": json.dumps({"error": str(e)})
+            "body": dumps({"error": str(e)})
         }
 
 
@@ -284,17 +326,3 @@ async def _async_lambda_handler(webhook_url: str, target_users: List[str]) -> Di
         
         return result
 
-
-# ローカル実行用
-if __name__ == "__main__":
-    
-    # 環境変数設定例
-    os.environ['DISCORD_WEBHOOK_URL'] = 'your_webhook_url_here'
-    os.environ['TARGET_USERS'] = 'user1,user2,user3'
-    
-    # テスト実行
-    test_event = {}
-    test_context = None
-    
-    result = lambda_handler(test_event, test_context)
-    print(json.dumps(result, indent=2, ensure_ascii=False))
\ No newline at end of file
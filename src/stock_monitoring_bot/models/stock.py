@@ -3,8 +3,30 @@
 """
 from datetime import datetime, UTC
 from decimal import Decimal
-from typing import Optional, List
-from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List, Tuple
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+
+# バリデーション用の許可値（エラーメッセージは定義順のリスト表記を維持）
+_ALERT_TYPES = ['price_upper', 'price_lower', 'volume', 'system']
+_COMMAND_TYPES = ['add', 'remove', 'list', 'alert', 'chart', 'stats', 'portfolio', 'help', 'error']
+_STATUSES = ['pending', 'processing', 'completed', 'failed']
+_LOG_LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+
+_VALID_ALERT_TYPES = frozenset(_ALERT_TYPES)
+_VALID_COMMAND_TYPES = frozenset(_COMMAND_TYPES)
+_VALID_STATUSES = frozenset(_STATUSES)
+_VALID_LOG_LEVELS = frozenset(_LOG_LEVELS)
+
+_ALERT_TYPE_ERROR = f'アラート種別は {_ALERT_TYPES} のいずれかである必要があります'
+_COMMAND_TYPE_ERROR = f'コマンド種別は {_COMMAND_TYPES} のいずれかである必要があります'
+_STATUS_ERROR = f'実行状態は {_STATUSES} のいずれかである必要があります'
+_LOG_LEVEL_ERROR = f'ログレベルは {_LOG_LEVELS} のいずれかである必要があります'
+
+
+def _utcnow() -> datetime:
+    """現在時刻（UTC、タイムゾーン付き）"""
+    return datetime.now(UTC)
 
 
 class MonitoredStock(BaseModel):
@@ -16,8 +38,8 @@ class MonitoredStock(BaseModel):
     price_threshold_lower: Optional[Decimal] = Field(None, description="価格下限閾値")
     volume_threshold_multiplier: Decimal = Field(default=Decimal("2.0"), description="取引量閾値倍率")
     is_active: bool = Field(default=True, description="監視有効フラグ")
-    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC), description="作成日時")
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC), description="更新日時")
+    created_at: datetime = Field(default_factory=_utcnow, description="作成日時")
+    updated_at: datetime = Field(default_factory=_utcnow, description="更新日時")
     
     @field_validator('symbol')
     @classmethod
@@ -43,6 +65,9 @@ class MonitoredStock(BaseModel):
 
 class StockPrice(BaseModel):
     """株価データ"""
+    # ティック毎のcalculate_changeで代入時の再検証を走らせない
+    model_config = ConfigDict(validate_assignment=False)
+    
     symbol: str = Field(..., description="銘柄コード")
     timestamp: datetime = Field(..., description="データ取得時刻")
     price: Decimal = Field(..., description="現在価格")
@@ -70,9 +95,11 @@ class StockPrice(BaseModel):
     
     def calculate_change(self) -> None:
         """変動額と変動率を計算"""
-        if self.previous_close and self.previous_close > 0:
-            self.change_amount = self.price - self.previous_close
-            self.change_percent = (self.change_amount / self.previous_close) * 100
+        previous_close = self.previous_close
+        if previous_close and previous_close > 0:
+            change_amount = self.price - previous_close
+            self.change_amount = change_amount
+            self.change_percent = (change_amount / previous_close) * 100
 
 
 class Alert(BaseModel):
@@ -81,7 +108,7 @@ class Alert(BaseModel):
     symbol: str = Field(..., description="銘柄コード")
     alert_type: str = Field(..., description="アラート種別（price_upper, price_lower, volume）")
     message: str = Field(..., description="アラートメッセージ")
-    triggered_at: datetime = Field(default_factory=lambda: datetime.now(UTC), description="発生日時")
+    triggered_at: datetime = Field(default_factory=_utcnow, description="発生日時")
     price_at_trigger: Optional[Decimal] = Field(None, description="発生時価格")
     volume_at_trigger: Optional[int] = Field(None, description="発生時取引量")
     threshold_value: Optional[Decimal] = Field(None, description="閾値")
@@ -91,10 +118,14 @@ class Alert(BaseModel):
     @field_validator('alert_type')
     @classmethod
     def validate_alert_type(cls, v):
-        valid_types = ['price_upper', 'price_lower', 'volume', 'system']
-        if v not in valid_types:
-            raise ValueError(f'アラート種別は {valid_types} のいずれかである必要があります')
+        if v not in _VALID_ALERT_TYPES:
+            raise ValueError(_ALERT_TYPE_ERROR)
         return v
+    
+    @property
+    def fingerprint(self) -> Tuple[str, str, Optional[Decimal]]:
+        """重複判定用のキー（文字列化せずタプルのままハッシュする）"""
+        return (self.symbol, self.alert_type, self.threshold_value)
 
 
 class Command(BaseModel):
@@ -104,7 +135,7 @@ class Command(BaseModel):
     channel_id: str = Field(..., description="チャンネルID")
     command_type: str = Field(..., description="コマンド種別")
     parameters: dict = Field(default_factory=dict, description="コマンドパラメータ")
-    executed_at: datetime = Field(default_factory=lambda: datetime.now(UTC), description="実行日時")
+    executed_at: datetime = Field(default_factory=_utcnow, description="実行日時")
     status: str = Field(default="pending", description="実行状態")
     result: Optional[str] = Field(None, description="実行結果")
     error_message: Optional[str] = Field(None, description="エラーメッセージ")
@@ -112,17 +143,15 @@ class Command(BaseModel):
     @field_validator('command_type')
     @classmethod
     def validate_command_type(cls, v):
-        valid_commands = ['add', 'remove', 'list', 'alert', 'chart', 'stats', 'portfolio', 'help', 'error']
-        if v not in valid_commands:
-            raise ValueError(f'コマンド種別は {valid_commands} のいずれかである必要があります')
+        if v not in _VALID_COMMAND_TYPES:
+            raise ValueError(_COMMAND_TYPE_ERROR)
         return v
     
     @field_validator('status')
     @classmethod
     def validate_status(cls, v):
-        valid_statuses = ['pending', 'processing', 'completed', 'failed']
-        if v not in valid_statuses:
-            raise ValueError(f'実行状態は {valid_statuses} のいずれかである必要があります')
+        if v not in _VALID_STATUSES:
+            raise ValueError(_STATUS_ERROR)
         return v
 
 
@@ -132,7 +161,7 @@ class Command(BaseModel):
 class SystemLog(BaseModel):
     """システムログ"""
     log_id: str = Field(..., description="ログID")
-    timestamp: datetime = Field(default_factory=lambda: datetime.now(UTC), description="ログ出力時刻")
+    timestamp: datetime = Field(default_factory=_utcnow, description="ログ出力時刻")
     level: str = Field(..., description="ログレベル")
     component: str = Field(..., description="コンポーネント名")
     message: str = Field(..., description="ログメッセージ")
@@ -141,10 +170,9 @@ class SystemLog(BaseModel):
     @field_validator('level')
     @classmethod
     def validate_level(cls, v):
-        valid_levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
         v_upper = v.upper()
-        if v_upper not in valid_levels:
-            raise ValueError(f'ログレベルは {valid_levels} のいずれかである必要があります')
+        if v_upper not in _VALID_LOG_LEVELS:
+            raise ValueError(_LOG_LEVEL_ERROR)
         return v_upper
 
 
@@ -154,8 +182,8 @@ class Portfolio(BaseModel):
     user_id: str = Field(..., description="ユーザーID")
     name: str = Field(..., description="ポートフォリオ名")
     description: Optional[str] = Field(None, description="説明")
-    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC), description="作成日時")
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC), description="更新日時")
+    created_at: datetime = Field(default_factory=_utcnow, description="作成日時")
+    updated_at: datetime = Field(default_factory=_utcnow, description="更新日時")
     is_active: bool = Field(default=True, description="有効フラグ")
 
 
@@ -168,8 +196,8 @@ class PortfolioHolding(BaseModel):
     purchase_price: Decimal = Field(..., description="取得価格")
     purchase_date: datetime = Field(..., description="取得日")
     notes: Optional[str] = Field(None, description="メモ")
-    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC), description="作成日時")
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC), description="更新日時")
+    created_at: datetime = Field(default_factory=_utcnow, description="作成日時")
+    updated_at: datetime = Field(default_factory=_utcnow, description="更新日時")
     is_active: bool = Field(default=True, description="有効フラグ")
     
     @field_validator('symbol')
@@ -196,6 +224,9 @@ class PortfolioHolding(BaseModel):
 
 class ProfitLossCalculation(BaseModel):
     """損益計算結果"""
+    # 計算後に変更しない値オブジェクト
+    model_config = ConfigDict(frozen=True, extra='ignore')
+    
     holding_id: str = Field(..., description="保有ID")
     symbol: str = Field(..., description="銘柄コード")
     quantity: int = Field(..., description="保有株数")
@@ -205,7 +236,7 @@ class ProfitLossCalculation(BaseModel):
     current_value: Decimal = Field(..., description="現在評価額")
     unrealized_pnl: Decimal = Field(..., description="含み損益（金額）")
     unrealized_pnl_percent: Decimal = Field(..., description="含み損益（%）")
-    calculated_at: datetime = Field(default_factory=lambda: datetime.now(UTC), description="計算日時")
+    calculated_at: datetime = Field(default_factory=_utcnow, description="計算日時")
     
     @classmethod
     def calculate(cls, holding: PortfolioHolding, current_price: Decimal) -> 'ProfitLossCalculation':
@@ -215,7 +246,8 @@ class ProfitLossCalculation(BaseModel):
         unrealized_pnl = current_value - purchase_value
         unrealized_pnl_percent = (unrealized_pnl / purchase_value) * 100
         
-        return cls(
+        # 検証済みの保有銘柄から計算した値のみなので再検証しない
+        return cls.model_construct(
             holding_id=holding.holding_id,
             symbol=holding.symbol,
             quantity=holding.quantity,
@@ -238,17 +270,20 @@ class PortfolioProfitLossReport(BaseModel):
     total_current_value: Decimal = Field(..., description="総現在評価額")
     total_unrealized_pnl: Decimal = Field(..., description="総含み損益（金額）")
     total_unrealized_pnl_percent: Decimal = Field(..., description="総含み損益（%）")
-    generated_at: datetime = Field(default_factory=lambda: datetime.now(UTC), description="生成日時")
+    generated_at: datetime = Field(default_factory=_utcnow, description="生成日時")
     
     @classmethod
     def create_report(cls, portfolio: Portfolio, holdings_pnl: List[ProfitLossCalculation]) -> 'PortfolioProfitLossReport':
         """レポートを作成"""
-        total_purchase_value = sum(h.purchase_value for h in holdings_pnl)
-        total_current_value = sum(h.current_value for h in holdings_pnl)
+        total_purchase_value = total_current_value = Decimal('0')
+        for h in holdings_pnl:
+            total_purchase_value += h.purchase_value
+            total_current_value += h.current_value
         total_unrealized_pnl = total_current_value - total_purchase_value
         total_unrealized_pnl_percent = (total_unrealized_pnl / total_purchase_value * 100) if total_purchase_value > 0 else Decimal('0')
         
-        return cls(
+        # holdingsは生成済みの計算結果なので要素ごとの再検証を省く
+        return cls.model_construct(
             portfolio_id=portfolio.portfolio_id,
             user_id=portfolio.user_id,
             portfolio_name=portfolio.name,
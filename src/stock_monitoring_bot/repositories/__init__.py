@@ -1,7 +1,7 @@
 """
 DynamoDB操作リポジトリ
 """
-from .base import BaseRepository
+from .base import BaseRepository, close_shared_clients
 from .stock_repository import StockRepository, StockPriceRepository
 from .alert_repository import AlertRepository
 
@@ -9,5 +9,6 @@ __all__ = [
     'BaseRepository',
     'StockRepository', 
     'StockPriceRepository',
-    'AlertRepository'
+    'AlertRepository',
+    'close_shared_clients'
 ]
\ No newline at end of file
@@ -1,18 +1,40 @@
 """
 アラートリポジトリ
 """
+import asyncio
 import os
-from datetime import datetime, timedelta
-from typing import List, Optional
-from decimal import Decimal
+from datetime import datetime, timedelta, UTC
+from typing import Any, Dict, List, Optional, Tuple
 from botocore.exceptions import ClientError
 from aws_lambda_powertools import Logger
 
-from .base import BaseRepository
+from .base import BaseRepository, BATCH_WRITE_MAX_ITEMS
 from ..models.stock import Alert
 
 logger = Logger()
 
+BATCH_WRITE_CONCURRENCY = 8
+
+# 古いアラート削除時の並列スキャンのセグメント数
+CLEANUP_SCAN_SEGMENTS = 8
+
+# 重複チェックの同時クエリ数（接続プール上限50に対して余裕を持たせる）
+DUPLICATE_CHECK_CONCURRENCY = 16
+
+# 未送信アラート用のスパースGSI
+UNSENT_INDEX_NAME = 'unsent-index'
+UNSENT_GSI_PK = 'unsent_gsi_pk'
+UNSENT_GSI_VALUE = 'UNSENT'
+
+# 固定のExpressionAttributeValues（boto3は変更しないため使い回す）
+_UNSENT_EAV = {':u': {'S': UNSENT_GSI_VALUE}}
+_SENT_TRUE_EAV = {':sent': {'BOOL': True}}
+_SENT_FALSE_EAV = {':sent': {'BOOL': False}}
+# GSIキー導入前に書き込まれた未送信アラートの条件
+_LEGACY_UNSENT_FILTER = f'is_sent = :sent AND attribute_not_exists({UNSENT_GSI_PK})'
+# timestampは予約語のため別名で参照する
+_TIMESTAMP_EAN = {'#ts': 'timestamp'}
+
 
 class AlertRepository(BaseRepository):
     """アラートリポジトリ"""
@@ -25,94 +47,95 @@ class AlertRepository(BaseRepository):
     
     async def create_alert(self, alert: Alert) -> bool:
         """アラートを作成"""
+        # 入力値の検証（クライアント取得前に行う）
+        if not alert.alert_id or not alert.symbol:
+            raise ValueError("必須フィールドが不足しています")
+        if len(alert.symbol) > 10:
+            raise ValueError("銘柄コードが無効です")
+        
         try:
-            async with self._get_async_client() as client:
-                item = {
-                    'alert_id': alert.alert_id,
-                    'symbol': alert.symbol,
-                    'timestamp': alert.triggered_at.isoformat(),
-                    'alert_type': alert.alert_type,
-                    'message': alert.message,
-                    'triggered_at': alert.triggered_at.isoformat(),
-                    'price_at_trigger': float(alert.price_at_trigger) if alert.price_at_trigger else None,
-                    'volume_at_trigger': alert.volume_at_trigger,
-                    'threshold_value': float(alert.threshold_value) if alert.threshold_value else None,
-                    'is_sent': alert.is_sent,
-                    'sent_at': alert.sent_at.isoformat() if alert.sent_at else None
-                }
-                
-                # Noneの値を除外
-                item = {k: v for k, v in item.items() if v is not None}
-                
-                # 入力値の検証
-                if not alert.alert_id or not alert.symbol:
-                    raise ValueError("必須フィールドが不足しています")
-                if len(alert.symbol) > 10:
-                    raise ValueError("銘柄コードが無効です")
-                
-                await client.put_item(
-                    TableName=self.get_table_name(),
-                    Item=self._serialize_item(item)
-                )
-                
-                logger.info(f"アラートを作成しました: {alert.alert_id}")
-                return True
-                
+            client = await self._client()
+            # ソートキーと属性で同じ文字列を使い回す
+            triggered_iso = alert.triggered_at.isoformat()
+            item = {
+                'alert_id': alert.alert_id,
+                'symbol': alert.symbol,
+                'timestamp': triggered_iso,
+                'alert_type': alert.alert_type,
+                'message': alert.message,
+                'triggered_at': triggered_iso,
+                'price_at_trigger': alert.price_at_trigger,
+                'volume_at_trigger': alert.volume_at_trigger,
+                'threshold_value': alert.threshold_value,
+                'is_sent': alert.is_sent,
+                'sent_at': alert.sent_at.isoformat() if alert.sent_at else None,
+                # 未送信の間だけ属性を持たせ、スパースGSIに載せる
+                UNSENT_GSI_PK: None if alert.is_sent else UNSENT_GSI_VALUE
+            }
+            
+            # Noneの値を除外
+            item = {k: v for k, v in item.items() if v is not None}
+            
+            await client.put_item(
+                TableName=self.table_name,
+                Item=self._serialize_item(item)
+            )
+            
+            logger.info(f"アラートを作成しました: {alert.alert_id}")
+            return True
+            
         except ClientError as e:
             self._handle_client_error(e, "create_alert")
             return False
     
     async def get_alert(self, alert_id: str, timestamp: datetime) -> Optional[Alert]:
         """アラートを取得"""
+        # 入力値の検証（クライアント取得前に行う）
+        if not alert_id or not isinstance(timestamp, datetime):
+            raise ValueError("無効なパラメータです")
+        
         try:
-            async with self._get_async_client() as client:
-                # 入力値の検証
-                if not alert_id or not isinstance(timestamp, datetime):
-                    raise ValueError("無効なパラメータです")
-                
-                response = await client.get_item(
-                    TableName=self.get_table_name(),
-                    Key={
-                        'alert_id': {'S': alert_id},
-                        'timestamp': {'S': timestamp.isoformat()}
-                    }
-                )
-                
-                if 'Item' not in response:
-                    return None
-                
-                item = self._deserialize_item(response['Item'])
-                return self._item_to_alert(item)
-                
+            client = await self._client()
+            response = await client.get_item(
+                TableName=self.table_name,
+                Key={
+                    'alert_id': {'S': alert_id},
+                    'timestamp': {'S': timestamp.isoformat()}
+                }
+            )
+            
+            if 'Item' not in response:
+                return None
+            
+            item = self._deserialize_item(response['Item'])
+            return self._item_to_alert(item)
+            
         except ClientError as e:
             self._handle_client_error(e, "get_alert")
             return None
     
     async def update_alert_sent_status(self, alert_id: str, timestamp: datetime, sent_at: datetime) -> bool:
         """アラートの送信状態を更新"""
+        # 入力値の検証（クライアント取得前に行う）
+        if not alert_id or not isinstance(timestamp, datetime) or not isinstance(sent_at, datetime):
+            raise ValueError("無効なパラメータです")
+        
         try:
-            async with self._get_async_client() as client:
-                # 入力値の検証
-                if not alert_id or not isinstance(timestamp, datetime) or not isinstance(sent_at, datetime):
-                    raise ValueError("無効なパラメータです")
-                
-                await client.update_item(
-                    TableName=self.get_table_name(),
-                    Key={
-                        'alert_id': {'S': alert_id},
-                        'timestamp': {'S': timestamp.isoformat()}
-                    },
-                    UpdateExpression='SET is_sent = :sent, sent_at = :sent_at',
-                    ExpressionAttributeValues={
-                        ':sent': {'BOOL': True},
-                        ':sent_at': {'S': sent_at.isoformat()}
-                    },
-                    ConditionExpression='attribute_exists(alert_id)'
-                )
-                
-                logger.info(f"アラート送信状態を更新しました: {alert_id}")
-                return True
-                
+            client = await self._client()
+            await client.update_item(
+                TableName=self.table_name,
+                Key={
+                    'alert_id': {'S': alert_id},
+                    'timestamp': {'S': timestamp.isoformat()}
+                },
+                UpdateExpression=f'REMOVE {UNSENT_GSI_PK} SET is_sent = :sent, sent_at = :sent_at',
+                ExpressionAttributeValues={**_SENT_TRUE_EAV, ':sent_at': {'S': sent_at.isoformat()}},
+                ConditionExpression='attribute_exists(alert_id)'
+            )
+            
+            logger.info(f"アラート送信状態を更新しました: {alert_id}")
+            return True
+            
         except ClientError as e:
             if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
                 logger.warning(f"更新対象のアラートが見つかりません: {alert_id}")
@@ -124,29 +147,29 @@ class AlertRepository(BaseRepository):
     async def get_recent_alerts_by_symbol(self, symbol: str, hours: int = 1) -> List[Alert]:
         """指定銘柄の最近のアラートを取得"""
         try:
-            async with self._get_async_client() as client:
-                # GSIを使用してsymbolで検索
-                cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-                
-                response = await client.query(
-                    TableName=self.get_table_name(),
-                    IndexName='symbol-timestamp-index',
-                    KeyConditionExpression='symbol = :symbol AND #ts >= :cutoff',
-                    ExpressionAttributeNames={'#ts': 'timestamp'},
-                    ExpressionAttributeValues={
-                        ':symbol': {'S': symbol},
-                        ':cutoff': {'S': cutoff_time.isoformat()}
-                    },
-                    ScanIndexForward=False  # 降順（最新から）
-                )
-                
-                alerts = []
-                for item in response.get('Items', []):
-                    deserialized = self._deserialize_item(item)
-                    alerts.append(self._item_to_alert(deserialized))
-                
-                return alerts
-                
+            client = await self._client()
+            # GSIを使用してsymbolで検索
+            cutoff_time = datetime.now(UTC) - timedelta(hours=hours)
+            
+            response = await client.query(
+                TableName=self.table_name,
+                IndexName='symbol-timestamp-index',
+                KeyConditionExpression='symbol = :symbol AND #ts >= :cutoff',
+                ExpressionAttributeNames=_TIMESTAMP_EAN,
+                ExpressionAttributeValues={
+                    ':symbol': {'S': symbol},
+                    ':cutoff': {'S': cutoff_time.isoformat()}
+                },
+                ScanIndexForward=False  # 降順（最新から）
+            )
+            
+            alerts = []
+            for item in response.get('Items', []):
+                deserialized = self._deserialize_item(item)
+                alerts.append(self._item_to_alert(deserialized))
+            
+            return alerts
+            
         except ClientError as e:
             self._handle_client_error(e, "get_recent_alerts_by_symbol")
             return []
@@ -154,41 +177,131 @@ class AlertRepository(BaseRepository):
     async def get_unsent_alerts(self, limit: int = 100) -> List[Alert]:
         """未送信のアラートを取得"""
         try:
-            async with self._get_async_client() as client:
-                response = await client.scan(
-                    TableName=self.get_table_name(),
-                    FilterExpression='is_sent = :sent',
-                    ExpressionAttributeValues={':sent': {'BOOL': False}},
-                    Limit=limit
-                )
-                
-                alerts = []
-                for item in response.get('Items', []):
-                    deserialized = self._deserialize_item(item)
-                    alerts.append(self._item_to_alert(deserialized))
-                
-                # 発生時刻でソート（古いものから）
-                alerts.sort(key=lambda x: x.triggered_at)
-                
-                logger.info(f"未送信アラートを {len(alerts)} 件取得しました")
-                return alerts
-                
+            client = await self._client()
+            # 未送信アラートのみを持つスパースGSIを発生時刻順にクエリ
+            response = await client.query(
+                TableName=self.table_name,
+                IndexName=UNSENT_INDEX_NAME,
+                KeyConditionExpression=f'{UNSENT_GSI_PK} = :u',
+                ExpressionAttributeValues=_UNSENT_EAV,
+                Limit=limit,
+                ScanIndexForward=True  # 昇順（古いものから）
+            )
+            
+            alerts = []
+            for item in response.get('Items', []):
+                deserialized = self._deserialize_item(item)
+                alerts.append(self._item_to_alert(deserialized))
+            
+            if not alerts:
+                # GSIキー導入前のアイテムはbackfill_unsent_indexの実行までGSIに現れないためスキャンで補う
+                alerts = await self._scan_legacy_unsent_alerts(client, limit)
+            
+            logger.info(f"未送信アラートを {len(alerts)} 件取得しました")
+            return alerts
+            
         except ClientError as e:
             self._handle_client_error(e, "get_unsent_alerts")
             return []
     
+    async def _scan_legacy_unsent_alerts(self, client, limit: int) -> List[Alert]:
+        """GSIキーを持たない未送信アラートをスキャンで取得（発生時刻の古い順）"""
+        paginator = client.get_paginator('scan')
+        alerts = []
+        async for page in paginator.paginate(
+            TableName=self.table_name,
+            FilterExpression=_LEGACY_UNSENT_FILTER,
+            ExpressionAttributeValues=_SENT_FALSE_EAV
+        ):
+            for item in page.get('Items', []):
+                deserialized = self._deserialize_item(item)
+                alerts.append(self._item_to_alert(deserialized))
+        
+        alerts.sort(key=lambda alert: alert.triggered_at)
+        return alerts[:limit]
+    
+    async def backfill_unsent_index(self) -> int:
+        """
+        GSIキー導入前に書き込まれた未送信アラートにunsent_gsi_pkを設定する（1回限りの移行用）
+        
+        Returns:
+            int: GSIキーを設定した件数
+        """
+        try:
+            client = await self._client()
+            paginator = client.get_paginator('scan')
+            updated = 0
+            async for page in paginator.paginate(
+                TableName=self.table_name,
+                ProjectionExpression='alert_id, #ts',
+                FilterExpression=_LEGACY_UNSENT_FILTER,
+                ExpressionAttributeNames=_TIMESTAMP_EAN,
+                ExpressionAttributeValues=_SENT_FALSE_EAV
+            ):
+                for key in page.get('Items', []):
+                    try:
+                        await client.update_item(
+                            TableName=self.table_name,
+                            Key=key,
+                            UpdateExpression=f'SET {UNSENT_GSI_PK} = :u',
+                            # スキャン後に送信済みになったアラートには設定しない
+                            ConditionExpression='is_sent = :sent',
+                            ExpressionAttributeValues={**_UNSENT_EAV, **_SENT_FALSE_EAV}
+                        )
+                        updated += 1
+                    except ClientError as e:
+                        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                            raise
+            
+            logger.info(f"未送信アラート {updated} 件にGSIキーを設定しました")
+            return updated
+            
+        except ClientError as e:
+            self._handle_client_error(e, "backfill_unsent_index")
+            return 0
+    
+    async def get_last_alert_of_type(self, symbol: str, alert_type: str, since: datetime) -> Optional[Alert]:
+        """指定時刻以降で最新の同種アラートを取得（種別の絞り込みはDynamoDB側で実施）"""
+        try:
+            client = await self._client()
+            query_kwargs = {
+                'TableName': self.table_name,
+                'IndexName': 'symbol-timestamp-index',
+                'KeyConditionExpression': 'symbol = :symbol AND #ts >= :cutoff',
+                'FilterExpression': 'alert_type = :type',
+                'ExpressionAttributeNames': _TIMESTAMP_EAN,
+                'ExpressionAttributeValues': {
+                    ':symbol': {'S': symbol},
+                    ':cutoff': {'S': since.isoformat()},
+                    ':type': {'S': alert_type}
+                },
+                'ScanIndexForward': False  # 降順（最新から）
+            }
+            
+            # FilterExpressionはLimit適用後に評価されるため、Limitは付けずに
+            # 一致する1件が見つかるまでページを辿る
+            while True:
+                response = await client.query(**query_kwargs)
+                items = response.get('Items')
+                if items:
+                    return self._item_to_alert(self._deserialize_item(items[0]))
+                
+                last_key = response.get('LastEvaluatedKey')
+                if not last_key:
+                    return None
+                query_kwargs['ExclusiveStartKey'] = last_key
+            
+        except ClientError as e:
+            self._handle_client_error(e, "get_last_alert_of_type")
+            return None
+    
     async def check_duplicate_alert(self, symbol: str, alert_type: str, cooldown_minutes: int = 30) -> bool:
         """重複アラートをチェック"""
         try:
-            cutoff_time = datetime.utcnow() - timedelta(minutes=cooldown_minutes)
-            recent_alerts = await self.get_recent_alerts_by_symbol(symbol, hours=1)
-            
-            # 同じ種類のアラートがクールダウン時間内にあるかチェック
-            for alert in recent_alerts:
-                if (alert.alert_type == alert_type and 
-                    alert.triggered_at > cutoff_time):
-                    logger.info(f"重複アラートを検出: {symbol} - {alert_type}")
-                    return True
+            cutoff_time = datetime.now(UTC) - timedelta(minutes=cooldown_minutes)
+            if await self.get_last_alert_of_type(symbol, alert_type, cutoff_time):
+                logger.info(f"重複アラートを検出: {symbol} - {alert_type}")
+                return True
             
             return False
             
@@ -196,55 +309,112 @@ class AlertRepository(BaseRepository):
             logger.error(f"重複アラートチェックでエラー: {e}")
             return False  # エラー時は重複なしとして処理
     
-    async def cleanup_old_alerts(self, days: int = 30) -> int:
+    async def check_duplicate_alerts_bulk(
+        self, specs: List[Tuple[str, str]], cooldown_minutes: int = 30
+    ) -> Dict[Tuple[str, str], bool]:
+        """複数の(銘柄, アラート種別)の重複を並行してチェック"""
+        cutoff_time = datetime.now(UTC) - timedelta(minutes=cooldown_minutes)
+        semaphore = asyncio.Semaphore(DUPLICATE_CHECK_CONCURRENCY)
+        unique_specs = list(dict.fromkeys(specs))
+        
+        async def _check_one(symbol: str, alert_type: str) -> bool:
+            async with semaphore:
+                try:
+                    return await self.get_last_alert_of_type(symbol, alert_type, cutoff_time) is not None
+                except Exception as e:
+                    logger.error(f"重複アラートチェックでエラー: {e}")
+                    return False  # エラー時は重複なしとして処理
+        
+        results = await asyncio.gather(
+            *(_check_one(symbol, alert_type) for symbol, alert_type in unique_specs)
+        )
+        return dict(zip(unique_specs, results))
+    
+    async def cleanup_old_alerts(self, days: int = 30, total_segments: int = CLEANUP_SCAN_SEGMENTS) -> int:
         """古いアラートを削除"""
+        if total_segments < 1:
+            raise ValueError("total_segmentsは1以上である必要があります")
+        
         try:
-            async with self._get_async_client() as client:
-                cutoff_time = datetime.utcnow() - timedelta(days=days)
-                
-                # 古いアラートを検索
-                response = await client.scan(
-                    TableName=self.get_table_name(),
-                    FilterExpression='triggered_at < :cutoff',
-                    ExpressionAttributeValues={
-                        ':cutoff': {'S': cutoff_time.isoformat()}
-                    },
-                    ProjectionExpression='alert_id, #ts',
-                    ExpressionAttributeNames={'#ts': 'timestamp'}
-                )
-                
-                deleted_count = 0
-                for item in response.get('Items', []):
-                    try:
-                        await client.delete_item(
-                            TableName=self.get_table_name(),
-                            Key={
-                                'alert_id': item['alert_id'],
-                                'timestamp': item['timestamp']
-                            }
+            client = await self._client()
+            cutoff_time = datetime.now(UTC) - timedelta(days=days)
+            
+            table_name = self.table_name
+            semaphore = asyncio.Semaphore(BATCH_WRITE_CONCURRENCY)
+            
+            async def _run_batch(keys: List[Dict[str, Any]]) -> int:
+                async with semaphore:
+                    return await self._batch_delete(client, table_name, keys)
+            
+            # 古いアラートを検索（各セグメントの1MB単位のページを全て辿る）
+            base_scan_kwargs = {
+                'TableName': table_name,
+                'FilterExpression': 'triggered_at < :cutoff',
+                'ExpressionAttributeValues': {
+                    ':cutoff': {'S': cutoff_time.isoformat()}
+                },
+                'ProjectionExpression': 'alert_id, #ts',
+                'ExpressionAttributeNames': _TIMESTAMP_EAN,
+                'TotalSegments': total_segments
+            }
+            
+            # 次ページのスキャン中も前ページの削除を進める
+            delete_tasks = []
+            
+            async def _scan_segment(segment: int) -> None:
+                scan_kwargs = {**base_scan_kwargs, 'Segment': segment}
+                while True:
+                    response = await client.scan(**scan_kwargs)
+                    items = response.get('Items', [])
+                    for i in range(0, len(items), BATCH_WRITE_MAX_ITEMS):
+                        delete_tasks.append(
+                            asyncio.create_task(_run_batch(items[i:i + BATCH_WRITE_MAX_ITEMS]))
                         )
-                        deleted_count += 1
-                    except ClientError as e:
-                        logger.warning(f"アラート削除に失敗: {e}")
-                
-                logger.info(f"古いアラートを {deleted_count} 件削除しました")
-                return deleted_count
-                
+                    
+                    last_key = response.get('LastEvaluatedKey')
+                    if not last_key:
+                        return
+                    scan_kwargs['ExclusiveStartKey'] = last_key
+            
+            try:
+                await asyncio.gather(*(_scan_segment(segment) for segment in range(total_segments)))
+            except BaseException:
+                for task in delete_tasks:
+                    task.cancel()
+                await asyncio.gather(*delete_tasks, return_exceptions=True)
+                raise
+            
+            results = await asyncio.gather(*delete_tasks)
+            deleted_count = sum(results)
+            
+            logger.info(f"古いアラートを {deleted_count} 件削除しました")
+            return deleted_count
+            
         except ClientError as e:
             self._handle_client_error(e, "cleanup_old_alerts")
             return 0
     
+    async def _batch_delete(self, client, table_name: str, keys: List[Dict[str, Any]]) -> int:
+        """BatchWriteItemでまとめて削除"""
+        requests = [
+            {'DeleteRequest': {'Key': {'alert_id': key['alert_id'], 'timestamp': key['timestamp']}}}
+            for key in keys
+        ]
+        return await self._batch_write(client, table_name, requests)
+    
     def _item_to_alert(self, item: dict) -> Alert:
-        """DynamoDBアイテムをAlertに変換"""
-        return Alert(
+        """DynamoDBアイテムをAlertに変換（自前で書き込んだデータのため検証は省略）"""
+        volume = item.get('volume_at_trigger')
+        sent_at = item.get('sent_at')
+        return Alert.model_construct(
             alert_id=item['alert_id'],
             symbol=item['symbol'],
             alert_type=item['alert_type'],
             message=item['message'],
             triggered_at=datetime.fromisoformat(item['triggered_at']),
-            price_at_trigger=Decimal(str(item['price_at_trigger'])) if item.get('price_at_trigger') else None,
-            volume_at_trigger=item.get('volume_at_trigger'),
-            threshold_value=Decimal(str(item['threshold_value'])) if item.get('threshold_value') else None,
+            price_at_trigger=item.get('price_at_trigger'),
+            volume_at_trigger=int(volume) if volume is not None else None,
+            threshold_value=item.get('threshold_value'),
             is_sent=item['is_sent'],
-            sent_at=datetime.fromisoformat(item['sent_at']) if item.get('sent_at') else None
+            sent_at=datetime.fromisoformat(sent_at) if sent_at else None
         )
\ No newline at end of file
@@ -1,19 +1,82 @@
 """
 ベースリポジトリクラス
 """
+import asyncio
+import functools
 import os
-from abc import ABC, abstractmethod
-from typing import Any, Dict
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError, BotoCoreError
 import aioboto3
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
 from aws_lambda_powertools import Logger
-from contextlib import asynccontextmanager
 
 logger = Logger()
 
+# 全クライアント共通のリトライ・接続プール設定
+_BOTO_CONFIG = Config(
+    retries={
+        'max_attempts': 5,
+        'mode': 'adaptive'
+    },
+    max_pool_connections=50,
+    # Lambdaのタイムアウト内でリトライできるよう短めに設定
+    connect_timeout=2,
+    read_timeout=5,
+    # ウォームコンテナ間で接続を維持する
+    tcp_keepalive=True
+)
 
-class BaseRepository(ABC):
+# BatchWriteItemの1リクエストあたりの上限件数と再送設定
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_WRITE_MAX_RETRIES = 5
+BATCH_WRITE_BASE_DELAY = 0.05
+
+_SERIALIZER = TypeSerializer()
+_DESERIALIZER = TypeDeserializer()
+
+
+def _deserialize_value(value: Dict[str, Any]) -> Any:
+    """単一の属性値をデシリアライズ（型タグで直接ディスパッチ）"""
+    (tag, raw), = value.items()
+    handler = _VALUE_DESERIALIZERS.get(tag)
+    if handler is None:
+        # バイナリ型など稀な型はboto3に任せる
+        return _DESERIALIZER.deserialize(value)
+    return handler(raw)
+
+
+_VALUE_DESERIALIZERS = {
+    'S': lambda raw: raw,
+    'N': Decimal,
+    'BOOL': lambda raw: raw,
+    'NULL': lambda raw: None,
+    'M': lambda raw: {k: _deserialize_value(v) for k, v in raw.items()},
+    'L': lambda raw: [_deserialize_value(v) for v in raw],
+    'SS': set,
+    'NS': lambda raw: {Decimal(v) for v in raw},
+}
+
+# Lambdaコンテナ内で使い回す非同期クライアント（キー: (ループ, リージョン, エンドポイント)）
+_shared_clients: Dict[Tuple[asyncio.AbstractEventLoop, str, Optional[str]], Any] = {}
+_client_locks: Dict[Tuple[asyncio.AbstractEventLoop, str, Optional[str]], asyncio.Lock] = {}
+
+
+async def close_shared_clients() -> None:
+    """現在のイベントループに紐づく共有クライアントを閉じる"""
+    loop = asyncio.get_running_loop()
+    for key in [k for k in _shared_clients if k[0] is loop]:
+        client = _shared_clients.pop(key)
+        _client_locks.pop(key, None)
+        try:
+            await client.__aexit__(None, None, None)
+        except Exception as e:
+            logger.warning(f"DynamoDBクライアントのクローズに失敗: {type(e).__name__}")
+
+
+class BaseRepository:
     """ベースリポジトリクラス"""
     
     def __init__(self):
@@ -26,73 +89,67 @@ class BaseRepository(ABC):
         
         # 接続プールサイズ制限
         self.max_pool_connections = 50
-        self.max_retries = 3
+        self.max_retries = 5
         
     def _get_client(self):
         """DynamoDBクライアントを取得"""
         try:
-            # リトライ設定
-            from botocore.config import Config
-            config = Config(
-                retries={
-                    'max_attempts': 3,
-                    'mode': 'adaptive'
-                },
-                max_pool_connections=50
-            )
-            
             if self.endpoint_url:
                 # ローカル開発環境
                 return boto3.client(
                     'dynamodb',
                     region_name=self.region,
                     endpoint_url=self.endpoint_url,
-                    config=config
+                    config=_BOTO_CONFIG
                 )
             else:
                 # AWS環境
                 return boto3.client(
                     'dynamodb',
                     region_name=self.region,
-                    config=config
+                    config=_BOTO_CONFIG
                 )
         except Exception as e:
             logger.error(f"DynamoDBクライアント作成エラー: {type(e).__name__}")
             raise
     
-    @asynccontextmanager
-    async def _get_async_client(self):
-        """非同期DynamoDBクライアントを取得（コンテキストマネージャー）"""
-        session = aioboto3.Session()
-        
-        # botocore Configオブジェクトを使用
-        from botocore.config import Config
-        config = Config(
-            retries={
-                'max_attempts': 3,
-                'mode': 'adaptive'
-            },
-            max_pool_connections=50
-        )
+    async def _client(self):
+        """非同期DynamoDBクライアントを取得（イベントループ単位で共有）"""
+        loop = asyncio.get_running_loop()
+        key = (loop, self.region, self.endpoint_url)
+        client = _shared_clients.get(key)
+        if client is not None:
+            return client
         
-        # aioboto3のclientメソッドの引数
-        client_kwargs = {
-            'service_name': 'dynamodb',
-            'region_name': self.region,
-            'config': config
-        }
-        
-        if self.endpoint_url:
-            client_kwargs['endpoint_url'] = self.endpoint_url
-        
-        client = session.client(**client_kwargs)
-        
-        try:
-            async with client as dynamo_client:
-                yield dynamo_client
-        except Exception as e:
-            logger.error(f"DynamoDBクライアントエラー: {type(e).__name__}: {str(e)}")
-            raise
+        lock = _client_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            client = _shared_clients.get(key)
+            if client is not None:
+                return client
+            
+            # 閉じられたループに紐づくクライアントは再利用できないため破棄
+            for stale_key in [k for k in _shared_clients if k[0].is_closed()]:
+                _shared_clients.pop(stale_key, None)
+                _client_locks.pop(stale_key, None)
+            
+            # aioboto3のclientメソッドの引数
+            client_kwargs = {
+                'service_name': 'dynamodb',
+                'region_name': self.region,
+                'config': _BOTO_CONFIG
+            }
+            
+            if self.endpoint_url:
+                client_kwargs['endpoint_url'] = self.endpoint_url
+            
+            try:
+                client = await aioboto3.Session().client(**client_kwargs).__aenter__()
+            except Exception as e:
+                logger.error(f"DynamoDBクライアントエラー: {type(e).__name__}: {str(e)}")
+                raise
+            
+            _shared_clients[key] = client
+            return client
     
     def _handle_client_error(self, error: Exception, operation: str) -> None:
         """DynamoDBクライアントエラーをハンドリング"""
@@ -131,87 +188,41 @@ class BaseRepository(ABC):
             logger.error(f"予期しないエラー in {operation}: {type(error)}")
             raise RuntimeError("予期しないエラーが発生しました")
     
-    @abstractmethod
+    async def _batch_write(self, client, table_name: str, requests: List[Dict[str, Any]]) -> int:
+        """BatchWriteItemを実行し処理件数を返す（UnprocessedItemsは指数バックオフで再送）"""
+        request_items = {table_name: requests}
+        
+        for attempt in range(BATCH_WRITE_MAX_RETRIES + 1):
+            try:
+                response = await client.batch_write_item(RequestItems=request_items)
+            except ClientError as e:
+                logger.warning(f"一括書き込みに失敗: {e}")
+                break
+            
+            request_items = response.get('UnprocessedItems') or {}
+            if not request_items:
+                return len(requests)
+            if attempt < BATCH_WRITE_MAX_RETRIES:
+                await asyncio.sleep(BATCH_WRITE_BASE_DELAY * (2 ** attempt))
+        
+        unprocessed = len(request_items.get(table_name, []))
+        if unprocessed:
+            logger.warning(f"未処理の書き込みが {unprocessed} 件残りました: {table_name}")
+        return len(requests) - unprocessed
+    
     def get_table_name(self) -> str:
-        """テーブル名を取得"""
-        pass
+        """テーブル名を取得（サブクラスで実装）"""
+        raise NotImplementedError
     
-    def _serialize_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
-        """PythonオブジェクトをDynamoDB形式にシリアライズ"""
-        serialized = {}
-        for key, value in item.items():
-            if value is None:
-                continue
-            elif isinstance(value, bool):  # boolを先にチェック（intのサブクラスなので）
-                serialized[key] = {'BOOL': value}
-            elif isinstance(value, str):
-                serialized[key] = {'S': value}
-            elif isinstance(value, (int, float)):
-                serialized[key] = {'N': str(value)}
-            elif isinstance(value, dict):
-                serialized[key] = {'M': self._serialize_item(value)}
-            elif isinstance(value, list):
-                serialized[key] = {'L': [self._serialize_value(v) for v in value]}
-            else:
-                # datetime等はISO文字列に変換
-                serialized[key] = {'S': str(value)}
-        return serialized
+    @functools.cached_property
+    def table_name(self) -> str:
+        """テーブル名（環境変数の参照はインスタンス毎に1度だけ行う）"""
+        return self.get_table_name()
     
-    def _serialize_value(self, value: Any) -> Dict[str, Any]:
-        """単一値をDynamoDB形式にシリアライズ"""
-        if isinstance(value, bool):  # boolを先にチェック（intのサブクラスなので）
-            return {'BOOL': value}
-        elif isinstance(value, str):
-            return {'S': value}
-        elif isinstance(value, (int, float)):
-            return {'N': str(value)}
-        elif isinstance(value, dict):
-            return {'M': self._serialize_item(value)}
-        elif isinstance(value, list):
-            return {'L': [self._serialize_value(v) for v in value]}
-        else:
-            return {'S': str(value)}
+    def _serialize_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """PythonオブジェクトをDynamoDB形式にシリアライズ（Noneは除外）"""
+        return {k: _SERIALIZER.serialize(v) for k, v in item.items() if v is not None}
     
     def _deserialize_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
-        """DynamoDB形式をPythonオブジェクトにデシリアライズ"""
-        deserialized = {}
-        for key, value in item.items():
-            if 'S' in value:
-                deserialized[key] = value['S']
-            elif 'N' in value:
-                # 数値は適切な型に変換
-                num_str = value['N']
-                if '.' in num_str:
-                    deserialized[key] = float(num_str)
-                else:
-                    deserialized[key] = int(num_str)
-            elif 'BOOL' in value:
-                deserialized[key] = value['BOOL']
-            elif 'M' in value:
-                deserialized[key] = self._deserialize_item(value['M'])
-            elif 'L' in value:
-                deserialized[key] = [self._deserialize_value(v) for v in value['L']]
-            elif 'NULL' in value:
-                deserialized[key] = None
-        return deserialized
-    
-    def _deserialize_value(self, value: Dict[str, Any]) -> Any:
-        """単一値をデシリアライズ"""
-        if 'S' in value:
-            return value['S']
-        elif 'N' in value:
-            num_str = value['N']
-            if '.' in num_str:
-                return float(num_str)
-            else:
-                return int(num_str)
-        elif 'BOOL' in value:
-            return value['BOOL']
-        elif 'M' in value:
-            return self._deserialize_item(value['M'])
-        elif 'L' in value:
-            return [self._deserialize_value(v) for v in value['L']]
-        elif 'NULL' in value:
-            return None
-        else:
-            return None
\ No newline at end of file
+        """DynamoDB形式をPythonオブジェクトにデシリアライズ（数値はDecimal）"""
+        return {k: _deserialize_value(v) for k, v in item.items()}
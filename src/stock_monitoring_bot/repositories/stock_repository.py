@@ -1,18 +1,73 @@
 """
 株式データリポジトリ
 """
+import asyncio
+import itertools
 import os
-from datetime import datetime
-from typing import List, Optional
-from decimal import Decimal
+from datetime import datetime, UTC
+from typing import Any, Dict, List, Optional, Sequence
 from botocore.exceptions import ClientError
 from aws_lambda_powertools import Logger
 
-from .base import BaseRepository
+from .base import BaseRepository, BATCH_WRITE_MAX_ITEMS
 from ..models.stock import MonitoredStock, StockPrice
 
 logger = Logger()
 
+# 監視中の銘柄のみを持つスパースGSI
+ACTIVE_INDEX_NAME = 'active-index'
+ACTIVE_GSI_PK = 'is_active_pk'
+ACTIVE_GSI_VALUE = '1'
+
+# 一覧取得時の1ページあたりの件数
+LIST_PAGE_SIZE = 1000
+
+# 固定のExpressionAttributeValues（boto3は変更しないため使い回す）
+_ACTIVE_EAV = {':a': {'S': ACTIVE_GSI_VALUE}}
+_ACTIVE_PK_VALUE = {'S': ACTIVE_GSI_VALUE}
+_TRUE_EAV = {':true': {'BOOL': True}}
+_UPDATE_EXPRESSION_NAMES = {'#name': 'name'}  # nameは予約語のため
+
+
+def _build_update_expression(has_upper: bool, has_lower: bool, is_active: bool) -> str:
+    """update_monitored_stockのUpdateExpressionを組み立てる（Noneの閾値とGSIキーはREMOVE）"""
+    set_clauses = [
+        "#name = :name",
+        "market = :market",
+        "is_active = :is_active",
+        "updated_at = :updated_at",
+        "volume_threshold_multiplier = :volume_multiplier"
+    ]
+    remove_clauses = []
+    
+    if has_upper:
+        set_clauses.append("price_threshold_upper = :upper")
+    else:
+        remove_clauses.append("price_threshold_upper")
+    
+    if has_lower:
+        set_clauses.append("price_threshold_lower = :lower")
+    else:
+        remove_clauses.append("price_threshold_lower")
+    
+    # スパースGSIのキーは監視中のみ保持
+    if is_active:
+        set_clauses.append(f"{ACTIVE_GSI_PK} = :active_pk")
+    else:
+        remove_clauses.append(ACTIVE_GSI_PK)
+    
+    update_expression = "SET " + ", ".join(set_clauses)
+    if remove_clauses:
+        update_expression += " REMOVE " + ", ".join(remove_clauses)
+    return update_expression
+
+
+# (上限閾値あり, 下限閾値あり, 監視中) の全組み合わせを事前に組み立てておく
+_UPDATE_EXPRESSIONS = {
+    flags: _build_update_expression(*flags)
+    for flags in itertools.product((True, False), repeat=3)
+}
+
 
 class StockRepository(BaseRepository):
     """株式データリポジトリ"""
@@ -25,46 +80,48 @@ class StockRepository(BaseRepository):
     
     async def create_monitored_stock(self, stock: MonitoredStock) -> bool:
         """監視対象株式を作成"""
+        # 入力値の検証（クライアント取得前に行う）
+        if not stock.symbol or len(stock.symbol) > 10:
+            raise ValueError("無効な銘柄コードです")
+        
         try:
-            async with self._get_async_client() as client:
-                # デバッグ用ログ
-                logger.error(f"=== DEBUG CREATE STOCK ===")
-                logger.error(f"Symbol: {stock.symbol}")
-                logger.error(f"is_active type: {type(stock.is_active)}, value: {stock.is_active}")
-                
-                item = {
-                    'symbol': stock.symbol,
-                    'name': stock.name,
-                    'market': stock.market,
-                    'price_threshold_upper': float(stock.price_threshold_upper) if stock.price_threshold_upper else None,
-                    'price_threshold_lower': float(stock.price_threshold_lower) if stock.price_threshold_lower else None,
-                    'volume_threshold_multiplier': float(stock.volume_threshold_multiplier),
-                    'is_active': stock.is_active,
-                    'created_at': stock.created_at.isoformat(),
-                    'updated_at': stock.updated_at.isoformat()
-                }
-                
-                # Noneの値を除外
-                item = {k: v for k, v in item.items() if v is not None}
-                
-                logger.error(f"Item before serialization: {item}")
-                
-                # 入力値の検証
-                if not stock.symbol or len(stock.symbol) > 10:
-                    raise ValueError("無効な銘柄コードです")
-                
-                serialized_item = self._serialize_item(item)
-                logger.error(f"Serialized item: {serialized_item}")
-                
-                await client.put_item(
-                    TableName=self.get_table_name(),
-                    Item=serialized_item,
-                    ConditionExpression='attribute_not_exists(symbol)'  # 重複防止
-                )
-                
-                logger.info(f"監視対象株式を作成しました: {stock.symbol}")
-                return True
-                
+            client = await self._client()
+            # デバッグ用ログ
+            logger.error(f"=== DEBUG CREATE STOCK ===")
+            logger.error(f"Symbol: {stock.symbol}")
+            logger.error(f"is_active type: {type(stock.is_active)}, value: {stock.is_active}")
+            
+            item = {
+                'symbol': stock.symbol,
+                'name': stock.name,
+                'market': stock.market,
+                'price_threshold_upper': stock.price_threshold_upper if stock.price_threshold_upper else None,
+                'price_threshold_lower': stock.price_threshold_lower if stock.price_threshold_lower else None,
+                'volume_threshold_multiplier': stock.volume_threshold_multiplier,
+                'is_active': stock.is_active,
+                'created_at': stock.created_at.isoformat(),
+                'updated_at': stock.updated_at.isoformat(),
+                # 監視中の間だけ属性を持たせ、スパースGSIに載せる
+                ACTIVE_GSI_PK: ACTIVE_GSI_VALUE if stock.is_active else None
+            }
+            
+            # Noneの値を除外
+            item = {k: v for k, v in item.items() if v is not None}
+            
+            logger.error(f"Item before serialization: {item}")
+            
+            serialized_item = self._serialize_item(item)
+            logger.error(f"Serialized item: {serialized_item}")
+            
+            await client.put_item(
+                TableName=self.table_name,
+                Item=serialized_item,
+                ConditionExpression='attribute_not_exists(symbol)'  # 重複防止
+            )
+            
+            logger.info(f"監視対象株式を作成しました: {stock.symbol}")
+            return True
+            
         except ClientError as e:
             if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
                 logger.warning(f"株式は既に監視対象です: {stock.symbol}")
@@ -75,23 +132,23 @@ class StockRepository(BaseRepository):
     
     async def get_monitored_stock(self, symbol: str) -> Optional[MonitoredStock]:
         """監視対象株式を取得"""
+        # 入力値の検証（クライアント取得前に行う）
+        if not symbol or len(symbol) > 10:
+            raise ValueError("無効な銘柄コードです")
+        
         try:
-            async with self._get_async_client() as client:
-                # 入力値の検証
-                if not symbol or len(symbol) > 10:
-                    raise ValueError("無効な銘柄コードです")
-                
-                response = await client.get_item(
-                    TableName=self.get_table_name(),
-                    Key={'symbol': {'S': symbol}}
-                )
-                
-                if 'Item' not in response:
-                    return None
-                
-                item = self._deserialize_item(response['Item'])
-                return self._item_to_monitored_stock(item)
-                
+            client = await self._client()
+            response = await client.get_item(
+                TableName=self.table_name,
+                Key={'symbol': {'S': symbol}}
+            )
+            
+            if 'Item' not in response:
+                return None
+            
+            item = self._deserialize_item(response['Item'])
+            return self._item_to_monitored_stock(item)
+            
         except ClientError as e:
             self._handle_client_error(e, "get_monitored_stock")
             return None
@@ -99,44 +156,40 @@ class StockRepository(BaseRepository):
     async def update_monitored_stock(self, stock: MonitoredStock) -> bool:
         """監視対象株式を更新"""
         try:
-            async with self._get_async_client() as client:
-                stock.updated_at = datetime.utcnow()
-                
-                update_expression = "SET #name = :name, market = :market, is_active = :is_active, updated_at = :updated_at, volume_threshold_multiplier = :volume_multiplier"
-                expression_attribute_names = {'#name': 'name'}  # nameは予約語のため
-                expression_attribute_values = {
-                    ':name': {'S': stock.name},
-                    ':market': {'S': stock.market},
-                    ':is_active': {'BOOL': stock.is_active},
-                    ':updated_at': {'S': stock.updated_at.isoformat()},
-                    ':volume_multiplier': {'N': str(float(stock.volume_threshold_multiplier))}
-                }
-                
-                # 価格閾値の更新（Noneの場合は削除）
-                if stock.price_threshold_upper is not None:
-                    update_expression += ", price_threshold_upper = :upper"
-                    expression_attribute_values[':upper'] = {'N': str(float(stock.price_threshold_upper))}
-                else:
-                    update_expression += " REMOVE price_threshold_upper"
-                
-                if stock.price_threshold_lower is not None:
-                    update_expression += ", price_threshold_lower = :lower"
-                    expression_attribute_values[':lower'] = {'N': str(float(stock.price_threshold_lower))}
-                else:
-                    update_expression += " REMOVE price_threshold_lower"
-                
-                await client.update_item(
-                    TableName=self.get_table_name(),
-                    Key={'symbol': {'S': stock.symbol}},
-                    UpdateExpression=update_expression,
-                    ExpressionAttributeNames=expression_attribute_names,
-                    ExpressionAttributeValues=expression_attribute_values,
-                    ConditionExpression='attribute_exists(symbol)'
-                )
-                
-                logger.info(f"監視対象株式を更新しました: {stock.symbol}")
-                return True
-                
+            client = await self._client()
+            stock.updated_at = datetime.now(UTC)
+            
+            upper = stock.price_threshold_upper
+            lower = stock.price_threshold_lower
+            # Decimalは文字列化してもそのままDynamoDBの数値型として精度を保てる
+            expression_attribute_values = {
+                ':name': {'S': stock.name},
+                ':market': {'S': stock.market},
+                ':is_active': {'BOOL': stock.is_active},
+                ':updated_at': {'S': stock.updated_at.isoformat()},
+                ':volume_multiplier': {'N': str(stock.volume_threshold_multiplier)}
+            }
+            if upper is not None:
+                expression_attribute_values[':upper'] = {'N': str(upper)}
+            if lower is not None:
+                expression_attribute_values[':lower'] = {'N': str(lower)}
+            if stock.is_active:
+                expression_attribute_values[':active_pk'] = _ACTIVE_PK_VALUE
+            
+            update_expression = _UPDATE_EXPRESSIONS[(upper is not None, lower is not None, stock.is_active)]
+            
+            await client.update_item(
+                TableName=self.table_name,
+                Key={'symbol': {'S': stock.symbol}},
+                UpdateExpression=update_expression,
+                ExpressionAttributeNames=_UPDATE_EXPRESSION_NAMES,
+                ExpressionAttributeValues=expression_attribute_values,
+                ConditionExpression='attribute_exists(symbol)'
+            )
+            
+            logger.info(f"監視対象株式を更新しました: {stock.symbol}")
+            return True
+            
         except ClientError as e:
             if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
                 logger.warning(f"更新対象の株式が見つかりません: {stock.symbol}")
@@ -147,21 +200,21 @@ class StockRepository(BaseRepository):
     
     async def delete_monitored_stock(self, symbol: str) -> bool:
         """監視対象株式を削除"""
+        # 入力値の検証（クライアント取得前に行う）
+        if not symbol or len(symbol) > 10:
+            raise ValueError("無効な銘柄コードです")
+        
         try:
-            async with self._get_async_client() as client:
-                # 入力値の検証
-                if not symbol or len(symbol) > 10:
-                    raise ValueError("無効な銘柄コードです")
-                
-                await client.delete_item(
-                    TableName=self.get_table_name(),
-                    Key={'symbol': {'S': symbol}},
-                    ConditionExpression='attribute_exists(symbol)'
-                )
-                
-                logger.info(f"監視対象株式を削除しました: {symbol}")
-                return True
-                
+            client = await self._client()
+            await client.delete_item(
+                TableName=self.table_name,
+                Key={'symbol': {'S': symbol}},
+                ConditionExpression='attribute_exists(symbol)'
+            )
+            
+            logger.info(f"監視対象株式を削除しました: {symbol}")
+            return True
+            
         except ClientError as e:
             if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
                 logger.warning(f"削除対象の株式が見つかりません: {symbol}")
@@ -173,43 +226,109 @@ class StockRepository(BaseRepository):
     async def list_monitored_stocks(self, active_only: bool = True) -> List[MonitoredStock]:
         """監視対象株式一覧を取得"""
         try:
-            async with self._get_async_client() as client:
-                if active_only:
-                    response = await client.scan(
-                        TableName=self.get_table_name(),
-                        FilterExpression='is_active = :active',
-                        ExpressionAttributeValues={':active': {'BOOL': True}}
-                    )
-                else:
-                    response = await client.scan(TableName=self.get_table_name())
-                
-                stocks = []
-                for item in response.get('Items', []):
-                    deserialized = self._deserialize_item(item)
-                    stocks.append(self._item_to_monitored_stock(deserialized))
-                
-                logger.info(f"監視対象株式を {len(stocks)} 件取得しました")
-                return stocks
-                
+            client = await self._client()
+            if active_only:
+                # 監視中の銘柄のみを持つスパースGSIをクエリ
+                stocks = await self._paginate_stocks(client, 'query', {
+                    'TableName': self.table_name,
+                    'IndexName': ACTIVE_INDEX_NAME,
+                    'KeyConditionExpression': f'{ACTIVE_GSI_PK} = :a',
+                    'ExpressionAttributeValues': _ACTIVE_EAV
+                })
+                if not stocks:
+                    # GSIキー導入前のアイテムはbackfill_active_indexの実行までGSIに現れないためスキャンで補う
+                    stocks = await self._paginate_stocks(client, 'scan', {
+                        'TableName': self.table_name,
+                        'FilterExpression': 'is_active = :true',
+                        'ExpressionAttributeValues': _TRUE_EAV
+                    })
+            else:
+                stocks = await self._paginate_stocks(client, 'scan', {'TableName': self.table_name})
+            
+            logger.info(f"監視対象株式を {len(stocks)} 件取得しました")
+            return stocks
+            
         except ClientError as e:
             self._handle_client_error(e, "list_monitored_stocks")
             return []
     
+    async def _paginate_stocks(
+        self, client, operation: str, paginate_kwargs: Dict[str, Any]
+    ) -> List[MonitoredStock]:
+        """query/scanの1MB単位のページを全て辿って監視対象株式に変換"""
+        paginator = client.get_paginator(operation)
+        stocks = []
+        async for page in paginator.paginate(
+            **paginate_kwargs, PaginationConfig={'PageSize': LIST_PAGE_SIZE}
+        ):
+            for item in page.get('Items', []):
+                deserialized = self._deserialize_item(item)
+                stocks.append(self._item_to_monitored_stock(deserialized))
+        return stocks
+    
+    async def backfill_active_index(self) -> int:
+        """
+        GSIキー導入前に書き込まれた監視中の銘柄にis_active_pkを設定する（1回限りの移行用）
+        
+        Returns:
+            int: GSIキーを設定した件数
+        """
+        try:
+            client = await self._client()
+            paginator = client.get_paginator('scan')
+            updated = 0
+            async for page in paginator.paginate(
+                TableName=self.table_name,
+                ProjectionExpression='symbol',
+                FilterExpression=f'is_active = :true AND attribute_not_exists({ACTIVE_GSI_PK})',
+                ExpressionAttributeValues=_TRUE_EAV,
+                PaginationConfig={'PageSize': LIST_PAGE_SIZE}
+            ):
+                for item in page.get('Items', []):
+                    try:
+                        await client.update_item(
+                            TableName=self.table_name,
+                            Key={'symbol': item['symbol']},
+                            UpdateExpression=f'SET {ACTIVE_GSI_PK} = :a',
+                            # スキャン後に監視停止された銘柄には設定しない
+                            ConditionExpression='is_active = :true',
+                            ExpressionAttributeValues={**_ACTIVE_EAV, **_TRUE_EAV}
+                        )
+                        updated += 1
+                    except ClientError as e:
+                        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                            raise
+            
+            logger.info(f"監視中の銘柄 {updated} 件にGSIキーを設定しました")
+            return updated
+            
+        except ClientError as e:
+            self._handle_client_error(e, "backfill_active_index")
+            return 0
+    
     def _item_to_monitored_stock(self, item: dict) -> MonitoredStock:
-        """DynamoDBアイテムをMonitoredStockに変換"""
-        return MonitoredStock(
+        """DynamoDBアイテムをMonitoredStockに変換（自前で書き込んだデータのため検証は省略）"""
+        return MonitoredStock.model_construct(
             symbol=item['symbol'],
             name=item['name'],
             market=item['market'],
-            price_threshold_upper=Decimal(str(item['price_threshold_upper'])) if item.get('price_threshold_upper') else None,
-            price_threshold_lower=Decimal(str(item['price_threshold_lower'])) if item.get('price_threshold_lower') else None,
-            volume_threshold_multiplier=Decimal(str(item['volume_threshold_multiplier'])),
+            price_threshold_upper=item.get('price_threshold_upper'),
+            price_threshold_lower=item.get('price_threshold_lower'),
+            volume_threshold_multiplier=item['volume_threshold_multiplier'],
             is_active=item['is_active'],
             created_at=datetime.fromisoformat(item['created_at']),
             updated_at=datetime.fromisoformat(item['updated_at'])
         )
 
 
+# StockPriceへの変換に必須の属性と、価格と取引量のみを取得する際の取得属性
+_PRICE_REQUIRED_ATTRIBUTES = ('symbol', 'timestamp', 'price')
+PRICE_HISTORY_PROJECTION = ('symbol', 'timestamp', 'price', 'volume')
+
+# 複数銘柄の最新株価を取得する際の同時クエリ数
+LATEST_PRICE_CONCURRENCY = 16
+
+
 class StockPriceRepository(BaseRepository):
     """株価履歴リポジトリ"""
     
@@ -222,95 +341,175 @@ class StockPriceRepository(BaseRepository):
     async def save_stock_price(self, price: StockPrice) -> bool:
         """株価データを保存"""
         try:
-            async with self._get_async_client() as client:
-                # TTL設定（30日後に自動削除）
-                ttl = int((price.timestamp.timestamp() + 30 * 24 * 3600))
-                
-                item = {
-                    'symbol': price.symbol,
-                    'timestamp': price.timestamp.isoformat(),
-                    'price': float(price.price),
-                    'open_price': float(price.open_price) if price.open_price else None,
-                    'high_price': float(price.high_price) if price.high_price else None,
-                    'low_price': float(price.low_price) if price.low_price else None,
-                    'volume': price.volume,
-                    'previous_close': float(price.previous_close) if price.previous_close else None,
-                    'change_amount': float(price.change_amount) if price.change_amount else None,
-                    'change_percent': float(price.change_percent) if price.change_percent else None,
-                    'ttl': ttl
-                }
-                
-                # Noneの値を除外
-                item = {k: v for k, v in item.items() if v is not None}
-                
-                await client.put_item(
-                    TableName=self.get_table_name(),
-                    Item=self._serialize_item(item)
-                )
-                
-                logger.debug(f"株価データを保存しました: {price.symbol} @ {price.timestamp}")
-                return True
-                
+            client = await self._client()
+            await client.put_item(
+                TableName=self.table_name,
+                Item=self._serialize_item(self._stock_price_to_item(price))
+            )
+            
+            logger.debug(f"株価データを保存しました: {price.symbol} @ {price.timestamp}")
+            return True
+            
         except ClientError as e:
             self._handle_client_error(e, "save_stock_price")
             return False
     
-    async def get_latest_price(self, symbol: str) -> Optional[StockPrice]:
-        """最新の株価データを取得"""
+    async def save_stock_prices(self, prices: List[StockPrice]) -> int:
+        """複数の株価データをBatchWriteItemでまとめて保存し、保存件数を返す"""
+        # 同一バッチ内の重複キーはBatchWriteItemがエラーにするため後勝ちで除外
+        items = {}
+        for price in prices:
+            item = self._stock_price_to_item(price)
+            items[(item['symbol'], item['timestamp'])] = item
+        if not items:
+            return 0
+        
         try:
-            async with self._get_async_client() as client:
-                response = await client.query(
-                    TableName=self.get_table_name(),
-                    KeyConditionExpression='symbol = :symbol',
-                    ExpressionAttributeValues={':symbol': {'S': symbol}},
-                    ScanIndexForward=False,  # 降順（最新から）
-                    Limit=1
-                )
-                
-                if not response.get('Items'):
-                    return None
-                
-                item = self._deserialize_item(response['Items'][0])
-                return self._item_to_stock_price(item)
-                
+            client = await self._client()
+            table_name = self.table_name
+            requests = [{'PutRequest': {'Item': self._serialize_item(item)}} for item in items.values()]
+            
+            results = await asyncio.gather(*(
+                self._batch_write(client, table_name, requests[i:i + BATCH_WRITE_MAX_ITEMS])
+                for i in range(0, len(requests), BATCH_WRITE_MAX_ITEMS)
+            ))
+            saved_count = sum(results)
+            
+            logger.debug(f"株価データを {saved_count} 件保存しました")
+            return saved_count
+            
+        except ClientError as e:
+            self._handle_client_error(e, "save_stock_prices")
+            return 0
+    
+    async def get_latest_price(
+        self, symbol: str, projection: Optional[Sequence[str]] = None
+    ) -> Optional[StockPrice]:
+        """最新の株価データを取得（projection指定時は必要な属性のみ取得）"""
+        try:
+            client = await self._client()
+            response = await client.query(
+                TableName=self.table_name,
+                KeyConditionExpression='symbol = :symbol',
+                ExpressionAttributeValues={':symbol': {'S': symbol}},
+                ScanIndexForward=False,  # 降順（最新から）
+                Limit=1,
+                **self._projection_kwargs(projection)
+            )
+            
+            if not response.get('Items'):
+                return None
+            
+            item = self._deserialize_item(response['Items'][0])
+            return self._item_to_stock_price(item)
+            
         except ClientError as e:
             self._handle_client_error(e, "get_latest_price")
             return None
     
-    async def get_price_history(self, symbol: str, limit: int = 100) -> List[StockPrice]:
-        """株価履歴を取得"""
+    async def get_latest_prices(
+        self, symbols: List[str], projection: Optional[Sequence[str]] = None
+    ) -> Dict[str, Optional[StockPrice]]:
+        """複数銘柄の最新株価を並行して取得（取得に失敗した銘柄はNone）"""
+        # 履歴テーブルは(symbol, timestamp)の複合キーのためBatchGetItemは使えず、
+        # 銘柄毎のLimit=1クエリを共有クライアント上で並行実行する
+        unique_symbols = list(dict.fromkeys(symbols))
+        if not unique_symbols:
+            return {}
+        
+        semaphore = asyncio.Semaphore(LATEST_PRICE_CONCURRENCY)
+        
+        async def _fetch_one(symbol: str) -> Optional[StockPrice]:
+            async with semaphore:
+                return await self.get_latest_price(symbol, projection)
+        
+        results = await asyncio.gather(
+            *(_fetch_one(symbol) for symbol in unique_symbols), return_exceptions=True
+        )
+        
+        # 一部銘柄の失敗（スロットリング等）で全体を失敗させない
+        prices: Dict[str, Optional[StockPrice]] = {}
+        for symbol, result in zip(unique_symbols, results):
+            if isinstance(result, Exception):
+                logger.warning(f"最新株価の取得に失敗しました: {symbol}, エラー: {result}")
+                prices[symbol] = None
+            else:
+                prices[symbol] = result
+        return prices
+    
+    async def get_price_history(
+        self, symbol: str, limit: int = 100, projection: Optional[Sequence[str]] = None
+    ) -> List[StockPrice]:
+        """株価履歴を取得（projection指定時はその属性のみ、例: PRICE_HISTORY_PROJECTION）"""
         try:
-            async with self._get_async_client() as client:
-                response = await client.query(
-                    TableName=self.get_table_name(),
-                    KeyConditionExpression='symbol = :symbol',
-                    ExpressionAttributeValues={':symbol': {'S': symbol}},
-                    ScanIndexForward=False,  # 降順（最新から）
-                    Limit=limit
-                )
-                
-                prices = []
-                for item in response.get('Items', []):
-                    deserialized = self._deserialize_item(item)
-                    prices.append(self._item_to_stock_price(deserialized))
-                
-                return prices
-                
+            client = await self._client()
+            response = await client.query(
+                TableName=self.table_name,
+                KeyConditionExpression='symbol = :symbol',
+                ExpressionAttributeValues={':symbol': {'S': symbol}},
+                ScanIndexForward=False,  # 降順（最新から）
+                Limit=limit,
+                **self._projection_kwargs(projection)
+            )
+            
+            prices = []
+            for item in response.get('Items', []):
+                deserialized = self._deserialize_item(item)
+                prices.append(self._item_to_stock_price(deserialized))
+            
+            return prices
+            
         except ClientError as e:
             self._handle_client_error(e, "get_price_history")
             return []
     
+    def _projection_kwargs(self, projection: Optional[Sequence[str]]) -> Dict[str, Any]:
+        """ProjectionExpressionの引数を生成（予約語回避のため全属性を別名にする）"""
+        if not projection:
+            return {}
+        
+        # StockPriceへの変換に必須の属性は常に含める
+        attributes = list(dict.fromkeys([*_PRICE_REQUIRED_ATTRIBUTES, *projection]))
+        names = {f'#p{i}': attribute for i, attribute in enumerate(attributes)}
+        return {
+            'ProjectionExpression': ', '.join(names),
+            'ExpressionAttributeNames': names
+        }
+    
+    def _stock_price_to_item(self, price: StockPrice) -> Dict[str, Any]:
+        """StockPriceをDynamoDBアイテムに変換"""
+        # TTL設定（30日後に自動削除）
+        ttl = int((price.timestamp.timestamp() + 30 * 24 * 3600))
+        
+        item = {
+            'symbol': price.symbol,
+            'timestamp': price.timestamp.isoformat(),
+            'price': price.price,
+            'open_price': price.open_price if price.open_price else None,
+            'high_price': price.high_price if price.high_price else None,
+            'low_price': price.low_price if price.low_price else None,
+            'volume': price.volume,
+            'previous_close': price.previous_close if price.previous_close else None,
+            'change_amount': price.change_amount if price.change_amount else None,
+            'change_percent': price.change_percent if price.change_percent else None,
+            'ttl': ttl
+        }
+        
+        # Noneの値を除外
+        return {k: v for k, v in item.items() if v is not None}
+    
     def _item_to_stock_price(self, item: dict) -> StockPrice:
-        """DynamoDBアイテムをStockPriceに変換"""
-        return StockPrice(
+        """DynamoDBアイテムをStockPriceに変換（自前で書き込んだデータのため検証は省略）"""
+        volume = item.get('volume')
+        return StockPrice.model_construct(
             symbol=item['symbol'],
             timestamp=datetime.fromisoformat(item['timestamp']),
-            price=Decimal(str(item['price'])),
-            open_price=Decimal(str(item['open_price'])) if item.get('open_price') else None,
-            high_price=Decimal(str(item['high_price'])) if item.get('high_price') else None,
-            low_price=Decimal(str(item['low_price'])) if item.get('low_price') else None,
-            volume=item.get('volume'),
-            previous_close=Decimal(str(item['previous_close'])) if item.get('previous_close') else None,
-            change_amount=Decimal(str(item['change_amount'])) if item.get('change_amount') else None,
-            change_percent=Decimal(str(item['change_percent'])) if item.get('change_percent') else None
+            price=item['price'],
+            open_price=item.get('open_price'),
+            high_price=item.get('high_price'),
+            low_price=item.get('low_price'),
+            volume=int(volume) if volume is not None else None,
+            previous_close=item.get('previous_close'),
+            change_amount=item.get('change_amount'),
+            change_percent=item.get('change_percent')
         )
\ No newline at end of file
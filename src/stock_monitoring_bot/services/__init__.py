@@ -1,11 +1,12 @@
 # ビジネスロジック
-from .alert_engine import AlertEngine, VolumeData, AlertHistory
+from .alert_engine import AlertEngine, VolumeData, AlertHistory, is_trading_hours
 from .portfolio_service import PortfolioService, PortfolioCommandHandler
 
 __all__ = [
     'AlertEngine',
     'VolumeData', 
     'AlertHistory',
+    'is_trading_hours',
     'PortfolioService',
     'PortfolioCommandHandler'
 ]
\ No newline at end of file
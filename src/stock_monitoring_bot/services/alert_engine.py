@@ -3,15 +3,50 @@
 価格閾値チェック、取引量変動アラート、重複防止機能を提供
 """
 import asyncio
+import time
 import uuid
-from datetime import datetime, UTC, timedelta
+from collections import OrderedDict, deque
+from datetime import datetime, UTC, timedelta, timezone, time as dt_time
 from decimal import Decimal
-from typing import List, Dict
+from typing import Deque, Dict, Hashable, List, Optional
 from dataclasses import dataclass, field
 
 from ..models.stock import MonitoredStock, StockPrice, Alert
 from ..handlers.discord_handler import DiscordHandler
 
+# 平均取引量の算出に使う履歴の日数
+VOLUME_HISTORY_DAYS = 20
+
+# 取引量急減と判定する平均取引量に対する比率
+VOLUME_DECREASE_RATIO = Decimal("0.5")
+
+# Discordへのアラート同時送信数（Webhookのレート制限の既定値に合わせる）
+ALERT_SEND_CONCURRENCY = 5
+
+# 日本時間（夏時間がないため固定オフセットで扱う）
+JST = timezone(timedelta(hours=9), 'JST')
+
+# 東証の取引時間
+MORNING_SESSION_START = dt_time(9, 0)
+MORNING_SESSION_END = dt_time(11, 30)
+AFTERNOON_SESSION_START = dt_time(12, 30)
+AFTERNOON_SESSION_END = dt_time(15, 0)
+
+
+# 取引量の集計やVolumeDataの作成前に呼び出し側で判定し、時間外の処理を省けるよう公開する
+def is_trading_hours(now: Optional[datetime] = None) -> bool:
+    """東証の取引時間内かどうかをチェック（now省略時は現在時刻）"""
+    jst_now = now.astimezone(JST) if now is not None else datetime.now(JST)
+    
+    # 平日かチェック
+    if jst_now.weekday() >= 5:  # 土日
+        return False
+    
+    # 取引時間チェック（9:00-11:30, 12:30-15:00）
+    time_now = jst_now.time()
+    return ((MORNING_SESSION_START <= time_now <= MORNING_SESSION_END) or 
+            (AFTERNOON_SESSION_START <= time_now <= AFTERNOON_SESSION_END))
+
 
 @dataclass
 class VolumeData:
@@ -32,31 +67,41 @@ class VolumeData:
 @dataclass
 class AlertHistory:
     """アラート履歴管理"""
-    recent_alerts: Dict[str, datetime] = field(default_factory=dict)
+    # キー -> 最終送信時刻（time.monotonic()）。記録時に末尾へ移すため先頭ほど古い
+    recent_alerts: OrderedDict[Hashable, float] = field(default_factory=OrderedDict)
     duplicate_prevention_minutes: int = 30
+    max_records: int = 10_000
     
-    def should_send_alert(self, alert_key: str) -> bool:
-        """重複防止チェック"""
-        if alert_key not in self.recent_alerts:
+    def should_send_alert(self, alert_key: Hashable, now: Optional[float] = None) -> bool:
+        """重複防止チェック（nowはtime.monotonic()の値、省略時は現在時刻）"""
+        last_sent = self.recent_alerts.get(alert_key)
+        if last_sent is None:
             return True
-        
-        last_sent = self.recent_alerts[alert_key]
-        time_diff = datetime.now(UTC) - last_sent
-        return time_diff.total_seconds() > (self.duplicate_prevention_minutes * 60)
+        if now is None:
+            now = time.monotonic()
+        return now - last_sent > self.duplicate_prevention_minutes * 60
+    
+    def record_alert(self, alert_key: Hashable, now: Optional[float] = None) -> None:
+        """アラート送信記録（nowはtime.monotonic()の値、省略時は現在時刻）"""
+        if now is None:
+            now = time.monotonic()
+        self.recent_alerts[alert_key] = now
+        self.recent_alerts.move_to_end(alert_key)
+        self._expire_old_records(now)
     
-    def record_alert(self, alert_key: str) -> None:
-        """アラート送信記録"""
-        self.recent_alerts[alert_key] = datetime.now(UTC)
+    def discard_alert(self, alert_key: Hashable) -> None:
+        """アラート送信記録を取り消す"""
+        self.recent_alerts.pop(alert_key, None)
     
-    def cleanup_old_records(self) -> None:
-        """古い記録をクリーンアップ"""
-        cutoff_time = datetime.now(UTC) - timedelta(hours=24)
-        keys_to_remove = [
-            key for key, timestamp in self.recent_alerts.items()
-            if timestamp < cutoff_time
-        ]
-        for key in keys_to_remove:
-            del self.recent_alerts[key]
+    def _expire_old_records(self, now: float) -> None:
+        """重複防止期間を過ぎた記録と上限超過分を先頭から削除"""
+        cutoff = now - self.duplicate_prevention_minutes * 60
+        recent_alerts = self.recent_alerts
+        while recent_alerts:
+            oldest_key, last_sent = next(iter(recent_alerts.items()))
+            if last_sent > cutoff and len(recent_alerts) <= self.max_records:
+                break
+            del recent_alerts[oldest_key]
 
 
 class AlertEngine:
@@ -65,21 +110,31 @@ class AlertEngine:
     def __init__(self, discord_handler: DiscordHandler):
         self.discord_handler = discord_handler
         self.alert_history = AlertHistory()
-        self._volume_history: Dict[str, List[int]] = {}
+        self._volume_history: Dict[str, Deque[int]] = {}
+        self._volume_sums: Dict[str, int] = {}
         self._lock = asyncio.Lock()
     
     async def check_price_alerts(
         self, 
         stock: MonitoredStock, 
-        current_price: StockPrice
+        current_price: StockPrice,
+        now: Optional[datetime] = None
     ) -> List[Alert]:
-        """価格閾値アラートをチェック"""
+        """価格閾値アラートをチェック（nowはバッチ内で共有する発生日時、省略時は現在時刻）"""
         alerts = []
         
+        upper_hit = bool(stock.price_threshold_upper and
+                         current_price.price >= stock.price_threshold_upper)
+        lower_hit = bool(stock.price_threshold_lower and
+                         current_price.price <= stock.price_threshold_lower)
+        if not (upper_hit or lower_hit):
+            return alerts
+        
+        if now is None:
+            now = datetime.now(UTC)
+        
         # 上限閾値チェック
-        if (stock.price_threshold_upper and 
-            current_price.price >= stock.price_threshold_upper):
-            
+        if upper_hit:
             alert = Alert(
                 alert_id=str(uuid.uuid4()),
                 symbol=stock.symbol,
@@ -87,15 +142,14 @@ class AlertEngine:
                 message=self._format_price_alert_message(
                     stock, current_price, "上限", stock.price_threshold_upper
                 ),
+                triggered_at=now,
                 price_at_trigger=current_price.price,
                 threshold_value=stock.price_threshold_upper
             )
             alerts.append(alert)
         
         # 下限閾値チェック
-        if (stock.price_threshold_lower and 
-            current_price.price <= stock.price_threshold_lower):
-            
+        if lower_hit:
             alert = Alert(
                 alert_id=str(uuid.uuid4()),
                 symbol=stock.symbol,
@@ -103,6 +157,7 @@ class AlertEngine:
                 message=self._format_price_alert_message(
                     stock, current_price, "下限", stock.price_threshold_lower
                 ),
+                triggered_at=now,
                 price_at_trigger=current_price.price,
                 threshold_value=stock.price_threshold_lower
             )
@@ -113,13 +168,16 @@ class AlertEngine:
     async def check_volume_alerts(
         self, 
         stock: MonitoredStock, 
-        volume_data: VolumeData
+        volume_data: VolumeData,
+        now: Optional[datetime] = None
     ) -> List[Alert]:
-        """取引量変動アラートをチェック"""
+        """取引量変動アラートをチェック（nowはバッチ内で共有する発生日時、省略時は現在時刻）"""
         alerts = []
+        if now is None:
+            now = datetime.now(UTC)
         
         # 取引時間外は取引量監視を停止
-        if not self._is_trading_hours():
+        if not self._is_trading_hours(now):
             return alerts
         
         # 取引量急増チェック
@@ -131,14 +189,14 @@ class AlertEngine:
                 message=self._format_volume_alert_message(
                     stock, volume_data, "急増"
                 ),
+                triggered_at=now,
                 volume_at_trigger=volume_data.current_volume,
-                threshold_value=Decimal(str(volume_data.average_volume * float(stock.volume_threshold_multiplier)))
+                threshold_value=Decimal(volume_data.average_volume) * stock.volume_threshold_multiplier
             )
             alerts.append(alert)
         
         # 取引量急減チェック（平均の50%以下）
-        volume_decrease_threshold = 0.5
-        if volume_data.volume_ratio <= volume_decrease_threshold:
+        if volume_data.volume_ratio <= VOLUME_DECREASE_RATIO:
             alert = Alert(
                 alert_id=str(uuid.uuid4()),
                 symbol=stock.symbol,
@@ -146,8 +204,9 @@ class AlertEngine:
                 message=self._format_volume_alert_message(
                     stock, volume_data, "急減"
                 ),
+                triggered_at=now,
                 volume_at_trigger=volume_data.current_volume,
-                threshold_value=Decimal(str(volume_data.average_volume * volume_decrease_threshold))
+                threshold_value=Decimal(volume_data.average_volume) * VOLUME_DECREASE_RATIO
             )
             alerts.append(alert)
         
@@ -155,49 +214,60 @@ class AlertEngine:
     
     async def process_alerts(self, alerts: List[Alert]) -> List[Alert]:
         """アラートを処理し、重複防止チェックを適用"""
+        # 重複判定と記録のみロック内で行い、同一バッチ内の重複も送信前に除外する
         async with self._lock:
-            processed_alerts = []
-            
+            to_send = []
+            now = time.monotonic()
             for alert in alerts:
-                alert_key = f"{alert.symbol}_{alert.alert_type}_{alert.threshold_value}"
-                
-                if self.alert_history.should_send_alert(alert_key):
-                    try:
-                        await self.discord_handler.send_alert(alert)
-                        alert.is_sent = True
-                        alert.sent_at = datetime.now(UTC)
-                        self.alert_history.record_alert(alert_key)
-                        processed_alerts.append(alert)
-                    except Exception as e:
-                        # Discord送信失敗時もアラートは記録するが、送信フラグは立てない
-                        alert.is_sent = False
-                        processed_alerts.append(alert)
-                        # ログ出力（実際の実装では適切なロガーを使用）
-                        print(f"Discord alert send failed: {e}")
-            
-            # 古い記録をクリーンアップ
-            self.alert_history.cleanup_old_records()
-            
-            return processed_alerts
+                alert_key = alert.fingerprint
+                if self.alert_history.should_send_alert(alert_key, now):
+                    self.alert_history.record_alert(alert_key, now)
+                    to_send.append(alert)
+        
+        semaphore = asyncio.Semaphore(ALERT_SEND_CONCURRENCY)
+        
+        async def _send(alert: Alert) -> None:
+            async with semaphore:
+                await self.discord_handler.send_alert(alert)
+        
+        results = await asyncio.gather(*(_send(alert) for alert in to_send), return_exceptions=True)
+        sent_at = datetime.now(UTC)
+        
+        for alert, result in zip(to_send, results):
+            if isinstance(result, BaseException):
+                # Discord送信失敗時もアラートは記録するが、送信フラグは立てない
+                alert.is_sent = False
+                # 再送を妨げないよう重複防止の記録を取り消す
+                self.alert_history.discard_alert(alert.fingerprint)
+                # ログ出力（実際の実装では適切なロガーを使用）
+                print(f"Discord alert send failed: {result}")
+            else:
+                alert.is_sent = True
+                alert.sent_at = sent_at
+        
+        return to_send
     
     def update_volume_history(self, symbol: str, volume: int) -> None:
         """取引量履歴を更新"""
-        if symbol not in self._volume_history:
-            self._volume_history[symbol] = []
-        
-        self._volume_history[symbol].append(volume)
+        history = self._volume_history.get(symbol)
+        if history is None:
+            # 過去20日分のデータのみ保持
+            history = self._volume_history[symbol] = deque(maxlen=VOLUME_HISTORY_DAYS)
+            self._volume_sums[symbol] = 0
         
-        # 過去20日分のデータのみ保持
-        if len(self._volume_history[symbol]) > 20:
-            self._volume_history[symbol] = self._volume_history[symbol][-20:]
+        # 上限に達している場合は押し出される最古の値を合計から除く
+        if len(history) == history.maxlen:
+            self._volume_sums[symbol] -= history[0]
+        history.append(volume)
+        self._volume_sums[symbol] += volume
     
     def calculate_average_volume(self, symbol: str) -> int:
         """平均取引量を計算"""
-        if symbol not in self._volume_history or not self._volume_history[symbol]:
+        history = self._volume_history.get(symbol)
+        if not history:
             return 0
         
-        volumes = self._volume_history[symbol]
-        return sum(volumes) // len(volumes)
+        return self._volume_sums[symbol] // len(history)
     
     def create_volume_data(self, symbol: str, current_volume: int) -> VolumeData:
         """VolumeDataオブジェクトを作成"""
@@ -247,22 +317,6 @@ class AlertEngine:
             f"**時刻**: {volume_data.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
         )
     
-    def _is_trading_hours(self) -> bool:
-        """取引時間内かどうかをチェック"""
-        now = datetime.now(UTC)
-        # 日本時間に変換（UTC+9）
-        jst_now = now.replace(tzinfo=None) + timedelta(hours=9)
-        
-        # 平日かチェック
-        if jst_now.weekday() >= 5:  # 土日
-            return False
-        
-        # 取引時間チェック（9:00-11:30, 12:30-15:00）
-        time_now = jst_now.time()
-        morning_start = datetime.strptime("09:00", "%H:%M").time()
-        morning_end = datetime.strptime("11:30", "%H:%M").time()
-        afternoon_start = datetime.strptime("12:30", "%H:%M").time()
-        afternoon_end = datetime.strptime("15:00", "%H:%M").time()
-        
-        return ((morning_start <= time_now <= morning_end) or 
-                (afternoon_start <= time_now <= afternoon_end))
\ No newline at end of file
+    def _is_trading_hours(self, now: Optional[datetime] = None) -> bool:
+        """取引時間内かどうかをチェック（now省略時は現在時刻）"""
+        return is_trading_hours(now)
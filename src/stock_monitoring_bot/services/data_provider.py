@@ -4,9 +4,13 @@ Yahoo Finance APIとAlpha Vantage APIを使用して株価データを取得
 """
 import asyncio
 import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, UTC
 from decimal import Decimal
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Awaitable, Callable, Hashable, Tuple, TypeVar
 import aiohttp
 import yfinance as yf
 import pandas as pd
@@ -15,6 +19,96 @@ from ..models.stock import StockPrice
 
 logger = logging.getLogger(__name__)
 
+# yfinance（同期API）専用のスレッドプール
+# 既定のエグゼキューターを他のブロッキング処理と共有せず、Yahooへの同時リクエスト数も抑える
+YFINANCE_MAX_WORKERS = 8
+_yfinance_executor = ThreadPoolExecutor(
+    max_workers=YFINANCE_MAX_WORKERS, thread_name_prefix="yfinance"
+)
+
+# 取得結果をキャッシュする秒数と、キャッシュ毎の最大件数
+PRICE_CACHE_TTL_SECONDS = 30
+HISTORY_CACHE_TTL_SECONDS = 300
+CACHE_MAX_ENTRIES = 1024
+
+# Alpha Vantage用HTTPセッションの同時接続数とタイムアウト秒数
+HTTP_CONNECTION_LIMIT = 10
+HTTP_TIMEOUT_SECONDS = 10
+
+T = TypeVar('T')
+
+# info互換のキーとfast_infoの属性の対応（現在価格以外）
+_FAST_INFO_FIELDS = (
+    ('regularMarketOpen', 'open'),
+    ('regularMarketDayHigh', 'day_high'),
+    ('regularMarketDayLow', 'day_low'),
+    ('regularMarketVolume', 'last_volume'),
+    ('regularMarketPreviousClose', 'previous_close'),
+)
+
+
+def _to_decimal(value: Any) -> Decimal:
+    """数値をDecimalに変換（int・Decimalは文字列を経由せず直接変換）"""
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    # floatを直接Decimal化すると2進数の誤差まで取り込むため、最短表現の文字列を使う
+    # （numpyのスカラーもstrなら数値のみの表現になる）
+    return Decimal(str(value))
+
+
+@lru_cache(maxsize=4096)
+def _is_valid_symbol(symbol: str) -> bool:
+    """銘柄コード文字列の妥当性を検証（監視銘柄は少数のためキャッシュする）"""
+    symbol = symbol.strip().upper()
+    
+    # 空文字チェック
+    if not symbol:
+        return False
+    
+    # 基本的な文字チェック（英数字、ピリオド、ハイフンのみ許可）
+    if not all(c.isalnum() or c in '.-' for c in symbol):
+        return False
+    
+    # 長さチェック（1-10文字）
+    if len(symbol) < 1 or len(symbol) > 10:
+        return False
+    
+    return True
+
+
+# 日本株の銘柄コード
+# 1. 4桁の数字（例：2433, 7203）
+# 2. 3-4桁の数字 + 1文字のアルファベット（例：142A, 8697A）
+# その他の日本株パターン（REITの特殊コードなど）があれば追加する
+_JP_SYMBOL_RE = re.compile(r'\d{4}|\d{3,4}[A-Za-z]')
+
+
+def _is_japanese_stock_symbol(symbol: str) -> bool:
+    """日本株の銘柄コードかどうかを判定"""
+    return _JP_SYMBOL_RE.fullmatch(symbol) is not None
+
+
+@lru_cache(maxsize=4096)
+def _normalize_yahoo_symbol(symbol: str) -> str:
+    """大文字化済みの銘柄コードをYahoo Finance用に正規化（監視銘柄は少数のためキャッシュする）"""
+    # 既に.Tが付いている場合はそのまま
+    if symbol.endswith('.T'):
+        return symbol
+    
+    # 日本株は東証のサフィックスを付与
+    if _is_japanese_stock_symbol(symbol):
+        return f"{symbol}.T"
+    
+    # その他の場合（米国株など）はそのまま
+    return symbol
+
+
+def _is_valid_number(value: Any) -> bool:
+    """Noneや欠損値（NaN）でない数値かどうか"""
+    return value is not None and not pd.isna(value)
+
 
 class StockDataProviderError(Exception):
     """データプロバイダーエラー"""
@@ -33,10 +127,23 @@ class StockDataProvider:
         """
         self.alpha_vantage_api_key = alpha_vantage_api_key
         self.session: Optional[aiohttp.ClientSession] = None
+        # キー -> (有効期限（time.monotonic()）, 取得結果)
+        self._price_cache: Dict[str, Tuple[float, StockPrice]] = {}
+        self._history_cache: Dict[Tuple[str, str], Tuple[float, List[StockPrice]]] = {}
+        # 取得中のキー -> 取得タスク（同一キーへの同時取得を1回にまとめ、完了時に削除）
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
         
     async def __aenter__(self):
         """非同期コンテキストマネージャー開始"""
-        self.session = aiohttp.ClientSession()
+        # Alpha Vantageへの接続を使い回し、DNS解決もキャッシュする
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=HTTP_CONNECTION_LIMIT,
+                ttl_dns_cache=300,
+                keepalive_timeout=30
+            ),
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS)
+        )
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -56,22 +163,8 @@ class StockDataProvider:
         """
         if not symbol or not isinstance(symbol, str):
             return False
-            
-        symbol = symbol.strip().upper()
         
-        # 空文字チェック
-        if not symbol:
-            return False
-            
-        # 基本的な文字チェック（英数字、ピリオド、ハイフンのみ許可）
-        if not all(c.isalnum() or c in '.-' for c in symbol):
-            return False
-            
-        # 長さチェック（1-10文字）
-        if len(symbol) < 1 or len(symbol) > 10:
-            return False
-            
-        return True
+        return _is_valid_symbol(symbol)
     
     def _normalize_symbol_for_yahoo(self, symbol: str) -> str:
         """
@@ -83,21 +176,7 @@ class StockDataProvider:
         Returns:
             str: 正規化された銘柄コード
         """
-        symbol = symbol.strip().upper()
-        
-        # 既に.Tが付いている場合はそのまま
-        if symbol.endswith('.T'):
-            return symbol
-        
-        # 日本株の判定パターン
-        # 1. 4桁の数字（例：2433, 7203）
-        # 2. 3-4桁の数字 + 1文字のアルファベット（例：142A, 8697A）
-        # 3. REITなど特殊な形式
-        if self._is_japanese_stock_symbol(symbol):
-            return f"{symbol}.T"
-            
-        # その他の場合（米国株など）はそのまま
-        return symbol
+        return _normalize_yahoo_symbol(symbol.strip().upper())
     
     def _is_japanese_stock_symbol(self, symbol: str) -> bool:
         """
@@ -109,18 +188,7 @@ class StockDataProvider:
         Returns:
             bool: 日本株の場合True
         """
-        # 4桁の数字（例：2433, 7203）
-        if symbol.isdigit() and len(symbol) == 4:
-            return True
-        
-        # 3-4桁の数字 + 1文字のアルファベット（例：142A, 8697A）
-        if len(symbol) in [4, 5] and symbol[:-1].isdigit() and symbol[-1].isalpha():
-            return True
-        
-        # その他の日本株パターンがあれば追加
-        # 例：REITの特殊コードなど
-        
-        return False
+        return _is_japanese_stock_symbol(symbol)
     
     async def get_current_price(self, symbol: str) -> StockPrice:
         """
@@ -139,7 +207,21 @@ class StockDataProvider:
             raise StockDataProviderError(f"無効な銘柄コード: {symbol}")
         
         symbol = symbol.strip().upper()
+        return await self._get_cached(
+            self._price_cache, symbol, PRICE_CACHE_TTL_SECONDS,
+            lambda: self._fetch_current_price(symbol)
+        )
+    
+    async def _fetch_current_price(self, symbol: str) -> StockPrice:
+        """
+        データソースから現在の株価を取得（Yahoo Finance失敗時はAlpha Vantage）
         
+        Args:
+            symbol: 正規化済みの銘柄コード
+            
+        Returns:
+            StockPrice: 株価データ
+        """
         try:
             # まずYahoo Finance APIを試行
             return await self._get_price_from_yahoo(symbol)
@@ -156,6 +238,53 @@ class StockDataProvider:
             else:
                 raise StockDataProviderError(f"Yahoo Finance APIでの取得失敗: {symbol}, エラー: {e}")
     
+    async def get_current_prices(self, symbols: List[str]) -> Dict[str, StockPrice]:
+        """
+        複数銘柄の現在の株価をまとめて取得
+        
+        キャッシュにない銘柄はyf.downloadの1回の呼び出しで取得し、
+        取得できなかった銘柄のみget_current_priceで個別に取得する
+        
+        Args:
+            symbols: 銘柄コードのリスト
+            
+        Returns:
+            Dict[str, StockPrice]: 正規化済み銘柄コード -> 株価データ
+            （無効な銘柄コードや取得に失敗した銘柄は含まない）
+        """
+        results: Dict[str, StockPrice] = {}
+        misses = []
+        now = time.monotonic()
+        
+        for symbol in dict.fromkeys(symbols):
+            if not self.validate_symbol(symbol):
+                logger.warning(f"無効な銘柄コードをスキップ: {symbol}")
+                continue
+            symbol = symbol.strip().upper()
+            cached = self._price_cache.get(symbol)
+            if cached is not None and cached[0] > now:
+                results[symbol] = cached[1]
+            else:
+                misses.append(symbol)
+        
+        # 正規化後に同じになる銘柄コードは1つにまとめる
+        misses = list(dict.fromkeys(misses))
+        if misses:
+            results.update(await self._get_prices_from_yahoo_batch(misses))
+        
+        # 一括取得できなかった銘柄は個別取得（Alpha Vantageへのフォールバックを含む）
+        remaining = [symbol for symbol in misses if symbol not in results]
+        fallback_results = await asyncio.gather(
+            *(self.get_current_price(symbol) for symbol in remaining), return_exceptions=True
+        )
+        for symbol, result in zip(remaining, fallback_results):
+            if isinstance(result, Exception):
+                logger.warning(f"株価取得失敗: {symbol}, エラー: {result}")
+            else:
+                results[symbol] = result
+        
+        return results
+    
     async def get_historical_data(self, symbol: str, period: str = "1d") -> List[StockPrice]:
         """
         過去の株価データを取得
@@ -174,13 +303,84 @@ class StockDataProvider:
             raise StockDataProviderError(f"無効な銘柄コード: {symbol}")
         
         symbol = symbol.strip().upper()
+        history = await self._get_cached(
+            self._history_cache, (symbol, period), HISTORY_CACHE_TTL_SECONDS,
+            lambda: self._fetch_historical_data(symbol, period)
+        )
+        # キャッシュ内のリストを呼び出し元に変更されないようコピーを返す
+        return list(history)
+    
+    async def _fetch_historical_data(self, symbol: str, period: str) -> List[StockPrice]:
+        """
+        データソースから過去の株価データを取得
         
+        Args:
+            symbol: 正規化済みの銘柄コード
+            period: 期間
+            
+        Returns:
+            List[StockPrice]: 株価データのリスト
+        """
         try:
             return await self._get_historical_from_yahoo(symbol, period)
         except Exception as e:
             logger.error(f"過去データ取得失敗: {symbol}, 期間: {period}, エラー: {e}")
             raise StockDataProviderError(f"過去データ取得失敗: {symbol}, エラー: {e}")
     
+    async def _get_cached(
+        self,
+        cache: Dict[Any, Tuple[float, T]],
+        key: Hashable,
+        ttl: int,
+        fetch: Callable[[], Awaitable[T]]
+    ) -> T:
+        """
+        TTLキャッシュから取得し、ミス時は同一キーの同時取得を1回にまとめる
+        
+        Args:
+            cache: キャッシュ（キー -> (有効期限, 値)）
+            key: キャッシュキー
+            ttl: キャッシュする秒数
+            fetch: ミス時に呼び出す取得処理（失敗時の例外はキャッシュしない）
+            
+        Returns:
+            キャッシュ済みまたは新たに取得した値
+        """
+        cached = cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        
+        task = self._inflight.get(key)
+        if task is not None:
+            # 取得中の結果を待つ（待機側のキャンセルで共有タスクを止めない）
+            return await asyncio.shield(task)
+        
+        async def _fetch_and_store() -> T:
+            value = await fetch()
+            self._store_cached(cache, key, ttl, value)
+            return value
+        
+        task = asyncio.ensure_future(_fetch_and_store())
+        self._inflight[key] = task
+        try:
+            return await task
+        finally:
+            self._inflight.pop(key, None)
+    
+    def _store_cached(self, cache: Dict[Any, Tuple[float, T]], key: Hashable, ttl: int, value: T) -> None:
+        """値をTTL付きでキャッシュに格納（上限に達している場合は先に削除）"""
+        now = time.monotonic()
+        if len(cache) >= CACHE_MAX_ENTRIES:
+            self._evict_expired(cache, now)
+        cache[key] = (now + ttl, value)
+    
+    def _evict_expired(self, cache: Dict[Any, Tuple[float, Any]], now: float) -> None:
+        """期限切れのエントリを削除し、それでも上限を超える場合は古いものから削除"""
+        for key in [key for key, (expires_at, _) in cache.items() if expires_at <= now]:
+            del cache[key]
+        while len(cache) >= CACHE_MAX_ENTRIES:
+            del cache[next(iter(cache))]
+    
     async def _get_price_from_yahoo(self, symbol: str) -> StockPrice:
         """
         Yahoo Finance APIから株価を取得
@@ -194,15 +394,103 @@ class StockDataProvider:
         # Yahoo Finance用に銘柄コードを正規化
         yahoo_symbol = self._normalize_symbol_for_yahoo(symbol)
         
-        # yfinanceは同期APIなので、別スレッドで実行
-        loop = asyncio.get_event_loop()
-        ticker_data = await loop.run_in_executor(None, self._fetch_yahoo_data, yahoo_symbol)
+        # yfinanceは同期APIなので、専用スレッドプールで実行
+        loop = asyncio.get_running_loop()
+        ticker_data = await loop.run_in_executor(_yfinance_executor, self._fetch_yahoo_data, yahoo_symbol)
         
         if not ticker_data:
             raise StockDataProviderError(f"Yahoo Financeからデータを取得できませんでした: {symbol}")
         
         return self._parse_yahoo_data(symbol, ticker_data)
     
+    async def _get_prices_from_yahoo_batch(self, symbols: List[str]) -> Dict[str, StockPrice]:
+        """
+        Yahoo Financeから複数銘柄の株価を一括取得し、キャッシュに格納
+        
+        Args:
+            symbols: 正規化済みの銘柄コードのリスト
+            
+        Returns:
+            Dict[str, StockPrice]: 取得できた銘柄の株価データ
+        """
+        yahoo_symbols = {self._normalize_symbol_for_yahoo(symbol): symbol for symbol in symbols}
+        
+        loop = asyncio.get_running_loop()
+        frame = await loop.run_in_executor(
+            _yfinance_executor, self._download_yahoo_batch, list(yahoo_symbols)
+        )
+        if frame is None or frame.empty:
+            return {}
+        
+        results = {}
+        now = datetime.now(UTC)
+        for yahoo_symbol, symbol in yahoo_symbols.items():
+            hist_data = self._select_batch_frame(frame, yahoo_symbol, len(yahoo_symbols))
+            if hist_data is None:
+                continue
+            
+            # 直前の行を前日終値として使うため、数日分を解析して最新の行を採用する
+            stock_prices = self._parse_yahoo_history(symbol, hist_data)
+            if not stock_prices:
+                continue
+            
+            stock_price = stock_prices[-1]
+            stock_price.timestamp = now
+            results[symbol] = stock_price
+            self._store_cached(self._price_cache, symbol, PRICE_CACHE_TTL_SECONDS, stock_price)
+        
+        return results
+    
+    def _download_yahoo_batch(self, symbols: List[str]):
+        """
+        Yahoo Financeから複数銘柄の直近データを同期取得（エグゼキューター用）
+        
+        Args:
+            symbols: Yahoo Finance用の銘柄コードのリスト
+            
+        Returns:
+            pandas.DataFrame: 列が(銘柄, 項目)のデータ（失敗時はNone）
+        """
+        try:
+            logger.info(f"Yahoo Financeから {len(symbols)} 銘柄を一括取得")
+            return yf.download(
+                tickers=symbols,
+                period="5d",
+                group_by='ticker',
+                threads=True,
+                progress=False
+            )
+        except Exception as e:
+            logger.error(f"Yahoo Finance一括取得エラー: {e}")
+            return None
+    
+    def _select_batch_frame(self, frame, yahoo_symbol: str, symbol_count: int):
+        """
+        一括取得結果から1銘柄分のデータを取り出す
+        
+        Args:
+            frame: yf.downloadの結果
+            yahoo_symbol: Yahoo Finance用の銘柄コード
+            symbol_count: 一括取得した銘柄数
+            
+        Returns:
+            pandas.DataFrame: 終値のある行のみのデータ（該当なしの場合はNone）
+        """
+        if isinstance(frame.columns, pd.MultiIndex):
+            if yahoo_symbol not in frame.columns.get_level_values(0):
+                return None
+            hist_data = frame[yahoo_symbol]
+        elif symbol_count == 1:
+            hist_data = frame
+        else:
+            return None
+        
+        if 'Close' not in hist_data.columns:
+            return None
+        # 取得できなかった銘柄や休場日の行は終値が欠損している
+        hist_data = hist_data.dropna(subset=['Close'])
+        return None if hist_data.empty else hist_data
+    
     def _fetch_yahoo_data(self, symbol: str) -> Dict[str, Any]:
         """
         Yahoo Financeからデータを同期取得（エグゼキューター用）
@@ -216,37 +504,65 @@ class StockDataProvider:
         try:
             logger.info(f"Yahoo Financeからデータ取得開始: {symbol}")
             ticker = yf.Ticker(symbol)
-            info = ticker.info
-            
-            logger.debug(f"Yahoo Finance info取得結果: {symbol}, keys: {list(info.keys()) if info else 'None'}")
-            
-            # 基本的な株価情報が取得できているかチェック
-            if not info or 'regularMarketPrice' not in info:
-                logger.info(f"infoから価格取得失敗、historyを試行: {symbol}")
-                # infoが空の場合、historyから最新データを取得
-                hist = ticker.history(period="1d")
-                if hist.empty:
-                    logger.warning(f"historyも空でした: {symbol}")
-                    return {}
-                
-                logger.info(f"historyから最新データを取得: {symbol}")
-                latest = hist.iloc[-1]
-                return {
-                    'regularMarketPrice': float(latest['Close']),
-                    'regularMarketOpen': float(latest['Open']),
-                    'regularMarketDayHigh': float(latest['High']),
-                    'regularMarketDayLow': float(latest['Low']),
-                    'regularMarketVolume': int(latest['Volume']),
-                    'regularMarketPreviousClose': float(latest['Close']),  # 暫定値
-                    'symbol': symbol
-                }
-            
-            logger.info(f"Yahoo Finance info取得成功: {symbol}")
-            return info
+            
+            # infoは数百項目のJSONを取得するため、必要な項目のみのfast_infoを優先する
+            data = self._read_fast_info(ticker, symbol)
+            if data:
+                logger.info(f"Yahoo Finance fast_info取得成功: {symbol}")
+                return data
+            
+            logger.info(f"fast_infoから価格取得失敗、historyを試行: {symbol}")
+            hist = ticker.history(period="1d")
+            if hist.empty:
+                logger.warning(f"historyも空でした: {symbol}")
+                return {}
+            
+            logger.info(f"historyから最新データを取得: {symbol}")
+            latest = hist.iloc[-1]
+            return {
+                'regularMarketPrice': float(latest['Close']),
+                'regularMarketOpen': float(latest['Open']),
+                'regularMarketDayHigh': float(latest['High']),
+                'regularMarketDayLow': float(latest['Low']),
+                'regularMarketVolume': int(latest['Volume']),
+                'regularMarketPreviousClose': float(latest['Close']),  # 暫定値
+                'symbol': symbol
+            }
         except Exception as e:
             logger.error(f"Yahoo Financeデータ取得エラー: {symbol}, {e}")
             return {}
     
+    def _read_fast_info(self, ticker, symbol: str) -> Dict[str, Any]:
+        """
+        fast_infoから株価情報を取得し、info互換のキーで返す
+        
+        Args:
+            ticker: yfinanceのTickerオブジェクト
+            symbol: 銘柄コード
+            
+        Returns:
+            Dict[str, Any]: 取得データ（現在価格が取得できない場合は空）
+        """
+        try:
+            fast_info = ticker.fast_info
+            last_price = fast_info.last_price
+        except Exception as e:
+            logger.debug(f"fast_info取得エラー: {symbol}, {e}")
+            return {}
+        
+        if not _is_valid_number(last_price):
+            return {}
+        
+        data = {'regularMarketPrice': last_price, 'symbol': symbol}
+        for key, attribute in _FAST_INFO_FIELDS:
+            try:
+                value = getattr(fast_info, attribute)
+            except Exception:
+                continue
+            if _is_valid_number(value):
+                data[key] = value
+        return data
+    
     def _parse_yahoo_data(self, symbol: str, data: Dict[str, Any]) -> StockPrice:
         """
         Yahoo Financeのデータを解析してStockPriceオブジェクトを作成
@@ -259,7 +575,7 @@ class StockDataProvider:
             StockPrice: 株価データ
         """
         try:
-            current_price = Decimal(str(data.get('regularMarketPrice', 0)))
+            current_price = _to_decimal(data.get('regularMarketPrice', 0))
             if current_price <= 0:
                 raise ValueError("無効な価格データ")
             
@@ -273,11 +589,11 @@ class StockDataProvider:
                 symbol=symbol,
                 timestamp=datetime.now(UTC),
                 price=current_price,
-                open_price=Decimal(str(open_price)) if open_price else None,
-                high_price=Decimal(str(high_price)) if high_price else None,
-                low_price=Decimal(str(low_price)) if low_price else None,
+                open_price=_to_decimal(open_price) if open_price else None,
+                high_price=_to_decimal(high_price) if high_price else None,
+                low_price=_to_decimal(low_price) if low_price else None,
                 volume=int(volume) if volume else None,
-                previous_close=Decimal(str(previous_close)) if previous_close else None
+                previous_close=_to_decimal(previous_close) if previous_close else None
             )
             
             # 変動額と変動率を計算
@@ -302,8 +618,10 @@ class StockDataProvider:
         # Yahoo Finance用に銘柄コードを正規化
         yahoo_symbol = self._normalize_symbol_for_yahoo(symbol)
         
-        loop = asyncio.get_event_loop()
-        hist_data = await loop.run_in_executor(None, self._fetch_yahoo_history, yahoo_symbol, period)
+        loop = asyncio.get_running_loop()
+        hist_data = await loop.run_in_executor(
+            _yfinance_executor, self._fetch_yahoo_history, yahoo_symbol, period
+        )
         
         if hist_data is None or hist_data.empty:
             raise StockDataProviderError(f"Yahoo Financeから過去データを取得できませんでした: {symbol}")
@@ -339,23 +657,28 @@ class StockDataProvider:
         Returns:
             List[StockPrice]: 株価データのリスト
         """
+        # 行毎にSeriesを生成するiterrowsを避け、列をPythonのリストとして一括で取り出す
+        try:
+            timestamps = hist_data.index.to_pydatetime()
+            columns = [hist_data[name].tolist() for name in ('Close', 'Open', 'High', 'Low', 'Volume')]
+        except (AttributeError, KeyError) as e:
+            logger.warning(f"過去データの形式が不正です: {symbol}, エラー: {e}")
+            return []
+        
         stock_prices = []
+        previous_close = None
         
-        for index, row in hist_data.iterrows():
+        for timestamp, close, open_price, high, low, volume in zip(timestamps, *columns):
             try:
-                # 前日終値を計算（前の行のCloseを使用）
-                previous_close = None
-                if len(stock_prices) > 0:
-                    previous_close = stock_prices[-1].price
-                
                 stock_price = StockPrice(
                     symbol=symbol,
-                    timestamp=index.to_pydatetime().replace(tzinfo=UTC),
-                    price=Decimal(str(row['Close'])),
-                    open_price=Decimal(str(row['Open'])),
-                    high_price=Decimal(str(row['High'])),
-                    low_price=Decimal(str(row['Low'])),
-                    volume=int(row['Volume']) if not pd.isna(row['Volume']) else None,
+                    timestamp=timestamp.replace(tzinfo=UTC),
+                    price=_to_decimal(close),
+                    open_price=_to_decimal(open_price),
+                    high_price=_to_decimal(high),
+                    low_price=_to_decimal(low),
+                    volume=int(volume) if not pd.isna(volume) else None,
+                    # 前日終値は前の行のClose
                     previous_close=previous_close
                 )
                 
@@ -363,9 +686,10 @@ class StockDataProvider:
                 stock_price.calculate_change()
                 
                 stock_prices.append(stock_price)
+                previous_close = stock_price.price
                 
             except (ValueError, KeyError, TypeError) as e:
-                logger.warning(f"過去データの行をスキップ: {symbol}, {index}, エラー: {e}")
+                logger.warning(f"過去データの行をスキップ: {symbol}, {timestamp}, エラー: {e}")
                 continue
         
         return stock_prices
@@ -427,15 +751,20 @@ class StockDataProvider:
             stock_prices = []
             previous_close = None
             
-            # 日付順に並び替え（古い順）
-            sorted_dates = sorted(time_series.keys())
+            # 日付を解析してから日付順に並び替え（古い順）
+            dated_rows = []
+            for date_str, day_data in time_series.items():
+                try:
+                    dated_rows.append((datetime.fromisoformat(date_str).replace(tzinfo=UTC), day_data))
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"過去データの日付をスキップ: {symbol}, {date_str}, エラー: {e}")
+            dated_rows.sort(key=lambda row: row[0])
             
-            for date_str in sorted_dates:
-                day_data = time_series[date_str]
+            for timestamp, day_data in dated_rows:
                 try:
                     stock_price = StockPrice(
                         symbol=symbol,
-                        timestamp=datetime.strptime(date_str, "%Y-%m-%d").replace(tzinfo=UTC),
+                        timestamp=timestamp,
                         price=Decimal(day_data.get("4. close", "0")),
                         open_price=Decimal(day_data.get("1. open", "0")),
                         high_price=Decimal(day_data.get("2. high", "0")),
@@ -451,7 +780,7 @@ class StockDataProvider:
                     previous_close = stock_price.price
                     
                 except (ValueError, KeyError, TypeError) as e:
-                    logger.warning(f"過去データの日付をスキップ: {symbol}, {date_str}, エラー: {e}")
+                    logger.warning(f"過去データの日付をスキップ: {symbol}, {timestamp.date()}, エラー: {e}")
                     continue
             
             return stock_prices
@@ -1,17 +1,39 @@
 """
 ポートフォリオ管理サービス
 """
+import asyncio
 import logging
+import time
 import uuid
 from datetime import datetime, UTC
 from decimal import Decimal
-from typing import List, Optional, Dict, Any
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from ..models.stock import (
     Portfolio, PortfolioHolding, ProfitLossCalculation, 
     PortfolioProfitLossReport
 )
-from .data_provider import StockDataProvider
+from .data_provider import PRICE_CACHE_TTL_SECONDS, StockDataProvider
+
+# 損益レポートのキャッシュ有効期間（秒）。現在価格のキャッシュ期間に合わせる
+PNL_CACHE_TTL_SECONDS = PRICE_CACHE_TTL_SECONDS
+
+# 現在価格キャッシュの最大件数（超えた場合は期限切れのものから削除）
+PRICE_CACHE_MAX_ENTRIES = 1024
+
+# 銘柄 -> (有効期限, 現在価格)
+# サービスとデータプロバイダーは呼び出し毎に作られるため、同一コンテナ内の呼び出し間で共有する
+_price_cache: Dict[str, Tuple[float, Decimal]] = {}
+
+
+
+def _evict_expired_prices() -> None:
+    """期限切れの現在価格を削除し、なお上限を超える場合は追加順に古いものから削除"""
+    now = time.monotonic()
+    for symbol in [symbol for symbol, (expires_at, _) in _price_cache.items() if expires_at <= now]:
+        del _price_cache[symbol]
+    while len(_price_cache) > PRICE_CACHE_MAX_ENTRIES:
+        del _price_cache[next(iter(_price_cache))]
 
 
 class PortfolioService:
@@ -25,6 +47,17 @@ class PortfolioService:
         # 現在はメモリ内ストレージを使用
         self._portfolios: Dict[str, Portfolio] = {}
         self._holdings: Dict[str, List[PortfolioHolding]] = {}
+        # ユーザー別のポートフォリオ、ポートフォリオ別の有効な保有銘柄（holding_idをキーに追加順を保持）
+        self._portfolios_by_user: Dict[str, List[Portfolio]] = {}
+        self._active_holdings: Dict[str, Dict[str, PortfolioHolding]] = {}
+        # 保有銘柄の索引（holding_id別、有効な保有の(user_id, 銘柄)別）
+        self._holding_by_id: Dict[str, PortfolioHolding] = {}
+        self._holdings_by_user_symbol: Dict[Tuple[str, str], List[PortfolioHolding]] = {}
+        # 保有銘柄の変更毎に進むバージョンと、損益レポートのキャッシュ（有効期限, バージョン, レポート）
+        self._portfolio_version: Dict[str, int] = {}
+        self._pnl_cache: Dict[str, Tuple[float, int, PortfolioProfitLossReport]] = {}
+        # 取得中の銘柄 -> 一括取得タスク（同時に要求された同じ銘柄の取得を1回にまとめる）
+        self._inflight_prices: Dict[str, asyncio.Task] = {}
     
     async def create_portfolio(self, user_id: str, name: str, description: Optional[str] = None) -> Portfolio:
         """ポートフォリオを作成"""
@@ -38,6 +71,8 @@ class PortfolioService:
         
         self._portfolios[portfolio_id] = portfolio
         self._holdings[portfolio_id] = []
+        self._active_holdings[portfolio_id] = {}
+        self._portfolios_by_user.setdefault(user_id, []).append(portfolio)
         
         self.logger.info(f"ポートフォリオ作成: {portfolio_id} - {name}")
         return portfolio
@@ -48,7 +83,7 @@ class PortfolioService:
     
     async def get_user_portfolios(self, user_id: str) -> List[Portfolio]:
         """ユーザーのポートフォリオ一覧を取得"""
-        return [p for p in self._portfolios.values() if p.user_id == user_id and p.is_active]
+        return [p for p in self._portfolios_by_user.get(user_id, []) if p.is_active]
     
     async def add_holding(
         self, 
@@ -60,7 +95,8 @@ class PortfolioService:
         notes: Optional[str] = None
     ) -> PortfolioHolding:
         """保有銘柄を追加"""
-        if portfolio_id not in self._portfolios:
+        portfolio = self._portfolios.get(portfolio_id)
+        if portfolio is None:
             raise ValueError(f"ポートフォリオが見つかりません: {portfolio_id}")
         
         holding_id = str(uuid.uuid4())
@@ -74,28 +110,41 @@ class PortfolioService:
             notes=notes
         )
         
-        if portfolio_id not in self._holdings:
-            self._holdings[portfolio_id] = []
+        self._holdings.setdefault(portfolio_id, []).append(holding)
+        self._active_holdings.setdefault(portfolio_id, {})[holding_id] = holding
+        self._holding_by_id[holding_id] = holding
+        self._holdings_by_user_symbol.setdefault((portfolio.user_id, holding.symbol), []).append(holding)
+        self._bump_version(portfolio_id)
         
-        self._holdings[portfolio_id].append(holding)
-        
-        self.logger.info(f"保有銘柄追加: {symbol} x{quantity} @ ¥{purchase_price}")
+        self.logger.info(f"保有銘柄追加: {holding.symbol} x{quantity} @ ¥{purchase_price}")
         return holding
     
     async def remove_holding(self, holding_id: str) -> bool:
         """保有銘柄を削除"""
-        for portfolio_id, holdings in self._holdings.items():
-            for i, holding in enumerate(holdings):
-                if holding.holding_id == holding_id:
-                    holding.is_active = False
-                    self.logger.info(f"保有銘柄削除: {holding.symbol}")
-                    return True
-        return False
+        holding = self._holding_by_id.get(holding_id)
+        if holding is None or not holding.is_active:
+            return False
+        
+        holding.is_active = False
+        del self._active_holdings[holding.portfolio_id][holding_id]
+        key = (self._portfolios[holding.portfolio_id].user_id, holding.symbol)
+        self._holdings_by_user_symbol[key].remove(holding)
+        if not self._holdings_by_user_symbol[key]:
+            del self._holdings_by_user_symbol[key]
+        self._bump_version(holding.portfolio_id)
+        
+        self.logger.info(f"保有銘柄削除: {holding.symbol}")
+        return True
     
     async def get_portfolio_holdings(self, portfolio_id: str) -> List[PortfolioHolding]:
         """ポートフォリオの保有銘柄一覧を取得"""
-        holdings = self._holdings.get(portfolio_id, [])
-        return [h for h in holdings if h.is_active]
+        active_holdings = self._active_holdings.get(portfolio_id)
+        return list(active_holdings.values()) if active_holdings else []
+    
+    async def get_user_holdings_by_symbol(self, user_id: str, symbol: str) -> List[PortfolioHolding]:
+        """ユーザーが保有する指定銘柄の一覧を取得"""
+        # 索引のキーはPortfolioHoldingで正規化済みの銘柄コード
+        return list(self._holdings_by_user_symbol.get((user_id, symbol.strip().upper()), []))
     
     async def update_holding(
         self, 
@@ -105,62 +154,153 @@ class PortfolioService:
         notes: Optional[str] = None
     ) -> Optional[PortfolioHolding]:
         """保有銘柄を更新"""
-        for holdings in self._holdings.values():
-            for holding in holdings:
-                if holding.holding_id == holding_id and holding.is_active:
-                    if quantity is not None:
-                        holding.quantity = quantity
-                    if purchase_price is not None:
-                        holding.purchase_price = purchase_price
-                    if notes is not None:
-                        holding.notes = notes
-                    holding.updated_at = datetime.now(UTC)
-                    
-                    self.logger.info(f"保有銘柄更新: {holding.symbol}")
-                    return holding
-        return None
+        holding = self._holding_by_id.get(holding_id)
+        if holding is None or not holding.is_active:
+            return None
+        
+        if quantity is not None:
+            holding.quantity = quantity
+        if purchase_price is not None:
+            holding.purchase_price = purchase_price
+        if notes is not None:
+            holding.notes = notes
+        holding.updated_at = datetime.now(UTC)
+        self._bump_version(holding.portfolio_id)
+        
+        self.logger.info(f"保有銘柄更新: {holding.symbol}")
+        return holding
     
     async def calculate_portfolio_pnl(self, portfolio_id: str) -> Optional[PortfolioProfitLossReport]:
-        """ポートフォリオの損益を計算"""
+        """ポートフォリオの損益を計算（保有銘柄に変更がなく有効期限内ならキャッシュを返す）"""
         portfolio = await self.get_portfolio(portfolio_id)
         if not portfolio:
             return None
         
+        cached = self._get_cached_pnl(portfolio_id)
+        if cached is not None:
+            return cached
+        
         holdings = await self.get_portfolio_holdings(portfolio_id)
-        if not holdings:
-            return PortfolioProfitLossReport.create_report(portfolio, [])
+        prices = await self._fetch_current_prices(holding.symbol for holding in holdings)
+        return self._build_pnl_report(portfolio, holdings, prices)
+    
+    async def calculate_all_user_portfolios_pnl(self, user_id: str) -> List[PortfolioProfitLossReport]:
+        """ユーザーの全ポートフォリオの損益を計算"""
+        portfolios = await self.get_user_portfolios(user_id)
+        reports: Dict[str, PortfolioProfitLossReport] = {}
+        stale = []
+        for portfolio in portfolios:
+            cached = self._get_cached_pnl(portfolio.portfolio_id)
+            if cached is not None:
+                reports[portfolio.portfolio_id] = cached
+            else:
+                stale.append((portfolio, await self.get_portfolio_holdings(portfolio.portfolio_id)))
         
-        holdings_pnl = []
+        # 複数のポートフォリオ・ロットで重複する銘柄も現在価格は1度だけ取得する
+        prices = await self._fetch_current_prices(
+            holding.symbol for _, holdings in stale for holding in holdings
+        )
+        for portfolio, holdings in stale:
+            reports[portfolio.portfolio_id] = self._build_pnl_report(portfolio, holdings, prices)
         
-        for holding in holdings:
+        return [reports[portfolio.portfolio_id] for portfolio in portfolios]
+    
+    def _bump_version(self, portfolio_id: str) -> None:
+        """保有銘柄の変更を記録し、損益レポートのキャッシュを無効化"""
+        self._portfolio_version[portfolio_id] = self._portfolio_version.get(portfolio_id, 0) + 1
+        self._pnl_cache.pop(portfolio_id, None)
+    
+    def _get_cached_pnl(self, portfolio_id: str) -> Optional[PortfolioProfitLossReport]:
+        """有効なキャッシュ済み損益レポートを取得"""
+        cached = self._pnl_cache.get(portfolio_id)
+        if cached is None:
+            return None
+        expires_at, version, report = cached
+        if expires_at <= time.monotonic() or version != self._portfolio_version.get(portfolio_id, 0):
+            del self._pnl_cache[portfolio_id]
+            return None
+        return report
+    
+    async def _fetch_current_prices(self, symbols: Iterable[str]) -> Dict[str, Decimal]:
+        """現在価格をまとめて取得（取得に失敗した銘柄は含めない）"""
+        prices: Dict[str, Decimal] = {}
+        misses = []
+        now = time.monotonic()
+        for symbol in dict.fromkeys(symbols):
+            cached = _price_cache.get(symbol)
+            if cached is not None and cached[0] > now:
+                prices[symbol] = cached[1]
+            else:
+                misses.append(symbol)
+        
+        # 他の呼び出しで取得中の銘柄はその結果を待ち、残りを1回の一括取得で取得する
+        pending = {symbol: self._inflight_prices[symbol] for symbol in misses if symbol in self._inflight_prices}
+        to_fetch = [symbol for symbol in misses if symbol not in pending]
+        if to_fetch:
+            task = asyncio.ensure_future(self._fetch_price_batch(to_fetch))
+            for symbol in to_fetch:
+                self._inflight_prices[symbol] = task
             try:
-                # 現在価格を取得
-                current_price_data = await self.data_provider.get_current_price(holding.symbol)
-                current_price = current_price_data.price
-                
-                # 損益計算
-                pnl = ProfitLossCalculation.calculate(holding, current_price)
-                holdings_pnl.append(pnl)
-                
-            except Exception as e:
-                self.logger.error(f"価格取得エラー {holding.symbol}: {e}")
-                # エラーの場合は取得価格を現在価格として使用
-                pnl = ProfitLossCalculation.calculate(holding, holding.purchase_price)
-                holdings_pnl.append(pnl)
+                prices.update(await task)
+            finally:
+                for symbol in to_fetch:
+                    self._inflight_prices.pop(symbol, None)
+        
+        for symbol, task in pending.items():
+            # 待機側のキャンセルで共有タスクを止めない
+            fetched = await asyncio.shield(task)
+            if symbol in fetched:
+                prices[symbol] = fetched[symbol]
         
-        return PortfolioProfitLossReport.create_report(portfolio, holdings_pnl)
+        return prices
     
-    async def calculate_all_user_portfolios_pnl(self, user_id: str) -> List[PortfolioProfitLossReport]:
-        """ユーザーの全ポートフォリオの損益を計算"""
-        portfolios = await self.get_user_portfolios(user_id)
-        reports = []
+    async def _fetch_price_batch(self, symbols: List[str]) -> Dict[str, Decimal]:
+        """データプロバイダーから現在価格を一括取得し、取得できた銘柄をキャッシュ"""
+        try:
+            stock_prices = await self.data_provider.get_current_prices(symbols)
+        except Exception as e:
+            self.logger.error(f"価格一括取得エラー: {e}")
+            return {}
         
-        for portfolio in portfolios:
-            report = await self.calculate_portfolio_pnl(portfolio.portfolio_id)
-            if report:
-                reports.append(report)
+        prices = {}
+        expires_at = time.monotonic() + PRICE_CACHE_TTL_SECONDS
+        for symbol in symbols:
+            stock_price = stock_prices.get(symbol)
+            if stock_price is None:
+                self.logger.error(f"価格取得エラー: {symbol}")
+                continue
+            prices[symbol] = stock_price.price
+            _price_cache[symbol] = (expires_at, stock_price.price)
         
-        return reports
+        if len(_price_cache) > PRICE_CACHE_MAX_ENTRIES:
+            _evict_expired_prices()
+        return prices
+    
+    def _build_pnl_report(
+        self,
+        portfolio: Portfolio,
+        holdings: List[PortfolioHolding],
+        prices: Dict[str, Decimal]
+    ) -> PortfolioProfitLossReport:
+        """取得済みの現在価格から損益レポートを作成"""
+        # 価格を取得できなかった銘柄は取得価格を現在価格として使用
+        holdings_pnl = [
+            ProfitLossCalculation.calculate(holding, prices.get(holding.symbol, holding.purchase_price))
+            for holding in holdings
+        ]
+        report = PortfolioProfitLossReport.create_report(portfolio, holdings_pnl)
+        
+        # 取得価格で代用した銘柄がある場合は、一時的な取得失敗を有効期間中残さないようキャッシュしない
+        if any(holding.symbol not in prices for holding in holdings):
+            self._pnl_cache.pop(portfolio.portfolio_id, None)
+            return report
+        
+        self._pnl_cache[portfolio.portfolio_id] = (
+            time.monotonic() + PNL_CACHE_TTL_SECONDS,
+            self._portfolio_version.get(portfolio.portfolio_id, 0),
+            report
+        )
+        return report
     
     async def get_portfolio_summary(self, portfolio_id: str) -> Optional[Dict[str, Any]]:
         """ポートフォリオサマリーを取得"""
@@ -191,6 +331,8 @@ class PortfolioCommandHandler:
     
     async def handle_portfolio_add_command(self, user_id: str, symbol: str, quantity: int, purchase_price: Decimal) -> str:
         """ポートフォリオに銘柄を追加"""
+        # 銘柄コードは入力時に正規化し、保存・検索・表示で同じ表記を使う
+        symbol = symbol.strip().upper()
         try:
             # ユーザーのデフォルトポートフォリオを取得または作成
             portfolios = await self.portfolio_service.get_user_portfolios(user_id)
@@ -224,22 +366,15 @@ class PortfolioCommandHandler:
     
     async def handle_portfolio_remove_command(self, user_id: str, symbol: str) -> str:
         """ポートフォリオから銘柄を削除"""
+        symbol = symbol.strip().upper()
         try:
             portfolios = await self.portfolio_service.get_user_portfolios(user_id)
             if not portfolios:
                 return "❌ ポートフォリオが見つかりません"
             
             # 指定銘柄の保有を削除
-            removed = False
-            for portfolio in portfolios:
-                holdings = await self.portfolio_service.get_portfolio_holdings(portfolio.portfolio_id)
-                for holding in holdings:
-                    if holding.symbol.upper() == symbol.upper():
-                        await self.portfolio_service.remove_holding(holding.holding_id)
-                        removed = True
-                        break
-                if removed:
-                    break
+            holdings = await self.portfolio_service.get_user_holdings_by_symbol(user_id, symbol)
+            removed = bool(holdings) and await self.portfolio_service.remove_holding(holdings[0].holding_id)
             
             if removed:
                 return f"✅ {symbol} をポートフォリオから削除しました"
@@ -257,19 +392,23 @@ class PortfolioCommandHandler:
             if not portfolios:
                 return "📋 **ポートフォリオ一覧**\n\nポートフォリオが見つかりませんでした。\n`!portfolio add <銘柄> <株数> <取得価格>` で銘柄を追加してください。"
             
-            result = "📋 **ポートフォリオ一覧**\n\n"
+            holdings_list = await asyncio.gather(
+                *(self.portfolio_service.get_portfolio_holdings(p.portfolio_id) for p in portfolios)
+            )
             
-            for portfolio in portfolios:
-                holdings = await self.portfolio_service.get_portfolio_holdings(portfolio.portfolio_id)
+            parts = ["📋 **ポートフォリオ一覧**\n\n"]
+            for portfolio, holdings in zip(portfolios, holdings_list):
                 if holdings:
-                    result += f"**{portfolio.name}**\n"
-                    for holding in holdings:
-                        result += f"• {holding.symbol}: {holding.quantity:,}株 @ ¥{holding.purchase_price:,.2f}\n"
-                    result += "\n"
+                    parts.append(f"**{portfolio.name}**\n")
+                    parts.extend(
+                        f"• {holding.symbol}: {holding.quantity:,}株 @ ¥{holding.purchase_price:,.2f}\n"
+                        for holding in holdings
+                    )
+                    parts.append("\n")
                 else:
-                    result += f"**{portfolio.name}**: 保有銘柄なし\n\n"
+                    parts.append(f"**{portfolio.name}**: 保有銘柄なし\n\n")
             
-            return result.strip()
+            return "".join(parts).strip()
             
         except Exception as e:
             self.logger.error(f"ポートフォリオ一覧エラー: {e}")
@@ -282,17 +421,19 @@ class PortfolioCommandHandler:
             if not reports:
                 return "📊 **含み損益レポート**\n\nポートフォリオが見つかりませんでした。"
             
-            result = "📊 **含み損益レポート**\n\n"
+            parts = ["📊 **含み損益レポート**\n\n"]
             
             total_purchase = Decimal('0')
             total_current = Decimal('0')
             total_pnl = Decimal('0')
             
             for report in reports:
-                result += f"**{report.portfolio_name}**\n"
-                result += f"取得価格合計: ¥{report.total_purchase_value:,.2f}\n"
-                result += f"現在価格合計: ¥{report.total_current_value:,.2f}\n"
-                result += f"含み損益: ¥{report.total_unrealized_pnl:,.2f} ({report.total_unrealized_pnl_percent:.2f}%)\n\n"
+                parts.append(
+                    f"**{report.portfolio_name}**\n"
+                    f"取得価格合計: ¥{report.total_purchase_value:,.2f}\n"
+                    f"現在価格合計: ¥{report.total_current_value:,.2f}\n"
+                    f"含み損益: ¥{report.total_unrealized_pnl:,.2f} ({report.total_unrealized_pnl_percent:.2f}%)\n\n"
+                )
                 
                 total_purchase += report.total_purchase_value
                 total_current += report.total_current_value
@@ -300,12 +441,14 @@ class PortfolioCommandHandler:
             
             if len(reports) > 1:
                 total_pnl_percent = (total_pnl / total_purchase * 100) if total_purchase > 0 else Decimal('0')
-                result += "**全体合計**\n"
-                result += f"取得価格合計: ¥{total_purchase:,.2f}\n"
-                result += f"現在価格合計: ¥{total_current:,.2f}\n"
-                result += f"含み損益: ¥{total_pnl:,.2f} ({total_pnl_percent:.2f}%)\n"
+                parts.append(
+                    "**全体合計**\n"
+                    f"取得価格合計: ¥{total_purchase:,.2f}\n"
+                    f"現在価格合計: ¥{total_current:,.2f}\n"
+                    f"含み損益: ¥{total_pnl:,.2f} ({total_pnl_percent:.2f}%)\n"
+                )
             
-            return result.strip()
+            return "".join(parts).strip()
             
         except Exception as e:
             self.logger.error(f"損益レポートエラー: {e}")
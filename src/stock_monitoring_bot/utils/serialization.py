@@ -0,0 +1,25 @@
+"""
+JSONシリアライズユーティリティ
+"""
+import json
+from typing import Any
+
+# 区切り文字を詰めたエンコーダーを使い回す（json.dumpsは引数指定のたびに生成するため）
+_encoder = json.JSONEncoder(separators=(',', ':'), default=str)
+
+
+def dumps(obj: Any) -> str:
+    """Lambdaレスポンス用にオブジェクトをコンパクトなJSON文字列へ変換"""
+    return _encoder.encode(obj)
+
+
+class LazyJson:
+    """ログ出力時にのみJSON化するラッパー（無効なログレベルではエンコードしない）"""
+    
+    __slots__ = ('obj',)
+    
+    def __init__(self, obj: Any):
+        self.obj = obj
+    
+    def __str__(self) -> str:
+        return dumps(self.obj)
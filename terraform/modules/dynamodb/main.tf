@@ -9,6 +9,19 @@ resource "aws_dynamodb_table" "stocks" {
     type = "S"
   }
 
+  attribute {
+    name = "is_active_pk"
+    type = "S"
+  }
+
+  # 監視中の銘柄のみを含むスパースインデックス
+  global_secondary_index {
+    name            = "active-index"
+    hash_key        = "is_active_pk"
+    range_key       = "symbol"
+    projection_type = "ALL"
+  }
+
   tags = {
     Name        = "${var.project_name}-stocks-${var.environment}"
     Environment = var.environment
@@ -37,6 +50,16 @@ resource "aws_dynamodb_table" "alerts" {
     type = "S"
   }
 
+  attribute {
+    name = "unsent_gsi_pk"
+    type = "S"
+  }
+
+  attribute {
+    name = "triggered_at"
+    type = "S"
+  }
+
   global_secondary_index {
     name            = "symbol-timestamp-index"
     hash_key        = "symbol"
@@ -44,6 +67,14 @@ resource "aws_dynamodb_table" "alerts" {
     projection_type = "ALL"
   }
 
+  # 未送信アラートのみを含むスパースインデックス
+  global_secondary_index {
+    name            = "unsent-index"
+    hash_key        = "unsent_gsi_pk"
+    range_key       = "triggered_at"
+    projection_type = "ALL"
+  }
+
   tags = {
     Name        = "${var.project_name}-alerts-${var.environment}"
     Environment = var.environment
@@ -3,6 +3,7 @@
 DynamoDBシリアライゼーションのテスト
 """
 import sys
+from decimal import Decimal
 sys.path.append('src')
 
 from stock_monitoring_bot.repositories.base import BaseRepository
@@ -22,7 +23,7 @@ def test_boolean_serialization():
         'name': 'Apple Inc.',
         'is_active': True,
         'count': 123,
-        'price': 150.5
+        'price': Decimal('150.5')
     }
     
     print("=== Boolean Serialization Test ===")
@@ -1,13 +1,17 @@
 """
 アラートエンジンのテスト
 """
+import asyncio
+import time
 import pytest
 from datetime import datetime, UTC, timedelta
 from decimal import Decimal
 from unittest.mock import AsyncMock, patch
 
 from src.stock_monitoring_bot.models.stock import MonitoredStock, StockPrice, Alert
-from src.stock_monitoring_bot.services.alert_engine import AlertEngine, VolumeData, AlertHistory
+from src.stock_monitoring_bot.services.alert_engine import (
+    AlertEngine, VolumeData, AlertHistory, JST, is_trading_hours
+)
 from src.stock_monitoring_bot.handlers.discord_handler import DiscordHandler
 
 
@@ -53,8 +57,7 @@ class TestAlertHistory:
         """重複防止期間経過後のテスト"""
         history = AlertHistory(duplicate_prevention_minutes=30)
         # 過去の時刻を設定
-        past_time = datetime.now(UTC) - timedelta(minutes=31)
-        history.recent_alerts["test_key"] = past_time
+        history.recent_alerts["test_key"] = time.monotonic() - 31 * 60
         assert history.should_send_alert("test_key") is True
     
     def test_record_alert(self):
@@ -62,24 +65,55 @@ class TestAlertHistory:
         history = AlertHistory()
         history.record_alert("test_key")
         assert "test_key" in history.recent_alerts
-        assert isinstance(history.recent_alerts["test_key"], datetime)
+        assert isinstance(history.recent_alerts["test_key"], float)
     
-    def test_cleanup_old_records(self):
-        """古い記録のクリーンアップテスト"""
-        history = AlertHistory()
-        # 古い記録を追加
-        old_time = datetime.now(UTC) - timedelta(hours=25)
-        recent_time = datetime.now(UTC) - timedelta(minutes=10)
+    def test_should_send_alert_with_given_time(self):
+        """渡した時刻で重複防止期間が判定されるテスト"""
+        history = AlertHistory(duplicate_prevention_minutes=30)
+        history.record_alert("test_key", now=1000.0)
+        
+        assert history.should_send_alert("test_key", now=1000.0 + 30 * 60) is False
+        assert history.should_send_alert("test_key", now=1000.0 + 30 * 60 + 1) is True
+    
+    def test_record_alert_expires_old_records(self):
+        """記録時に重複防止期間を過ぎた古い記録が削除されるテスト"""
+        history = AlertHistory(duplicate_prevention_minutes=30)
+        now = time.monotonic()
+        history.recent_alerts["old_key"] = now - 31 * 60
+        history.recent_alerts["recent_key"] = now - 10 * 60
         
-        history.recent_alerts["old_key"] = old_time
-        history.recent_alerts["recent_key"] = recent_time
+        history.record_alert("new_key")
         
-        history.cleanup_old_records()
+        assert list(history.recent_alerts) == ["recent_key", "new_key"]
+    
+    def test_record_alert_moves_key_to_end(self):
+        """再記録したキーが最新として扱われるテスト"""
+        history = AlertHistory()
+        history.record_alert("key_a")
+        history.record_alert("key_b")
+        history.record_alert("key_a")
+        
+        assert list(history.recent_alerts) == ["key_b", "key_a"]
+    
+    def test_record_alert_bounded_by_max_records(self):
+        """記録数が上限を超えると古いものから削除されるテスト"""
+        history = AlertHistory(max_records=2)
+        for key in ["key_1", "key_2", "key_3"]:
+            history.record_alert(key)
         
-        assert "old_key" not in history.recent_alerts
-        assert "recent_key" in history.recent_alerts
+        assert list(history.recent_alerts) == ["key_2", "key_3"]
 
 
+class TestIsTradingHours:
+    """is_trading_hours関数のテスト"""
+    
+    def test_given_time_is_converted_to_jst(self):
+        """渡した時刻が日本時間に変換されて判定されるテスト"""
+        assert is_trading_hours(datetime(2024, 1, 15, 1, 0, 0, tzinfo=UTC)) is True   # 月曜 10:00 JST
+        assert is_trading_hours(datetime(2024, 1, 15, 3, 0, 0, tzinfo=UTC)) is False  # 月曜 12:00 JST
+        assert is_trading_hours(datetime(2024, 1, 14, 1, 0, 0, tzinfo=UTC)) is False  # 日曜 10:00 JST
+    
+
 class TestAlertEngine:
     """AlertEngineクラスのテスト"""
     
@@ -154,6 +188,20 @@ class TestAlertEngine:
         assert alerts[0].price_at_trigger == Decimal("2400")
         assert alerts[0].threshold_value == Decimal("2500")
     
+    @pytest.mark.asyncio
+    async def test_check_alerts_share_given_timestamp(self, alert_engine, sample_stock):
+        """渡した時刻がアラートの発生日時と取引時間判定に使われるテスト"""
+        now = datetime(2024, 1, 15, 1, 0, 0, tzinfo=UTC)  # 月曜日 10:00 JST
+        price = StockPrice(symbol="7203", timestamp=now, price=Decimal("3100"))
+        volume_data = VolumeData(
+            symbol="7203", current_volume=300000, average_volume=100000, timestamp=now
+        )
+        
+        price_alerts = await alert_engine.check_price_alerts(sample_stock, price, now=now)
+        volume_alerts = await alert_engine.check_volume_alerts(sample_stock, volume_data, now=now)
+        
+        assert [alert.triggered_at for alert in price_alerts + volume_alerts] == [now, now]
+    
     @pytest.mark.asyncio
     async def test_check_price_alerts_no_threshold(self, alert_engine, sample_price):
         """閾値が設定されていない場合のテスト"""
@@ -190,6 +238,7 @@ class TestAlertEngine:
         assert len(alerts) == 1
         assert alerts[0].alert_type == "volume"
         assert alerts[0].volume_at_trigger == 300000
+        assert alerts[0].threshold_value == Decimal("200000")
         assert "急増" in alerts[0].message
     
     @pytest.mark.asyncio
@@ -208,6 +257,7 @@ class TestAlertEngine:
         assert len(alerts) == 1
         assert alerts[0].alert_type == "volume"
         assert alerts[0].volume_at_trigger == 40000
+        assert alerts[0].threshold_value == Decimal("50000")
         assert "急減" in alerts[0].message
     
     @pytest.mark.asyncio
@@ -289,6 +339,58 @@ class TestAlertEngine:
         assert processed[0].is_sent is False
         assert processed[0].sent_at is None
     
+    @pytest.mark.asyncio
+    async def test_process_alerts_sends_concurrently(self, alert_engine, mock_discord_handler):
+        """複数のアラートが並行して送信されるテスト"""
+        in_flight = 0
+        max_in_flight = 0
+        
+        async def send_alert(alert):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+        
+        mock_discord_handler.send_alert.side_effect = send_alert
+        alerts = [
+            Alert(
+                alert_id=f"test-id-{i}",
+                symbol=symbol,
+                alert_type="price_upper",
+                message="Test alert",
+                threshold_value=Decimal("3000")
+            )
+            for i, symbol in enumerate(["7203", "9984", "6758", "7203"])
+        ]
+        
+        processed = await alert_engine.process_alerts(alerts)
+        
+        # 同一バッチ内の重複は送信前に除外される
+        assert [alert.alert_id for alert in processed] == ["test-id-0", "test-id-1", "test-id-2"]
+        assert all(alert.is_sent for alert in processed)
+        assert mock_discord_handler.send_alert.call_count == 3
+        assert max_in_flight == 3
+    
+    @pytest.mark.asyncio
+    async def test_process_alerts_failure_allows_retry(self, alert_engine, mock_discord_handler):
+        """送信失敗したアラートは次回再送されるテスト"""
+        mock_discord_handler.send_alert.side_effect = [Exception("Discord error"), None]
+        alert = Alert(
+            alert_id="test-id",
+            symbol="7203",
+            alert_type="price_upper",
+            message="Test alert",
+            threshold_value=Decimal("3000")
+        )
+        
+        first = await alert_engine.process_alerts([alert])
+        assert first[0].is_sent is False
+        
+        second = await alert_engine.process_alerts([alert])
+        assert second[0].is_sent is True
+        assert mock_discord_handler.send_alert.call_count == 2
+    
     def test_update_volume_history(self, alert_engine):
         """取引量履歴更新のテスト"""
         symbol = "7203"
@@ -298,7 +400,7 @@ class TestAlertEngine:
             alert_engine.update_volume_history(symbol, volume)
         
         assert len(alert_engine._volume_history[symbol]) == 3
-        assert alert_engine._volume_history[symbol] == [100000, 120000, 110000]
+        assert list(alert_engine._volume_history[symbol]) == [100000, 120000, 110000]
     
     def test_update_volume_history_limit(self, alert_engine):
         """取引量履歴の上限テスト"""
@@ -310,6 +412,7 @@ class TestAlertEngine:
         
         assert len(alert_engine._volume_history[symbol]) == 20
         assert alert_engine._volume_history[symbol][0] == 100001  # 最初のデータは削除される
+        assert alert_engine.calculate_average_volume(symbol) == sum(range(100001, 100021)) // 20
     
     def test_calculate_average_volume(self, alert_engine):
         """平均取引量計算のテスト"""
@@ -380,8 +483,8 @@ class TestAlertEngine:
     def test_is_trading_hours_weekday_morning(self, mock_datetime, alert_engine):
         """平日午前の取引時間テスト"""
         # 平日の10:00 JST (01:00 UTC)
-        mock_datetime.now.return_value = datetime(2024, 1, 15, 1, 0, 0, tzinfo=UTC)  # 月曜日
-        mock_datetime.strptime = datetime.strptime
+        now = datetime(2024, 1, 15, 1, 0, 0, tzinfo=UTC)  # 月曜日
+        mock_datetime.now.side_effect = lambda tz=None: now.astimezone(tz)
         
         assert alert_engine._is_trading_hours() is True
     
@@ -389,8 +492,8 @@ class TestAlertEngine:
     def test_is_trading_hours_weekday_afternoon(self, mock_datetime, alert_engine):
         """平日午後の取引時間テスト"""
         # 平日の14:00 JST (05:00 UTC)
-        mock_datetime.now.return_value = datetime(2024, 1, 15, 5, 0, 0, tzinfo=UTC)  # 月曜日
-        mock_datetime.strptime = datetime.strptime
+        now = datetime(2024, 1, 15, 5, 0, 0, tzinfo=UTC)  # 月曜日
+        mock_datetime.now.side_effect = lambda tz=None: now.astimezone(tz)
         
         assert alert_engine._is_trading_hours() is True
     
@@ -398,8 +501,8 @@ class TestAlertEngine:
     def test_is_trading_hours_lunch_break(self, mock_datetime, alert_engine):
         """昼休み時間のテスト"""
         # 平日の12:00 JST (03:00 UTC)
-        mock_datetime.now.return_value = datetime(2024, 1, 15, 3, 0, 0, tzinfo=UTC)  # 月曜日
-        mock_datetime.strptime = datetime.strptime
+        now = datetime(2024, 1, 15, 3, 0, 0, tzinfo=UTC)  # 月曜日
+        mock_datetime.now.side_effect = lambda tz=None: now.astimezone(tz)
         
         assert alert_engine._is_trading_hours() is False
     
@@ -407,8 +510,8 @@ class TestAlertEngine:
     def test_is_trading_hours_weekend(self, mock_datetime, alert_engine):
         """週末のテスト"""
         # 土曜日の10:00 JST (01:00 UTC)
-        mock_datetime.now.return_value = datetime(2024, 1, 13, 1, 0, 0, tzinfo=UTC)  # 土曜日
-        mock_datetime.strptime = datetime.strptime
+        now = datetime(2024, 1, 13, 1, 0, 0, tzinfo=UTC)  # 土曜日
+        mock_datetime.now.side_effect = lambda tz=None: now.astimezone(tz)
         
         assert alert_engine._is_trading_hours() is False
     
@@ -416,11 +519,23 @@ class TestAlertEngine:
     def test_is_trading_hours_after_close(self, mock_datetime, alert_engine):
         """取引終了後のテスト"""
         # 平日の16:00 JST (07:00 UTC)
-        mock_datetime.now.return_value = datetime(2024, 1, 15, 7, 0, 0, tzinfo=UTC)  # 月曜日
-        mock_datetime.strptime = datetime.strptime
+        now = datetime(2024, 1, 15, 7, 0, 0, tzinfo=UTC)  # 月曜日
+        mock_datetime.now.side_effect = lambda tz=None: now.astimezone(tz)
         
         assert alert_engine._is_trading_hours() is False
 
+    
+    @pytest.mark.parametrize("hour, minute, expected", [
+        (9, 0, True), (11, 30, True), (11, 31, False),
+        (12, 30, True), (15, 0, True), (15, 1, False)
+    ])
+    @patch('src.stock_monitoring_bot.services.alert_engine.datetime')
+    def test_is_trading_hours_session_boundaries(self, mock_datetime, alert_engine, hour, minute, expected):
+        """取引時間の境界のテスト（日本時間で判定される）"""
+        now = datetime(2024, 1, 15, hour, minute, 0, tzinfo=JST)  # 月曜日
+        mock_datetime.now.side_effect = lambda tz=None: now.astimezone(tz)
+        
+        assert alert_engine._is_trading_hours() is expected
 
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
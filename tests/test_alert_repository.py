@@ -0,0 +1,319 @@
+"""
+アラートリポジトリのテスト
+"""
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.stock_monitoring_bot.models.stock import Alert
+from src.stock_monitoring_bot.repositories.alert_repository import AlertRepository
+from src.stock_monitoring_bot.repositories.base import close_shared_clients
+
+
+def _key(index: int) -> dict:
+    """テスト用のDynamoDBキーを作成"""
+    return {
+        'alert_id': {'S': f"alert_{index}"},
+        'timestamp': {'S': f"2024-01-01T00:00:{index % 60:02d}"}
+    }
+
+
+class TestAlertRepository:
+    """AlertRepositoryのテスト"""
+
+    def setup_method(self):
+        """テストセットアップ"""
+        self.repository = AlertRepository()
+        self.client = AsyncMock()
+        self.repository._client = AsyncMock(return_value=self.client)
+
+    @pytest.mark.asyncio
+    async def test_cleanup_old_alerts_uses_batch_write(self):
+        """古いアラートが25件単位のBatchWriteItemで削除されるテスト"""
+        self.client.scan.return_value = {'Items': [_key(i) for i in range(60)]}
+        self.client.batch_write_item.return_value = {'UnprocessedItems': {}}
+
+        deleted = await self.repository.cleanup_old_alerts(days=30, total_segments=1)
+
+        assert deleted == 60
+        assert self.client.batch_write_item.call_count == 3
+        batch_sizes = sorted(
+            len(call.kwargs['RequestItems'][self.repository.get_table_name()])
+            for call in self.client.batch_write_item.call_args_list
+        )
+        assert batch_sizes == [10, 25, 25]
+        self.client.delete_item.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_cleanup_old_alerts_retries_unprocessed_items(self):
+        """UnprocessedItemsが再送されるテスト"""
+        table_name = self.repository.get_table_name()
+        unprocessed = {table_name: [{'DeleteRequest': {'Key': _key(0)}}]}
+        self.client.scan.return_value = {'Items': [_key(i) for i in range(3)]}
+        self.client.batch_write_item.side_effect = [
+            {'UnprocessedItems': unprocessed},
+            {'UnprocessedItems': {}}
+        ]
+
+        with patch('src.stock_monitoring_bot.repositories.alert_repository.asyncio.sleep',
+                   new=AsyncMock()):
+            deleted = await self.repository.cleanup_old_alerts(days=30, total_segments=1)
+
+        assert deleted == 3
+        assert self.client.batch_write_item.call_count == 2
+        retry_call = self.client.batch_write_item.call_args_list[1]
+        assert retry_call.kwargs['RequestItems'] == unprocessed
+
+    @pytest.mark.asyncio
+    async def test_cleanup_old_alerts_follows_pagination(self):
+        """スキャンの全ページが削除対象になるテスト"""
+        self.client.scan.side_effect = [
+            {'Items': [_key(i) for i in range(30)], 'LastEvaluatedKey': _key(29)},
+            {'Items': [_key(i) for i in range(30, 40)]}
+        ]
+        self.client.batch_write_item.return_value = {'UnprocessedItems': {}}
+
+        deleted = await self.repository.cleanup_old_alerts(days=30, total_segments=1)
+
+        assert deleted == 40
+        assert self.client.scan.call_count == 2
+        assert 'ExclusiveStartKey' not in self.client.scan.call_args_list[0].kwargs
+        assert self.client.scan.call_args_list[1].kwargs['ExclusiveStartKey'] == _key(29)
+        assert self.client.batch_write_item.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_cleanup_old_alerts_scans_segments_in_parallel(self):
+        """セグメント毎に並列スキャンされるテスト"""
+        def scan(**kwargs):
+            segment = kwargs['Segment']
+            return {'Items': [_key(segment * 10 + i) for i in range(5)]}
+
+        self.client.scan.side_effect = scan
+        self.client.batch_write_item.return_value = {'UnprocessedItems': {}}
+
+        deleted = await self.repository.cleanup_old_alerts(days=30, total_segments=4)
+
+        assert deleted == 20
+        segments = sorted(call.kwargs['Segment'] for call in self.client.scan.call_args_list)
+        assert segments == [0, 1, 2, 3]
+        assert all(call.kwargs['TotalSegments'] == 4 for call in self.client.scan.call_args_list)
+
+    @pytest.mark.asyncio
+    async def test_get_unsent_alerts_queries_sparse_index(self):
+        """未送信アラートがスパースGSIへのクエリで取得されるテスト"""
+        self.client.query.return_value = {'Items': [{
+            'alert_id': {'S': 'alert_1'},
+            'symbol': {'S': '7203'},
+            'timestamp': {'S': '2024-01-01T09:00:00'},
+            'alert_type': {'S': 'price_upper'},
+            'message': {'S': '上限価格に到達'},
+            'triggered_at': {'S': '2024-01-01T09:00:00'},
+            'is_sent': {'BOOL': False},
+            'unsent_gsi_pk': {'S': 'UNSENT'}
+        }]}
+
+        alerts = await self.repository.get_unsent_alerts(limit=10)
+
+        assert [alert.alert_id for alert in alerts] == ['alert_1']
+        self.client.scan.assert_not_called()
+        kwargs = self.client.query.call_args.kwargs
+        assert kwargs['IndexName'] == 'unsent-index'
+        assert kwargs['Limit'] == 10
+        assert kwargs['ScanIndexForward'] is True
+
+    def _mock_scan_paginator(self, pages: list) -> MagicMock:
+        """指定ページを返すスキャンのページネーターを設定"""
+        async def paginate(**kwargs):
+            for page in pages:
+                yield page
+
+        paginator = MagicMock()
+        paginator.paginate = MagicMock(side_effect=paginate)
+        self.client.get_paginator = MagicMock(return_value=paginator)
+        return paginator
+
+    @pytest.mark.asyncio
+    async def test_get_unsent_alerts_falls_back_to_scan(self):
+        """GSIが空の場合はGSIキー移行前の未送信アラートをスキャンで取得するテスト"""
+        def item(alert_id, triggered_at):
+            return {
+                'alert_id': {'S': alert_id},
+                'symbol': {'S': '7203'},
+                'timestamp': {'S': triggered_at},
+                'alert_type': {'S': 'volume'},
+                'message': {'S': '出来高急増'},
+                'triggered_at': {'S': triggered_at},
+                'is_sent': {'BOOL': False}
+            }
+
+        self.client.query.return_value = {'Items': []}
+        paginator = self._mock_scan_paginator([
+            {'Items': [item('alert_2', '2024-01-01T10:00:00')]},
+            {'Items': [item('alert_1', '2024-01-01T09:00:00'), item('alert_3', '2024-01-01T11:00:00')]}
+        ])
+
+        alerts = await self.repository.get_unsent_alerts(limit=2)
+
+        assert [alert.alert_id for alert in alerts] == ['alert_1', 'alert_2']
+        kwargs = paginator.paginate.call_args.kwargs
+        assert kwargs['FilterExpression'] == 'is_sent = :sent AND attribute_not_exists(unsent_gsi_pk)'
+        assert kwargs['ExpressionAttributeValues'] == {':sent': {'BOOL': False}}
+
+    @pytest.mark.asyncio
+    async def test_backfill_unsent_index(self):
+        """GSIキーのない未送信アラートにunsent_gsi_pkが設定されるテスト"""
+        from botocore.exceptions import ClientError
+
+        self._mock_scan_paginator([{'Items': [_key(1), _key(2)]}])
+        # 2件目はスキャン後に送信済みになった想定
+        self.client.update_item.side_effect = [
+            {},
+            ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': ''}}, 'UpdateItem')
+        ]
+
+        assert await self.repository.backfill_unsent_index() == 1
+
+        kwargs = self.client.update_item.call_args_list[0].kwargs
+        assert kwargs['Key'] == _key(1)
+        assert kwargs['UpdateExpression'] == 'SET unsent_gsi_pk = :u'
+        assert kwargs['ConditionExpression'] == 'is_sent = :sent'
+        assert kwargs['ExpressionAttributeValues'] == {
+            ':u': {'S': 'UNSENT'}, ':sent': {'BOOL': False}
+        }
+
+    @pytest.mark.asyncio
+    async def test_create_alert_serializes_decimal_as_number(self):
+        """Decimal値がそのままDynamoDBの数値型で書き込まれるテスト"""
+        alert = Alert(
+            alert_id="alert_1",
+            symbol="7203",
+            alert_type="price_upper",
+            message="上限価格に到達",
+            triggered_at=datetime(2024, 1, 1, 9, 0, 0),
+            price_at_trigger=Decimal("2500.1"),
+            threshold_value=Decimal("2500")
+        )
+
+        assert await self.repository.create_alert(alert) is True
+
+        item = self.client.put_item.call_args.kwargs['Item']
+        assert item['price_at_trigger'] == {'N': '2500.1'}
+        assert item['threshold_value'] == {'N': '2500'}
+        assert item['is_sent'] == {'BOOL': False}
+        assert item['timestamp'] == {'S': '2024-01-01T09:00:00'}
+        assert 'sent_at' not in item
+
+
+    @pytest.mark.asyncio
+    async def test_get_alert_keeps_decimal_precision(self):
+        """数値属性が精度を失わずDecimalで読み込まれるテスト"""
+        self.client.get_item.return_value = {'Item': {
+            'alert_id': {'S': 'alert_1'},
+            'symbol': {'S': '7203'},
+            'timestamp': {'S': '2024-01-01T09:00:00'},
+            'alert_type': {'S': 'price_lower'},
+            'message': {'S': '下限価格に到達'},
+            'triggered_at': {'S': '2024-01-01T09:00:00'},
+            'price_at_trigger': {'N': '2499.9000000001'},
+            'volume_at_trigger': {'N': '1500000'},
+            'is_sent': {'BOOL': True}
+        }}
+
+        alert = await self.repository.get_alert('alert_1', datetime(2024, 1, 1, 9, 0, 0))
+
+        assert alert.price_at_trigger == Decimal('2499.9000000001')
+        assert alert.volume_at_trigger == 1500000
+        assert alert.threshold_value is None
+
+    @pytest.mark.asyncio
+    async def test_check_duplicate_alert_filters_server_side(self):
+        """重複チェックが種別フィルタ付きクエリで判定されるテスト"""
+        self.client.query.side_effect = [
+            {'Items': [], 'LastEvaluatedKey': {'alert_id': {'S': 'alert_0'}}},
+            {'Items': [{
+                'alert_id': {'S': 'alert_1'},
+                'symbol': {'S': '7203'},
+                'timestamp': {'S': '2024-01-01T09:00:00'},
+                'alert_type': {'S': 'volume'},
+                'message': {'S': '出来高急増'},
+                'triggered_at': {'S': '2024-01-01T09:00:00'},
+                'is_sent': {'BOOL': True}
+            }]}
+        ]
+
+        assert await self.repository.check_duplicate_alert('7203', 'volume') is True
+
+        assert self.client.query.call_count == 2
+        first_kwargs = self.client.query.call_args_list[0].kwargs
+        assert first_kwargs['FilterExpression'] == 'alert_type = :type'
+        assert first_kwargs['ExpressionAttributeValues'][':type'] == {'S': 'volume'}
+        assert 'Limit' not in first_kwargs
+        assert self.client.query.call_args_list[1].kwargs['ExclusiveStartKey'] == {
+            'alert_id': {'S': 'alert_0'}
+        }
+
+    @pytest.mark.asyncio
+    async def test_check_duplicate_alert_without_match(self):
+        """一致するアラートがなければ重複なしとなるテスト"""
+        self.client.query.return_value = {'Items': []}
+
+        assert await self.repository.check_duplicate_alert('7203', 'volume') is False
+
+    @pytest.mark.asyncio
+    async def test_check_duplicate_alerts_bulk(self):
+        """複数銘柄の重複チェックがまとめて行われるテスト"""
+        async def last_alert(symbol, alert_type, since):
+            if symbol == '6758':
+                raise RuntimeError("クエリ失敗")
+            return object() if symbol == '7203' else None
+
+        self.repository.get_last_alert_of_type = AsyncMock(side_effect=last_alert)
+
+        results = await self.repository.check_duplicate_alerts_bulk([
+            ('7203', 'volume'), ('9984', 'volume'), ('6758', 'price_upper'), ('7203', 'volume')
+        ])
+
+        assert results == {
+            ('7203', 'volume'): True,
+            ('9984', 'volume'): False,
+            ('6758', 'price_upper'): False
+        }
+        assert self.repository.get_last_alert_of_type.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_create_alert_validates_before_opening_client(self):
+        """不正な入力ではクライアントを取得しないテスト"""
+        alert = Alert(
+            alert_id="alert_1",
+            symbol="TOO_LONG_SYMBOL",
+            alert_type="price_upper",
+            message="上限価格に到達"
+        )
+
+        with pytest.raises(ValueError):
+            await self.repository.create_alert(alert)
+
+        self.repository._client.assert_not_called()
+
+class TestSharedClient:
+    """BaseRepository._clientの共有クライアントのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_client_reused_within_event_loop(self):
+        """同一ループ内では非同期クライアントを1度だけ作成するテスト"""
+        dynamo_client = AsyncMock()
+        client_context = MagicMock()
+        client_context.__aenter__ = AsyncMock(return_value=dynamo_client)
+
+        with patch('src.stock_monitoring_bot.repositories.base.aioboto3.Session') as session_class:
+            session_class.return_value.client.return_value = client_context
+
+            first = await AlertRepository()._client()
+            second = await AlertRepository()._client()
+            await close_shared_clients()
+
+        assert first is dynamo_client
+        assert second is dynamo_client
+        assert session_class.return_value.client.call_count == 1
+        dynamo_client.__aexit__.assert_awaited_once()
@@ -0,0 +1,58 @@
+"""
+設定管理のテスト
+"""
+from unittest.mock import Mock, patch
+
+from src.stock_monitoring_bot.config import Config
+
+
+class TestConfigParameterCache:
+    """Config.get_parameterのTTLキャッシュのテスト"""
+
+    def setup_method(self):
+        """テストセットアップ"""
+        self.config = Config()
+        self.ssm_client = Mock()
+        self.ssm_client.get_parameter.return_value = {
+            'Parameter': {'Value': 'public-key-value'}
+        }
+        self.config._ssm_client = self.ssm_client
+        self.parameter_name = "/stock-monitoring-bot/dev/discord-public-key"
+
+    def test_cached_within_ttl(self):
+        """TTL内の2回目の呼び出しではSSMを呼ばないテスト"""
+        with patch('src.stock_monitoring_bot.config.time.monotonic', return_value=1000.0):
+            first = self.config.get_parameter(self.parameter_name, ttl=300)
+        with patch('src.stock_monitoring_bot.config.time.monotonic', return_value=1299.0):
+            second = self.config.get_parameter(self.parameter_name, ttl=300)
+
+        assert first == "public-key-value"
+        assert second == "public-key-value"
+        assert self.ssm_client.get_parameter.call_count == 1
+
+    def test_refetch_after_expiry(self):
+        """TTL経過後は再取得するテスト"""
+        with patch('src.stock_monitoring_bot.config.time.monotonic', return_value=1000.0):
+            self.config.get_parameter(self.parameter_name, ttl=300)
+
+        self.ssm_client.get_parameter.return_value = {
+            'Parameter': {'Value': 'rotated-value'}
+        }
+        with patch('src.stock_monitoring_bot.config.time.monotonic', return_value=1301.0):
+            value = self.config.get_parameter(self.parameter_name, ttl=300)
+
+        assert value == "rotated-value"
+        assert self.ssm_client.get_parameter.call_count == 2
+
+    def test_failed_lookup_not_cached(self):
+        """取得失敗時はdefaultを返し、キャッシュしないテスト"""
+        self.ssm_client.get_parameter.side_effect = Exception("ParameterNotFound")
+
+        value = self.config.get_parameter(self.parameter_name, default="fallback")
+        assert value == "fallback"
+
+        self.ssm_client.get_parameter.side_effect = None
+        value = self.config.get_parameter(self.parameter_name, default="fallback")
+
+        assert value == "public-key-value"
+        assert self.ssm_client.get_parameter.call_count == 2
@@ -1,16 +1,20 @@
 """
 株価データプロバイダーのテスト
 """
+import asyncio
+import threading
 import pytest
-from unittest.mock import patch
+from unittest.mock import Mock, PropertyMock, patch
 from decimal import Decimal
 from datetime import datetime, UTC
+import numpy as np
 import pandas as pd
 import aiohttp
 
 from src.stock_monitoring_bot.services.data_provider import (
     StockDataProvider, 
-    StockDataProviderError
+    StockDataProviderError,
+    _to_decimal
 )
 from src.stock_monitoring_bot.models.stock import StockPrice
 
@@ -60,6 +64,22 @@ class TestStockDataProvider:
         for symbol in invalid_symbols:
             assert not provider.validate_symbol(symbol), f"'{symbol}' should be invalid"
     
+    def test_normalize_symbol_for_yahoo(self, provider):
+        """Yahoo Finance用の銘柄コード正規化テスト"""
+        cases = {
+            "7203": "7203.T",
+            " 142a ": "142A.T",
+            "8697A": "8697A.T",
+            "7203.T": "7203.T",
+            "AAPL": "AAPL",
+            "12345": "12345",
+            "72031": "72031",
+            "BRK.A": "BRK.A",
+        }
+        
+        for symbol, expected in cases.items():
+            assert provider._normalize_symbol_for_yahoo(symbol) == expected, symbol
+    
     @pytest.mark.asyncio
     async def test_get_current_price_invalid_symbol(self, provider):
         """無効な銘柄コードでのエラーテスト"""
@@ -93,6 +113,20 @@ class TestStockDataProvider:
             assert result.change_amount == Decimal("1.0")  # 150 - 149
             assert result.change_percent == Decimal("0.6711409395973154362416107383")  # (1/149)*100
     
+    @pytest.mark.asyncio
+    async def test_yahoo_fetch_runs_on_dedicated_executor(self, provider):
+        """yfinanceの取得が専用スレッドプールで実行されるテスト"""
+        thread_names = []
+        
+        def fetch(symbol):
+            thread_names.append(threading.current_thread().name)
+            return {'regularMarketPrice': 150.0}
+        
+        with patch.object(provider, '_fetch_yahoo_data', side_effect=fetch):
+            await provider.get_current_price("AAPL")
+        
+        assert thread_names[0].startswith("yfinance")
+    
     @pytest.mark.asyncio
     async def test_get_current_price_yahoo_fallback_to_alpha(self, provider):
         """Yahoo Finance失敗時のAlpha Vantageフォールバックテスト"""
@@ -171,6 +205,80 @@ class TestStockDataProvider:
             with pytest.raises(StockDataProviderError, match="Yahoo Financeから過去データを取得できませんでした"):
                 await provider.get_historical_data("AAPL")
     
+    def test_fetch_yahoo_data_uses_fast_info(self, provider):
+        """fast_infoから取得でき、重いinfoを参照しないテスト"""
+        ticker = Mock()
+        ticker.fast_info = Mock(
+            last_price=150.0, open=148.0, day_high=152.0, day_low=147.0,
+            last_volume=1000000, previous_close=float('nan')
+        )
+        info = PropertyMock()
+        type(ticker).info = info
+        
+        with patch('src.stock_monitoring_bot.services.data_provider.yf.Ticker', return_value=ticker):
+            data = provider._fetch_yahoo_data("AAPL")
+        
+        assert data == {
+            'regularMarketPrice': 150.0,
+            'regularMarketOpen': 148.0,
+            'regularMarketDayHigh': 152.0,
+            'regularMarketDayLow': 147.0,
+            'regularMarketVolume': 1000000,
+            'symbol': 'AAPL'
+        }
+        info.assert_not_called()
+        ticker.history.assert_not_called()
+    
+    def test_fetch_yahoo_data_falls_back_to_history(self, provider):
+        """fast_infoに価格がない場合にhistoryから取得するテスト"""
+        ticker = Mock()
+        ticker.fast_info = Mock(last_price=None)
+        ticker.history.return_value = pd.DataFrame({
+            'Open': [148.0], 'High': [152.0], 'Low': [147.0], 'Close': [150.0], 'Volume': [1000000]
+        })
+        
+        with patch('src.stock_monitoring_bot.services.data_provider.yf.Ticker', return_value=ticker):
+            data = provider._fetch_yahoo_data("AAPL")
+        
+        assert data['regularMarketPrice'] == 150.0
+        assert data['regularMarketVolume'] == 1000000
+        ticker.history.assert_called_once_with(period="1d")
+    
+    def test_parse_yahoo_history(self, provider):
+        """過去データの解析で前日終値の連鎖・欠損値・不正行が扱われるテスト"""
+        dates = pd.date_range('2024-01-01', periods=4, freq='D', tz='Asia/Tokyo')
+        hist_data = pd.DataFrame({
+            'Open': [100.0, 101.0, 102.0, 103.0],
+            'High': [105.0, 106.0, 107.0, 108.0],
+            'Low': [99.0, 100.0, 101.0, 102.0],
+            'Close': [104.0, -1.0, 106.0, 107.0],
+            'Volume': [1000000.0, 1100000.0, float('nan'), 1300000.0]
+        }, index=dates)
+        
+        result = provider._parse_yahoo_history("7203", hist_data)
+        
+        # 価格が不正な2行目はスキップされ、前日終値は直前の有効な行から引き継ぐ
+        assert [price.price for price in result] == [Decimal("104.0"), Decimal("106.0"), Decimal("107.0")]
+        assert [price.previous_close for price in result] == [None, Decimal("104.0"), Decimal("106.0")]
+        assert result[1].volume is None
+        assert result[2].volume == 1300000
+        assert result[2].change_amount == Decimal("1.0")
+    
+    def test_parse_yahoo_history_missing_column(self, provider):
+        """必要な列がない場合は空リストを返すテスト"""
+        hist_data = pd.DataFrame({'Close': [104.0]}, index=pd.date_range('2024-01-01', periods=1))
+        
+        assert provider._parse_yahoo_history("7203", hist_data) == []
+    
+    def test_to_decimal_conversions(self):
+        """数値型ごとのDecimal変換テスト（floatの2進数誤差を取り込まない）"""
+        assert _to_decimal(0.1) == Decimal("0.1")
+        assert _to_decimal(np.float64(2500.5)) == Decimal("2500.5")
+        assert _to_decimal(np.int64(2500)) == Decimal("2500")
+        assert _to_decimal(2500) == Decimal("2500")
+        value = Decimal("1.10")
+        assert _to_decimal(value) is value
+    
     def test_parse_yahoo_data_success(self, provider):
         """Yahoo Financeデータ解析成功時のテスト"""
         mock_data = {
@@ -219,6 +327,25 @@ class TestStockDataProvider:
         assert result.price == Decimal("150.0000")
         assert result.change_amount == Decimal("1.0000")
     
+    def test_parse_alpha_vantage_historical_orders_by_date(self, provider):
+        """Alpha Vantageの過去データが日付順に解析され、不正な日付はスキップされるテスト"""
+        def day(close):
+            return {"1. open": "100", "2. high": "110", "3. low": "90", "4. close": close, "5. volume": "1000"}
+        
+        mock_data = {"Time Series (Daily)": {
+            "2024-01-03": day("103"),
+            "2024-01-01": day("101"),
+            "not-a-date": day("999"),
+            "2024-01-02": day("102"),
+        }}
+        
+        result = provider._parse_alpha_vantage_historical("AAPL", mock_data)
+        
+        assert [price.timestamp for price in result] == [
+            datetime(2024, 1, day_of_month, tzinfo=UTC) for day_of_month in (1, 2, 3)
+        ]
+        assert [price.previous_close for price in result] == [None, Decimal("101"), Decimal("102")]
+    
     def test_parse_alpha_vantage_data_error_message(self, provider):
         """Alpha Vantageのエラーメッセージテスト"""
         mock_data = {
@@ -244,6 +371,112 @@ class TestStockDataProvider:
         with pytest.raises(StockDataProviderError, match="Alpha VantageからGlobal Quoteデータを取得できませんでした"):
             provider._parse_alpha_vantage_data("AAPL", mock_data)
     
+    @pytest.mark.asyncio
+    async def test_get_current_price_cached_within_ttl(self, provider):
+        """TTL内の再取得ではYahoo Financeを呼ばないテスト"""
+        monotonic = 'src.stock_monitoring_bot.services.data_provider.time.monotonic'
+        with patch.object(provider, '_fetch_yahoo_data', return_value={'regularMarketPrice': 150.0}) as mock_fetch:
+            with patch(monotonic, return_value=1000.0):
+                first = await provider.get_current_price("AAPL")
+            with patch(monotonic, return_value=1029.0):
+                second = await provider.get_current_price(" aapl ")
+            with patch(monotonic, return_value=1031.0):
+                await provider.get_current_price("AAPL")
+        
+        assert second is first
+        assert mock_fetch.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_get_current_price_coalesces_concurrent_misses(self, provider):
+        """同一銘柄への同時取得が1回にまとめられるテスト"""
+        with patch.object(provider, '_fetch_yahoo_data', return_value={'regularMarketPrice': 150.0}) as mock_fetch:
+            results = await asyncio.gather(*(provider.get_current_price("AAPL") for _ in range(5)))
+        
+        assert all(result is results[0] for result in results)
+        assert mock_fetch.call_count == 1
+        # 取得完了後は取得中の記録が残らない
+        assert provider._inflight == {}
+    
+    @pytest.mark.asyncio
+    async def test_get_current_price_failure_not_cached(self, provider_no_alpha):
+        """取得失敗はキャッシュされないテスト"""
+        with patch.object(provider_no_alpha, '_fetch_yahoo_data', return_value={}):
+            with pytest.raises(StockDataProviderError):
+                await provider_no_alpha.get_current_price("AAPL")
+        assert provider_no_alpha._inflight == {}
+        
+        with patch.object(provider_no_alpha, '_fetch_yahoo_data', return_value={'regularMarketPrice': 150.0}):
+            result = await provider_no_alpha.get_current_price("AAPL")
+        
+        assert result.price == Decimal("150.0")
+    
+    @pytest.mark.asyncio
+    async def test_get_historical_data_cached_per_period(self, provider):
+        """過去データが銘柄と期間の組でキャッシュされるテスト"""
+        dates = pd.date_range(start='2024-01-01', periods=2, freq='D')
+        mock_hist_data = pd.DataFrame({
+            'Open': [100.0, 101.0],
+            'High': [102.0, 103.0],
+            'Low': [99.0, 100.0],
+            'Close': [101.0, 102.0],
+            'Volume': [1000000, 1100000]
+        }, index=dates)
+        
+        with patch.object(provider, '_fetch_yahoo_history', return_value=mock_hist_data) as mock_fetch:
+            first = await provider.get_historical_data("AAPL", "5d")
+            first.clear()
+            second = await provider.get_historical_data("AAPL", "5d")
+            await provider.get_historical_data("AAPL", "1mo")
+        
+        assert len(second) == 2
+        assert mock_fetch.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_get_current_prices_downloads_in_one_call(self, provider):
+        """複数銘柄が1回のyf.downloadで取得され、取得できない銘柄は個別取得されるテスト"""
+        dates = pd.date_range('2024-01-01', periods=2, freq='D')
+        nan = float('nan')
+        frame = pd.DataFrame({
+            ('7203.T', 'Open'): [2490.0, 2500.0],
+            ('7203.T', 'High'): [2510.0, 2520.0],
+            ('7203.T', 'Low'): [2480.0, 2490.0],
+            ('7203.T', 'Close'): [2500.0, 2510.0],
+            ('7203.T', 'Volume'): [1000000, 1200000],
+            ('AAPL', 'Open'): [nan, nan],
+            ('AAPL', 'High'): [nan, nan],
+            ('AAPL', 'Low'): [nan, nan],
+            ('AAPL', 'Close'): [nan, nan],
+            ('AAPL', 'Volume'): [nan, nan],
+        }, index=dates)
+        frame.columns = pd.MultiIndex.from_tuples(frame.columns)
+        fallback_price = StockPrice(symbol="AAPL", timestamp=datetime.now(UTC), price=Decimal("150"))
+        
+        with patch('src.stock_monitoring_bot.services.data_provider.yf.download', return_value=frame) as mock_download, \
+                patch.object(provider, '_fetch_current_price', return_value=fallback_price) as mock_single:
+            results = await provider.get_current_prices(["7203", "AAPL", " 7203 ", "BAD@"])
+            cached = await provider.get_current_prices(["7203"])
+        
+        assert set(results) == {"7203", "AAPL"}
+        assert results["7203"].price == Decimal("2510.0")
+        assert results["7203"].previous_close == Decimal("2500.0")
+        assert results["7203"].change_amount == Decimal("10.0")
+        assert results["AAPL"] is fallback_price
+        assert cached["7203"] is results["7203"]
+        mock_download.assert_called_once()
+        assert mock_download.call_args.kwargs['tickers'] == ['7203.T', 'AAPL']
+        mock_single.assert_called_once_with("AAPL")
+    
+    @pytest.mark.asyncio
+    async def test_get_current_prices_download_failure_falls_back(self, provider):
+        """一括取得に失敗した場合は全銘柄を個別取得するテスト"""
+        price = StockPrice(symbol="AAPL", timestamp=datetime.now(UTC), price=Decimal("150"))
+        
+        with patch('src.stock_monitoring_bot.services.data_provider.yf.download', side_effect=Exception("network")), \
+                patch.object(provider, '_fetch_current_price', side_effect=[price, StockDataProviderError("失敗")]):
+            results = await provider.get_current_prices(["AAPL", "MSFT"])
+        
+        assert results == {"AAPL": price}
+    
     @pytest.mark.asyncio
     async def test_context_manager(self):
         """非同期コンテキストマネージャーのテスト"""
@@ -253,6 +486,13 @@ class TestStockDataProvider:
         
         # コンテキスト終了後はセッションがクローズされている
         assert provider.session.closed
+    
+    @pytest.mark.asyncio
+    async def test_context_manager_session_settings(self):
+        """HTTPセッションの接続数とタイムアウトの設定テスト"""
+        async with StockDataProvider() as provider:
+            assert provider.session.connector.limit == 10
+            assert provider.session.timeout.total == 10
 
 
 @pytest.mark.integration
@@ -52,6 +52,22 @@ class TestRateLimiter:
         await asyncio.sleep(1.1)
         assert await limiter.can_send() is True
 
+    @pytest.mark.asyncio
+    async def test_window_uses_monotonic_clock(self):
+        """時間窓がtime.monotonic()の経過秒数で判定されるテスト"""
+        limiter = RateLimiter(max_requests=2, time_window=60)
+        monotonic = 'src.stock_monitoring_bot.handlers.discord_handler.time.monotonic'
+
+        with patch(monotonic, return_value=1000.0):
+            await limiter.record_request()
+        with patch(monotonic, return_value=1030.0):
+            await limiter.record_request()
+            assert await limiter.can_send() is False
+        with patch(monotonic, return_value=1060.0):
+            # 1000.0の記録のみ時間窓外となる
+            assert await limiter.can_send() is True
+        assert list(limiter.requests) == [1030.0]
+
 
 class TestDuplicateFilter:
     """重複防止フィルターテスト"""
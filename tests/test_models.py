@@ -7,7 +7,8 @@ from decimal import Decimal
 from pydantic import ValidationError
 
 from src.stock_monitoring_bot.models.stock import (
-    MonitoredStock, StockPrice, Alert, Command, SystemLog
+    MonitoredStock, StockPrice, Alert, Command, SystemLog,
+    PortfolioHolding, ProfitLossCalculation
 )
 
 
@@ -202,6 +203,35 @@ class TestAlert:
             )
             assert alert.alert_type == alert_type
 
+    def test_fingerprint(self):
+        """重複判定キーがIDやメッセージに依存しないテスト"""
+        alert1 = Alert(
+            alert_id="alert_001",
+            symbol="7203",
+            alert_type="price_upper",
+            message="テスト1",
+            threshold_value=Decimal("3000")
+        )
+        alert2 = Alert(
+            alert_id="alert_002",
+            symbol="7203",
+            alert_type="price_upper",
+            message="テスト2",
+            threshold_value=Decimal("3000.0")
+        )
+        alert3 = Alert(
+            alert_id="alert_003",
+            symbol="7203",
+            alert_type="price_lower",
+            message="テスト3",
+            threshold_value=Decimal("3000")
+        )
+
+        assert alert1.fingerprint == ("7203", "price_upper", Decimal("3000"))
+        assert hash(alert1.fingerprint) == hash(alert2.fingerprint)
+        assert alert1.fingerprint == alert2.fingerprint
+        assert alert1.fingerprint != alert3.fingerprint
+
 
 class TestCommand:
     """Commandモデルのテスト"""
@@ -282,4 +312,24 @@ class TestSystemLog:
             component="Test",
             message="テスト"
         )
-        assert log.level == "INFO"
\ No newline at end of file
+        assert log.level == "INFO"
+
+
+class TestProfitLossCalculation:
+    """ProfitLossCalculationモデルのテスト"""
+    
+    def test_calculation_is_immutable(self):
+        """計算結果が変更不可であることのテスト"""
+        holding = PortfolioHolding(
+            holding_id="h_001",
+            portfolio_id="p_001",
+            symbol="7203",
+            quantity=100,
+            purchase_price=Decimal("2500"),
+            purchase_date=datetime.now(UTC)
+        )
+        pnl = ProfitLossCalculation.calculate(holding, Decimal("2600"))
+        
+        assert pnl.unrealized_pnl == Decimal("10000")
+        with pytest.raises(ValidationError):
+            pnl.current_price = Decimal("3000")
@@ -1,13 +1,15 @@
 """
 ポートフォリオサービスのテスト
 """
+import asyncio
 import pytest
 from datetime import datetime, UTC
 from decimal import Decimal
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, patch
 
+from src.stock_monitoring_bot.services import portfolio_service
 from src.stock_monitoring_bot.services.portfolio_service import (
-    PortfolioService, PortfolioCommandHandler
+    PNL_CACHE_TTL_SECONDS, PortfolioService, PortfolioCommandHandler
 )
 from src.stock_monitoring_bot.models.stock import (
     PortfolioHolding, ProfitLossCalculation, 
@@ -15,6 +17,22 @@ from src.stock_monitoring_bot.models.stock import (
 )
 
 
+@pytest.fixture(autouse=True)
+def clear_price_cache():
+    """テスト間で共有の現在価格キャッシュを持ち越さない"""
+    portfolio_service._price_cache.clear()
+    yield
+    portfolio_service._price_cache.clear()
+
+
+def _current_prices(price: Decimal):
+    """全銘柄に同じ現在価格を返すget_current_pricesのモックを作成"""
+    return lambda symbols: {
+        symbol: StockPrice(symbol=symbol, timestamp=datetime.now(UTC), price=price)
+        for symbol in symbols
+    }
+
+
 class TestPortfolioService:
     """PortfolioServiceのテスト"""
     
@@ -104,6 +122,38 @@ class TestPortfolioService:
         assert result is True
         assert holding.is_active is False
     
+    @pytest.mark.asyncio
+    async def test_remove_holding_twice(self):
+        """削除済みの保有銘柄は再削除できないテスト"""
+        portfolio = await self.service.create_portfolio(self.user_id, "テスト")
+        holding = await self.service.add_holding(
+            portfolio.portfolio_id, "7203", 100, Decimal("2500")
+        )
+        
+        assert await self.service.remove_holding(holding.holding_id) is True
+        assert await self.service.remove_holding(holding.holding_id) is False
+        assert await self.service.remove_holding("invalid_id") is False
+    
+    @pytest.mark.asyncio
+    async def test_get_user_holdings_by_symbol(self):
+        """ユーザー・銘柄別の有効な保有銘柄取得テスト"""
+        portfolio1 = await self.service.create_portfolio(self.user_id, "ポートフォリオ1")
+        portfolio2 = await self.service.create_portfolio(self.user_id, "ポートフォリオ2")
+        other = await self.service.create_portfolio("other_user", "他のユーザー")
+        holding1 = await self.service.add_holding(portfolio1.portfolio_id, "aapl", 10, Decimal("150"))
+        holding2 = await self.service.add_holding(portfolio2.portfolio_id, "AAPL", 5, Decimal("160"))
+        await self.service.add_holding(other.portfolio_id, "AAPL", 1, Decimal("170"))
+        
+        holdings = await self.service.get_user_holdings_by_symbol(self.user_id, "Aapl")
+        assert [h.holding_id for h in holdings] == [holding1.holding_id, holding2.holding_id]
+        
+        await self.service.remove_holding(holding1.holding_id)
+        holdings = await self.service.get_user_holdings_by_symbol(self.user_id, "AAPL")
+        assert [h.holding_id for h in holdings] == [holding2.holding_id]
+        
+        await self.service.remove_holding(holding2.holding_id)
+        assert await self.service.get_user_holdings_by_symbol(self.user_id, "AAPL") == []
+    
     @pytest.mark.asyncio
     async def test_get_portfolio_holdings(self):
         """ポートフォリオ保有銘柄取得テスト"""
@@ -124,6 +174,23 @@ class TestPortfolioService:
         assert len(holdings) == 1
         assert holdings[0].holding_id == holding1.holding_id
     
+    @pytest.mark.asyncio
+    async def test_get_portfolio_holdings_keeps_order_after_removal(self):
+        """途中の保有銘柄を削除しても追加順が保たれるテスト"""
+        portfolio = await self.service.create_portfolio(self.user_id, "テスト")
+        holdings = [
+            await self.service.add_holding(portfolio.portfolio_id, symbol, 100, Decimal("1000"))
+            for symbol in ("7203", "9984", "6758")
+        ]
+        
+        await self.service.remove_holding(holdings[1].holding_id)
+        result = await self.service.get_portfolio_holdings(portfolio.portfolio_id)
+        result.clear()
+        
+        remaining = await self.service.get_portfolio_holdings(portfolio.portfolio_id)
+        assert [h.symbol for h in remaining] == ["7203", "6758"]
+        assert await self.service.get_portfolio_holdings("invalid_id") == []
+    
     @pytest.mark.asyncio
     async def test_update_holding(self):
         """保有銘柄更新テスト"""
@@ -149,11 +216,7 @@ class TestPortfolioService:
     async def test_calculate_portfolio_pnl(self):
         """ポートフォリオ損益計算テスト"""
         # モックデータ設定
-        self.mock_data_provider.get_current_price.return_value = StockPrice(
-            symbol="7203",
-            timestamp=datetime.now(UTC),
-            price=Decimal("3000.00")  # 取得価格2500から+500の利益
-        )
+        self.mock_data_provider.get_current_prices.side_effect = _current_prices(Decimal("3000.00"))  # 取得価格2500から+500の利益
         
         portfolio = await self.service.create_portfolio(self.user_id, "テスト")
         await self.service.add_holding(
@@ -182,7 +245,7 @@ class TestPortfolioService:
     async def test_calculate_portfolio_pnl_with_error(self):
         """価格取得エラー時の損益計算テスト"""
         # 価格取得でエラーが発生する場合
-        self.mock_data_provider.get_current_price.side_effect = Exception("API Error")
+        self.mock_data_provider.get_current_prices.side_effect = Exception("API Error")
         
         portfolio = await self.service.create_portfolio(self.user_id, "テスト")
         await self.service.add_holding(
@@ -199,14 +262,148 @@ class TestPortfolioService:
         assert holding_pnl.current_price == Decimal("2500.00")
         assert holding_pnl.unrealized_pnl == Decimal("0.00")
     
+    @pytest.mark.asyncio
+    async def test_calculate_portfolio_pnl_fetches_prices_in_batch(self):
+        """現在価格が1回の一括取得で取得され、取得できなかった銘柄のみ取得価格で計算されるテスト"""
+        self.mock_data_provider.get_current_prices.return_value = {
+            "7203": StockPrice(symbol="7203", timestamp=datetime.now(UTC), price=Decimal("3000.00"))
+        }
+        
+        portfolio = await self.service.create_portfolio(self.user_id, "テスト")
+        await self.service.add_holding(portfolio.portfolio_id, "7203", 100, Decimal("2500.00"))
+        await self.service.add_holding(portfolio.portfolio_id, "AAPL", 10, Decimal("150.00"))
+        await self.service.add_holding(portfolio.portfolio_id, "7203", 50, Decimal("2600.00"))
+        
+        report = await self.service.calculate_portfolio_pnl(portfolio.portfolio_id)
+        
+        self.mock_data_provider.get_current_prices.assert_awaited_once_with(["7203", "AAPL"])
+        self.mock_data_provider.get_current_price.assert_not_called()
+        assert [h.symbol for h in report.holdings] == ["7203", "AAPL", "7203"]
+        assert report.holdings[0].current_price == Decimal("3000.00")
+        assert report.holdings[1].current_price == Decimal("150.00")
+    
+    @pytest.mark.asyncio
+    async def test_calculate_all_user_portfolios_pnl_fetches_each_symbol_once(self):
+        """複数ポートフォリオで重複する銘柄の現在価格が1度だけ取得されるテスト"""
+        self.mock_data_provider.get_current_prices.side_effect = _current_prices(Decimal("3000.00"))
+        
+        portfolio1 = await self.service.create_portfolio(self.user_id, "ポートフォリオ1")
+        portfolio2 = await self.service.create_portfolio(self.user_id, "ポートフォリオ2")
+        await self.service.add_holding(portfolio1.portfolio_id, "7203", 100, Decimal("2500.00"))
+        await self.service.add_holding(portfolio1.portfolio_id, "7203", 50, Decimal("2600.00"))
+        await self.service.add_holding(portfolio2.portfolio_id, "7203", 10, Decimal("2800.00"))
+        await self.service.add_holding(portfolio2.portfolio_id, "9984", 10, Decimal("6000.00"))
+        
+        reports = await self.service.calculate_all_user_portfolios_pnl(self.user_id)
+        
+        assert [report.portfolio_id for report in reports] == [
+            portfolio1.portfolio_id, portfolio2.portfolio_id
+        ]
+        assert [len(report.holdings) for report in reports] == [2, 2]
+        self.mock_data_provider.get_current_prices.assert_awaited_once_with(["7203", "9984"])
+        assert reports[1].holdings[1].current_price == Decimal("3000.00")
+    
+    @pytest.mark.asyncio
+    async def test_price_cache_shared_across_instances(self):
+        """現在価格のキャッシュが呼び出し毎に作られるサービス間で共有されるテスト"""
+        self.mock_data_provider.get_current_prices.side_effect = _current_prices(Decimal("3000.00"))
+        portfolio = await self.service.create_portfolio(self.user_id, "テスト")
+        await self.service.add_holding(portfolio.portfolio_id, "7203", 100, Decimal("2500.00"))
+        await self.service.calculate_portfolio_pnl(portfolio.portfolio_id)
+        
+        other_provider = AsyncMock()
+        other_service = PortfolioService(other_provider)
+        other_portfolio = await other_service.create_portfolio("other_user", "テスト")
+        await other_service.add_holding(other_portfolio.portfolio_id, "7203", 10, Decimal("2800.00"))
+        report = await other_service.calculate_portfolio_pnl(other_portfolio.portfolio_id)
+        
+        assert report.holdings[0].current_price == Decimal("3000.00")
+        other_provider.get_current_prices.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_price_fetches_are_coalesced(self):
+        """同時に要求された同じ銘柄の現在価格が1回の取得にまとめられ、失敗はキャッシュされないテスト"""
+        release = asyncio.Event()
+        
+        async def get_current_prices(symbols):
+            await release.wait()
+            return {"7203": StockPrice(symbol="7203", timestamp=datetime.now(UTC), price=Decimal("3000.00"))}
+        
+        self.mock_data_provider.get_current_prices.side_effect = get_current_prices
+        
+        first = asyncio.create_task(self.service._fetch_current_prices(["7203", "9984"]))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(self.service._fetch_current_prices(["9984", "7203"]))
+        await asyncio.sleep(0)
+        release.set()
+        
+        assert await first == {"7203": Decimal("3000.00")}
+        assert await second == {"7203": Decimal("3000.00")}
+        assert self.mock_data_provider.get_current_prices.await_count == 1
+        assert "9984" not in portfolio_service._price_cache
+        assert self.service._inflight_prices == {}
+    
+    @pytest.mark.asyncio
+    async def test_calculate_portfolio_pnl_uses_cache_until_holdings_change(self):
+        """保有銘柄に変更がなければ損益レポートのキャッシュが使われるテスト"""
+        self.mock_data_provider.get_current_prices.side_effect = _current_prices(Decimal("3000.00"))
+        portfolio = await self.service.create_portfolio(self.user_id, "テスト")
+        holding = await self.service.add_holding(
+            portfolio.portfolio_id, "7203", 100, Decimal("2500.00")
+        )
+        
+        first = await self.service.calculate_portfolio_pnl(portfolio.portfolio_id)
+        reports = await self.service.calculate_all_user_portfolios_pnl(self.user_id)
+        await self.service.get_portfolio_summary(portfolio.portfolio_id)
+        
+        assert reports == [first]
+        assert self.mock_data_provider.get_current_prices.await_count == 1
+        
+        # 保有銘柄の更新でキャッシュが無効化される
+        await self.service.update_holding(holding.holding_id, quantity=200)
+        updated = await self.service.calculate_portfolio_pnl(portfolio.portfolio_id)
+        
+        assert updated is not first
+        assert updated.total_purchase_value == Decimal("500000.00")
+        # 損益は再計算されるが、現在価格はキャッシュから取得される
+        assert self.mock_data_provider.get_current_prices.await_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_calculate_portfolio_pnl_not_cached_on_price_failure(self):
+        """現在価格を取得できなかった場合は損益レポートをキャッシュしないテスト"""
+        self.mock_data_provider.get_current_prices.side_effect = [
+            Exception("API Error"), _current_prices(Decimal("3000.00"))(["7203"])
+        ]
+        portfolio = await self.service.create_portfolio(self.user_id, "テスト")
+        await self.service.add_holding(portfolio.portfolio_id, "7203", 100, Decimal("2500.00"))
+        
+        first = await self.service.calculate_portfolio_pnl(portfolio.portfolio_id)
+        second = await self.service.calculate_portfolio_pnl(portfolio.portfolio_id)
+        
+        assert first.total_unrealized_pnl == Decimal("0.00")
+        assert second.total_unrealized_pnl == Decimal("50000.00")
+        assert self.mock_data_provider.get_current_prices.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_calculate_portfolio_pnl_cache_expires(self):
+        """有効期限切れの損益レポートは再計算されるテスト"""
+        self.mock_data_provider.get_current_prices.side_effect = _current_prices(Decimal("3000.00"))
+        portfolio = await self.service.create_portfolio(self.user_id, "テスト")
+        await self.service.add_holding(portfolio.portfolio_id, "7203", 100, Decimal("2500.00"))
+        
+        with patch('src.stock_monitoring_bot.services.portfolio_service.time.monotonic',
+                   return_value=1000.0):
+            await self.service.calculate_portfolio_pnl(portfolio.portfolio_id)
+        with patch('src.stock_monitoring_bot.services.portfolio_service.time.monotonic',
+                   return_value=1000.0 + PNL_CACHE_TTL_SECONDS):
+            await self.service.calculate_portfolio_pnl(portfolio.portfolio_id)
+        
+        assert self.mock_data_provider.get_current_prices.await_count == 2
+    
     @pytest.mark.asyncio
     async def test_get_portfolio_summary(self):
         """ポートフォリオサマリー取得テスト"""
-        self.mock_data_provider.get_current_price.return_value = StockPrice(
-            symbol="7203",
-            timestamp=datetime.now(UTC),
-            price=Decimal("3000.00")
-        )
+        self.mock_data_provider.get_current_prices.side_effect = _current_prices(Decimal("3000.00"))
         
         portfolio = await self.service.create_portfolio(self.user_id, "テスト")
         await self.service.add_holding(
@@ -315,6 +512,27 @@ class TestPortfolioCommandHandler:
         assert "7203" in result
         assert "100" in result
     
+    @pytest.mark.asyncio
+    async def test_handle_portfolio_list_command_format(self):
+        """複数ポートフォリオの一覧表示内容テスト"""
+        await self.handler.handle_portfolio_add_command(
+            self.user_id, "7203", 100, Decimal("2500.00")
+        )
+        await self.handler.handle_portfolio_add_command(
+            self.user_id, "9984", 1000, Decimal("6000.50")
+        )
+        await self.portfolio_service.create_portfolio(self.user_id, "空のポートフォリオ")
+        
+        result = await self.handler.handle_portfolio_list_command(self.user_id)
+        
+        assert result == (
+            "📋 **ポートフォリオ一覧**\n\n"
+            f"**{self.user_id}のポートフォリオ**\n"
+            "• 7203: 100株 @ ¥2,500.00\n"
+            "• 9984: 1,000株 @ ¥6,000.50\n\n"
+            "**空のポートフォリオ**: 保有銘柄なし"
+        )
+    
     @pytest.mark.asyncio
     async def test_handle_portfolio_remove_command(self):
         """ポートフォリオ削除コマンドテスト"""
@@ -328,15 +546,33 @@ class TestPortfolioCommandHandler:
         assert "削除しました" in result
         assert "7203" in result
     
+    @pytest.mark.asyncio
+    async def test_handle_portfolio_commands_normalize_symbol(self):
+        """追加・削除コマンドで銘柄コードが正規化されるテスト"""
+        add_result = await self.handler.handle_portfolio_add_command(
+            self.user_id, " aapl ", 10, Decimal("150.00")
+        )
+        remove_result = await self.handler.handle_portfolio_remove_command(self.user_id, "Aapl")
+        
+        assert "銘柄: AAPL\n" in add_result
+        assert remove_result == "✅ AAPL をポートフォリオから削除しました"
+    
+    @pytest.mark.asyncio
+    async def test_handle_portfolio_remove_command_not_found(self):
+        """保有していない銘柄の削除コマンドテスト"""
+        await self.handler.handle_portfolio_add_command(
+            self.user_id, "7203", 100, Decimal("2500.00")
+        )
+        
+        result = await self.handler.handle_portfolio_remove_command(self.user_id, "9984")
+        
+        assert "見つかりませんでした" in result
+    
     @pytest.mark.asyncio
     async def test_handle_portfolio_pnl_command(self):
         """ポートフォリオ損益コマンドテスト"""
         # モック設定
-        self.mock_data_provider.get_current_price.return_value = StockPrice(
-            symbol="7203",
-            timestamp=datetime.now(UTC),
-            price=Decimal("3000.00")
-        )
+        self.mock_data_provider.get_current_prices.side_effect = _current_prices(Decimal("3000.00"))
         
         # 事前に保有銘柄を追加
         await self.handler.handle_portfolio_add_command(
@@ -356,11 +592,7 @@ class TestPortfolioCommandHandler:
 async def test_integration_portfolio_workflow():
     """ポートフォリオ機能の統合テスト"""
     mock_data_provider = AsyncMock()
-    mock_data_provider.get_current_price.return_value = StockPrice(
-        symbol="7203",
-        timestamp=datetime.now(UTC),
-        price=Decimal("3000.00")
-    )
+    mock_data_provider.get_current_prices.side_effect = _current_prices(Decimal("3000.00"))
     
     service = PortfolioService(mock_data_provider)
     handler = PortfolioCommandHandler(service)
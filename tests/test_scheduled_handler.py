@@ -0,0 +1,113 @@
+"""
+定期実行ハンドラーのテスト
+"""
+import pytest
+from datetime import datetime, UTC
+from decimal import Decimal
+from unittest.mock import AsyncMock, Mock
+
+from src.stock_monitoring_bot.handlers.scheduled_handler import ScheduledPnLReportHandler
+from src.stock_monitoring_bot.models.stock import (
+    Portfolio, PortfolioHolding, ProfitLossCalculation, PortfolioProfitLossReport
+)
+
+
+def _create_report(user_id: str) -> PortfolioProfitLossReport:
+    """テスト用の損益レポートを作成"""
+    portfolio = Portfolio(portfolio_id=f"p_{user_id}", user_id=user_id, name="テスト")
+    holding = PortfolioHolding(
+        holding_id=f"h_{user_id}",
+        portfolio_id=portfolio.portfolio_id,
+        symbol="7203",
+        quantity=100,
+        purchase_price=Decimal("2500"),
+        purchase_date=datetime.now(UTC)
+    )
+    pnl = ProfitLossCalculation.calculate(holding, Decimal("2600"))
+    return PortfolioProfitLossReport.create_report(portfolio, [pnl])
+
+
+class TestScheduledPnLReportHandler:
+    """ScheduledPnLReportHandlerのテスト"""
+
+    def setup_method(self):
+        """テストセットアップ"""
+        self.portfolio_service = AsyncMock()
+        self.portfolio_service.calculate_all_user_portfolios_pnl.side_effect = (
+            lambda user_id: [_create_report(user_id)]
+        )
+        self.discord_handler = Mock()
+        self.discord_handler._send_webhook = AsyncMock(return_value=True)
+
+    def test_invalid_max_concurrency(self):
+        """同時実行数が0以下の場合はエラーになるテスト"""
+        with pytest.raises(ValueError):
+            ScheduledPnLReportHandler(
+                self.portfolio_service, self.discord_handler, ["user1"], max_concurrency=0
+            )
+
+    @pytest.mark.asyncio
+    async def test_all_reports_succeed(self):
+        """全ユーザーのレポート送信成功テスト"""
+        handler = ScheduledPnLReportHandler(
+            self.portfolio_service, self.discord_handler, ["user1", "user2", "user3"]
+        )
+
+        results = await handler.generate_and_send_pnl_reports()
+
+        assert results["processed_users"] == 3
+        assert results["successful_reports"] == 3
+        assert results["failed_reports"] == 0
+        assert results["errors"] == []
+        assert self.discord_handler._send_webhook.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_partial_failures_are_counted(self):
+        """一部ユーザーの失敗が集計されるテスト"""
+        def calculate(user_id):
+            if user_id == "user2":
+                raise RuntimeError("価格取得失敗")
+            return [_create_report(user_id)]
+
+        self.portfolio_service.calculate_all_user_portfolios_pnl.side_effect = calculate
+        handler = ScheduledPnLReportHandler(
+            self.portfolio_service, self.discord_handler, ["user1", "user2", "user3"]
+        )
+
+        results = await handler.generate_and_send_pnl_reports()
+
+        assert results["processed_users"] == 3
+        assert results["successful_reports"] == 2
+        assert results["failed_reports"] == 1
+        assert len(results["errors"]) == 1
+        assert "user2" in results["errors"][0]
+
+    @pytest.mark.asyncio
+    async def test_failed_webhook_send_counts_as_failure(self):
+        """Webhook送信失敗（レート制限等）が失敗として集計されるテスト"""
+        self.discord_handler._send_webhook = AsyncMock(side_effect=[True, False])
+        handler = ScheduledPnLReportHandler(
+            self.portfolio_service, self.discord_handler, ["user1", "user2"], max_concurrency=1
+        )
+
+        results = await handler.generate_and_send_pnl_reports()
+
+        assert results["successful_reports"] == 1
+        assert results["failed_reports"] == 1
+        assert "user2" in results["errors"][0]
+
+    def test_create_pnl_report_embed(self):
+        """損益レポートEmbedの内容テスト"""
+        handler = ScheduledPnLReportHandler(self.portfolio_service, self.discord_handler)
+        reports = [_create_report("user1"), _create_report("user1")]
+
+        embed = handler._create_pnl_report_embed("user1", reports)
+
+        assert embed["title"] == "📈 定期損益レポート"
+        assert embed["color"] == 0x00FF00
+        fields = {field["name"]: field["value"] for field in embed["fields"]}
+        assert fields["💰 総取得金額"] == "¥500,000"
+        assert fields["💎 現在評価額"] == "¥520,000"
+        assert fields["📊 含み損益"] == "+¥20,000\n(+4.00%)"
+        assert fields["📁 ポートフォリオ別"].count("🟢 **テスト**") == 2
+        assert fields["🏆 主要銘柄（損益額順）"].startswith("🟢 **7203**: +¥10,000 (+4.0%)")
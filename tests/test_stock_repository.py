@@ -0,0 +1,337 @@
+"""
+株式データリポジトリのテスト
+"""
+import pytest
+from datetime import datetime, timedelta, UTC
+from decimal import Decimal
+from unittest.mock import AsyncMock, Mock
+
+from src.stock_monitoring_bot.models.stock import MonitoredStock, StockPrice
+from src.stock_monitoring_bot.repositories.stock_repository import (
+    PRICE_HISTORY_PROJECTION, StockRepository, StockPriceRepository
+)
+
+
+def _stock_item(symbol: str, is_active: bool = True) -> dict:
+    """テスト用の監視対象株式アイテムを作成"""
+    item = {
+        'symbol': {'S': symbol},
+        'name': {'S': f"銘柄{symbol}"},
+        'market': {'S': 'TSE'},
+        'volume_threshold_multiplier': {'N': '2.0'},
+        'is_active': {'BOOL': is_active},
+        'created_at': {'S': '2024-01-01T09:00:00+00:00'},
+        'updated_at': {'S': '2024-01-01T09:00:00+00:00'}
+    }
+    if is_active:
+        item['is_active_pk'] = {'S': '1'}
+    return item
+
+
+class TestStockRepository:
+    """StockRepositoryのテスト"""
+
+    def setup_method(self):
+        """テストセットアップ"""
+        self.repository = StockRepository()
+        self.client = AsyncMock()
+        self.repository._client = AsyncMock(return_value=self.client)
+
+    def _mock_paginator(self, pages: list) -> Mock:
+        """指定ページを返すページネーターを設定"""
+        return self._mock_paginators({'query': pages, 'scan': pages})['query']
+
+    def _mock_paginators(self, pages_by_operation: dict) -> dict:
+        """操作毎に指定ページを返すページネーターを設定"""
+        paginators = {}
+        for operation, pages in pages_by_operation.items():
+            async def paginate(pages=pages, **kwargs):
+                for page in pages:
+                    yield page
+
+            paginator = Mock()
+            paginator.paginate = Mock(side_effect=paginate)
+            paginators[operation] = paginator
+        self.client.get_paginator = Mock(side_effect=lambda operation: paginators[operation])
+        return paginators
+
+    @pytest.mark.asyncio
+    async def test_list_active_stocks_queries_sparse_index(self):
+        """監視中の銘柄がスパースGSIのクエリで全ページ取得されるテスト"""
+        pages = [
+            {'Items': [_stock_item('7203')], 'LastEvaluatedKey': {'symbol': {'S': '7203'}}},
+            {'Items': [_stock_item('9984')]}
+        ]
+        paginator = self._mock_paginator(pages)
+
+        stocks = await self.repository.list_monitored_stocks()
+
+        assert [stock.symbol for stock in stocks] == ['7203', '9984']
+        assert stocks[0].volume_threshold_multiplier == Decimal('2.0')
+        self.client.get_paginator.assert_called_once_with('query')
+        kwargs = paginator.paginate.call_args.kwargs
+        assert kwargs['IndexName'] == 'active-index'
+        assert kwargs['PaginationConfig'] == {'PageSize': 1000}
+
+    @pytest.mark.asyncio
+    async def test_list_active_stocks_falls_back_to_scan(self):
+        """GSIが空の場合はGSIキー移行前のアイテムをスキャンで取得するテスト"""
+        paginators = self._mock_paginators({
+            'query': [{'Items': []}],
+            'scan': [{'Items': [_stock_item('7203', is_active=True)]}]
+        })
+
+        stocks = await self.repository.list_monitored_stocks()
+
+        assert [stock.symbol for stock in stocks] == ['7203']
+        kwargs = paginators['scan'].paginate.call_args.kwargs
+        assert kwargs['FilterExpression'] == 'is_active = :true'
+        assert kwargs['ExpressionAttributeValues'] == {':true': {'BOOL': True}}
+
+    @pytest.mark.asyncio
+    async def test_backfill_active_index(self):
+        """GSIキーのない監視中の銘柄にis_active_pkが設定されるテスト"""
+        from botocore.exceptions import ClientError
+
+        paginators = self._mock_paginators({'scan': [
+            {'Items': [{'symbol': {'S': '7203'}}, {'symbol': {'S': '9984'}}]}
+        ]})
+        # 2件目はスキャン後に監視停止された想定
+        self.client.update_item.side_effect = [
+            {},
+            ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': ''}}, 'UpdateItem')
+        ]
+
+        assert await self.repository.backfill_active_index() == 1
+
+        scan_kwargs = paginators['scan'].paginate.call_args.kwargs
+        assert 'attribute_not_exists(is_active_pk)' in scan_kwargs['FilterExpression']
+        update_kwargs = self.client.update_item.call_args_list[0].kwargs
+        assert update_kwargs['Key'] == {'symbol': {'S': '7203'}}
+        assert update_kwargs['UpdateExpression'] == 'SET is_active_pk = :a'
+        assert update_kwargs['ConditionExpression'] == 'is_active = :true'
+
+    @pytest.mark.asyncio
+    async def test_list_all_stocks_paginates_scan(self):
+        """全銘柄の一覧がスキャンの全ページから取得されるテスト"""
+        self._mock_paginator([
+            {'Items': [_stock_item('7203')]},
+            {'Items': [_stock_item('9984', is_active=False)]}
+        ])
+
+        stocks = await self.repository.list_monitored_stocks(active_only=False)
+
+        assert [stock.is_active for stock in stocks] == [True, False]
+        self.client.get_paginator.assert_called_once_with('scan')
+
+    @pytest.mark.asyncio
+    async def test_create_stock_sets_sparse_index_key_only_when_active(self):
+        """監視中の銘柄のみGSIキーが書き込まれるテスト"""
+        await self.repository.create_monitored_stock(
+            MonitoredStock(symbol="7203", name="トヨタ自動車", market="TSE")
+        )
+        await self.repository.create_monitored_stock(
+            MonitoredStock(symbol="9984", name="ソフトバンクグループ", market="TSE", is_active=False)
+        )
+
+        active_item = self.client.put_item.call_args_list[0].kwargs['Item']
+        inactive_item = self.client.put_item.call_args_list[1].kwargs['Item']
+        assert active_item['is_active_pk'] == {'S': '1'}
+        assert 'is_active_pk' not in inactive_item
+
+    @pytest.mark.asyncio
+    async def test_update_stock_builds_single_remove_clause(self):
+        """SET句とREMOVE句が正しく組み立てられるテスト"""
+        stock = MonitoredStock(symbol="7203", name="トヨタ自動車", market="TSE", is_active=False)
+
+        assert await self.repository.update_monitored_stock(stock) is True
+
+        expression = self.client.update_item.call_args.kwargs['UpdateExpression']
+        set_part, remove_part = expression.split(" REMOVE ")
+        assert set_part.startswith("SET ")
+        assert "REMOVE" not in set_part
+        assert sorted(remove_part.split(", ")) == [
+            'is_active_pk', 'price_threshold_lower', 'price_threshold_upper'
+        ]
+
+    @pytest.mark.asyncio
+    async def test_update_stock_keeps_decimal_values(self):
+        """閾値がfloatを経由せずDecimalの文字列表現で送られるテスト"""
+        stock = MonitoredStock(
+            symbol="7203", name="トヨタ自動車", market="TSE",
+            price_threshold_upper=Decimal("3000.10"),
+            volume_threshold_multiplier=Decimal("2.5")
+        )
+
+        assert await self.repository.update_monitored_stock(stock) is True
+
+        kwargs = self.client.update_item.call_args.kwargs
+        values = kwargs['ExpressionAttributeValues']
+        assert values[':upper'] == {'N': '3000.10'}
+        assert values[':volume_multiplier'] == {'N': '2.5'}
+        assert ':lower' not in values
+        assert values[':active_pk'] == {'S': '1'}
+        assert kwargs['UpdateExpression'].endswith(" REMOVE price_threshold_lower")
+        assert "price_threshold_upper = :upper" in kwargs['UpdateExpression']
+
+
+    def test_table_name_resolved_once_per_instance(self, monkeypatch):
+        """テーブル名がインスタンス毎に1度だけ解決されるテスト"""
+        monkeypatch.setenv('DYNAMODB_TABLE_STOCKS', 'stocks-test')
+        repository = StockRepository()
+
+        assert repository.table_name == 'stocks-test'
+        monkeypatch.setenv('DYNAMODB_TABLE_STOCKS', 'stocks-other')
+        assert repository.table_name == 'stocks-test'
+        assert StockRepository().table_name == 'stocks-other'
+
+    def test_deserialize_item_matches_boto3(self):
+        """独自デシリアライザーがboto3のTypeDeserializerと同じ結果になるテスト"""
+        from boto3.dynamodb.types import TypeDeserializer
+
+        item = {
+            'symbol': {'S': '7203'},
+            'price': {'N': '2500.5'},
+            'is_active': {'BOOL': True},
+            'notes': {'NULL': True},
+            'tags': {'SS': ['auto', 'tse']},
+            'levels': {'NS': ['1', '2.5']},
+            'history': {'L': [{'N': '1'}, {'M': {'close': {'N': '2499'}}}]},
+            'raw': {'B': b'data'}
+        }
+        deserializer = TypeDeserializer()
+
+        assert self.repository._deserialize_item(item) == {
+            k: deserializer.deserialize(v) for k, v in item.items()
+        }
+
+class TestStockPriceRepository:
+    """StockPriceRepositoryのテスト"""
+
+    def setup_method(self):
+        """テストセットアップ"""
+        self.repository = StockPriceRepository()
+        self.client = AsyncMock()
+        self.client.batch_write_item.return_value = {'UnprocessedItems': {}}
+        self.repository._client = AsyncMock(return_value=self.client)
+
+    @pytest.mark.asyncio
+    async def test_save_stock_prices_uses_batch_write(self):
+        """株価データが25件単位のBatchWriteItemで保存されるテスト"""
+        base_time = datetime(2024, 1, 1, 9, 0, 0, tzinfo=UTC)
+        prices = [
+            StockPrice(symbol="7203", timestamp=base_time + timedelta(minutes=i), price=Decimal("2500.5"))
+            for i in range(30)
+        ]
+        # 同一キーの重複は後勝ちで1件にまとめられる
+        prices.append(StockPrice(symbol="7203", timestamp=base_time, price=Decimal("2501")))
+
+        saved = await self.repository.save_stock_prices(prices)
+
+        assert saved == 30
+        assert self.client.batch_write_item.call_count == 2
+        requests = [
+            request
+            for call in self.client.batch_write_item.call_args_list
+            for request in call.kwargs['RequestItems'][self.repository.get_table_name()]
+        ]
+        first = requests[0]['PutRequest']['Item']
+        assert first['price'] == {'N': '2501'}
+        assert 'ttl' in first
+        self.client.put_item.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_save_stock_prices_empty(self):
+        """空リストではリクエストを送らないテスト"""
+        assert await self.repository.save_stock_prices([]) == 0
+        self.repository._client.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_get_price_history_with_projection(self):
+        """projection指定時は必要な属性のみを取得するテスト"""
+        self.client.query.return_value = {'Items': [{
+            'symbol': {'S': '7203'},
+            'timestamp': {'S': '2024-01-01T09:00:00+00:00'},
+            'price': {'N': '2500'},
+            'volume': {'N': '1000'}
+        }]}
+
+        prices = await self.repository.get_price_history('7203', projection=PRICE_HISTORY_PROJECTION)
+
+        assert prices[0].price == Decimal('2500')
+        assert prices[0].volume == 1000
+        assert prices[0].open_price is None
+        kwargs = self.client.query.call_args.kwargs
+        assert kwargs['ProjectionExpression'] == '#p0, #p1, #p2, #p3'
+        assert kwargs['ExpressionAttributeNames'] == {
+            '#p0': 'symbol', '#p1': 'timestamp', '#p2': 'price', '#p3': 'volume'
+        }
+
+    @pytest.mark.asyncio
+    async def test_get_price_history_without_projection(self):
+        """projection未指定時は全属性を取得するテスト"""
+        self.client.query.return_value = {'Items': []}
+
+        assert await self.repository.get_price_history('7203') == []
+        assert 'ProjectionExpression' not in self.client.query.call_args.kwargs
+
+    @pytest.mark.asyncio
+    async def test_get_latest_price_without_projection(self):
+        """projection未指定時は全属性を取得するテスト"""
+        self.client.query.return_value = {'Items': []}
+
+        assert await self.repository.get_latest_price('7203') is None
+        assert 'ProjectionExpression' not in self.client.query.call_args.kwargs
+
+    @pytest.mark.asyncio
+    async def test_get_latest_prices_queries_each_symbol_once(self):
+        """複数銘柄の最新株価が銘柄毎に1回のクエリで取得されるテスト"""
+        async def query(**kwargs):
+            symbol = kwargs['ExpressionAttributeValues'][':symbol']['S']
+            if symbol == '9984':
+                return {'Items': []}
+            return {'Items': [{
+                'symbol': {'S': symbol},
+                'timestamp': {'S': '2024-01-01T09:00:00+00:00'},
+                'price': {'N': '2500'}
+            }]}
+
+        self.client.query.side_effect = query
+
+        prices = await self.repository.get_latest_prices(['7203', '9984', '7203'])
+
+        assert list(prices) == ['7203', '9984']
+        assert prices['7203'].price == Decimal('2500')
+        assert prices['9984'] is None
+        assert self.client.query.call_count == 2
+        assert all(call.kwargs['Limit'] == 1 for call in self.client.query.call_args_list)
+
+    @pytest.mark.asyncio
+    async def test_get_latest_prices_isolates_failures(self):
+        """一部銘柄の取得失敗がNoneとなり他の銘柄は取得されるテスト"""
+        from botocore.exceptions import ClientError
+
+        async def query(**kwargs):
+            symbol = kwargs['ExpressionAttributeValues'][':symbol']['S']
+            if symbol == '9984':
+                raise ClientError(
+                    {'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': ''}}, 'Query'
+                )
+            return {'Items': [{
+                'symbol': {'S': symbol},
+                'timestamp': {'S': '2024-01-01T09:00:00+00:00'},
+                'price': {'N': '2500'}
+            }]}
+
+        self.client.query.side_effect = query
+
+        prices = await self.repository.get_latest_prices(['7203', '9984'])
+
+        assert prices['7203'].price == Decimal('2500')
+        assert prices['9984'] is None
+
+    @pytest.mark.asyncio
+    async def test_get_latest_prices_empty(self):
+        """空リストではクエリを送らないテスト"""
+        assert await self.repository.get_latest_prices([]) == {}
+        self.client.query.assert_not_called()